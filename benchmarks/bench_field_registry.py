@@ -0,0 +1,103 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Micro-benchmarks of the precompiled field accessors against the generic get_nested_value / get_map_value helpers,
+for each extractor type and payload shape.
+
+Run from the project root:
+
+    python benchmarks/bench_field_registry.py
+"""
+from __future__ import annotations
+
+import timeit
+
+from causely_notification.field_registry import compile_map_accessor
+from causely_notification.field_registry import compile_path_accessor
+from causely_notification.field_registry import compute_impact_slo
+from causely_notification.field_registry import get_map_value
+from causely_notification.field_registry import get_nested_value
+
+NUMBER = 500_000
+
+NESTED_PAYLOAD = {
+    "name": "Malfunction",
+    "severity": "High",
+    "entity": {"type": "ApplicationInstance", "attributes": {"tier": "backend"}},
+    "labels": {"k8s.cluster.name": "prod", "causely.ai/namespace": "payments"},
+    "slos": [{}],
+}
+FLAT_PAYLOAD = {
+    "name": "Malfunction",
+    "severity": "High",
+    "entity.type": "ApplicationInstance",
+    "labels.k8s.cluster.name": "prod",
+}
+
+CASES = [
+    (
+        "direct, 1 segment", NESTED_PAYLOAD,
+        lambda payload: get_nested_value(payload, "severity".split('.')),
+        compile_path_accessor("severity"),
+    ),
+    (
+        "direct, 2 segments", NESTED_PAYLOAD,
+        lambda payload: get_nested_value(payload, "entity.type".split('.')),
+        compile_path_accessor("entity.type"),
+    ),
+    (
+        "direct, 3 segments", NESTED_PAYLOAD,
+        lambda payload: get_nested_value(payload, "entity.attributes.tier".split('.')),
+        compile_path_accessor("entity.attributes.tier"),
+    ),
+    (
+        "direct, flat key", FLAT_PAYLOAD,
+        lambda payload: get_nested_value(payload, "entity.type".split('.')),
+        compile_path_accessor("entity.type"),
+    ),
+    (
+        "map_path, nested", NESTED_PAYLOAD,
+        lambda payload: get_map_value(payload, "labels", "k8s.cluster.name"),
+        compile_map_accessor("labels", "k8s.cluster.name"),
+    ),
+    (
+        "map_path, flat key", FLAT_PAYLOAD,
+        lambda payload: get_map_value(payload, "labels", "k8s.cluster.name"),
+        compile_map_accessor("labels", "k8s.cluster.name"),
+    ),
+    (
+        "computed", NESTED_PAYLOAD,
+        compute_impact_slo,
+        compute_impact_slo,
+    ),
+]
+
+
+def main():
+    print(f"{'extractor':<22}{'generic (ns)':>14}{'compiled (ns)':>15}{'speedup':>10}")
+    for label, payload, generic, compiled in CASES:
+        assert generic(payload) == compiled(payload)
+        generic_time = timeit.timeit(lambda: generic(payload), number=NUMBER)
+        compiled_time = timeit.timeit(lambda: compiled(payload), number=NUMBER)
+        print(
+            f"{label:<22}{generic_time / NUMBER * 1e9:>14.0f}{compiled_time / NUMBER * 1e9:>15.0f}"
+            f"{generic_time / compiled_time:>9.1f}x",
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Benchmark the compiled filter predicate against the interpreted filter path.
+
+Run from the project root:
+
+    python benchmarks/bench_filter.py
+"""
+from __future__ import annotations
+
+import itertools
+import timeit
+
+from causely_notification.field_registry import FIELD_DEFINITIONS
+from causely_notification.field_registry import FieldRegistry
+from causely_notification.filter import FilterIndex
+from causely_notification.filter import WebhookFilterStore
+
+NUMBER = 200_000
+STORE_NUMBER = 5_000
+STORE_WEBHOOKS = 200
+
+PAYLOADS = {
+    "match": {
+        "name": "Malfunction",
+        "severity": "High",
+        "entity": {"type": "ApplicationInstance"},
+        "labels": {"k8s.cluster.name": "prod", "causely.ai/namespace": "payments"},
+        "slos": [{}],
+    },
+    "reject-severity": {
+        "name": "Malfunction",
+        "severity": "Low",
+        "entity": {"type": "ApplicationInstance"},
+        "labels": {"k8s.cluster.name": "prod", "causely.ai/namespace": "payments"},
+        "slos": [{}],
+    },
+    "reject-namespace": {
+        "name": "Malfunction",
+        "severity": "High",
+        "entity": {"type": "ApplicationInstance"},
+        "labels": {"k8s.cluster.name": "prod", "causely.ai/namespace": "kube-system"},
+        "slos": [{}],
+    },
+}
+
+
+def build_index():
+    index = FilterIndex(FieldRegistry(FIELD_DEFINITIONS), enabled=True)
+    index.add_filter("impactsSLO", "equals", True)
+    index.add_filter("labels.k8s.namespace.name", "not_in", ["kube-system", "istio-system"])
+    index.add_filter("entity.type", "not_equals", "Node")
+    index.add_filter("severity", "in", ["High", "Critical"])
+    index.add_filter("name", "not_in", ["CPUCongested", "MemoryCongested"])
+    return index
+
+
+def build_store(**filtering):
+    # One webhook per team: every webhook filters on severity and its own namespace
+    store = WebhookFilterStore(**filtering)
+    for i in range(STORE_WEBHOOKS):
+        store.add_webhook_filters(
+            f"team-{i}", [
+                {"field": "severity", "operator": "in", "value": ["High", "Critical"]},
+                {"field": "labels.k8s.namespace.name", "operator": "not_in", "value": [f"team-{i}-sandbox"]},
+            ], enabled=True,
+        )
+    return store
+
+
+def main():
+    index = build_index()
+    print(f"{'payload':<18}{'interpreted (us)':>18}{'compiled (us)':>16}{'speedup':>10}")
+    for label, payload in PAYLOADS.items():
+        assert index.check_payload(payload) == index.check_payload_interpreted(payload)
+        interpreted = timeit.timeit(lambda: index.check_payload_interpreted(payload), number=NUMBER)
+        compiled = timeit.timeit(lambda: index.check_payload(payload), number=NUMBER)
+        print(
+            f"{label:<18}{interpreted / NUMBER * 1e6:>18.3f}{compiled / NUMBER * 1e6:>16.3f}"
+            f"{interpreted / compiled:>9.1f}x",
+        )
+
+    store = build_store(decision_cache_size=0)
+    payload = PAYLOADS["match"]
+    elapsed = timeit.timeit(lambda: store.filter_payload(payload), number=STORE_NUMBER)
+    print(f"\nfilter_payload, {STORE_WEBHOOKS} webhooks: {elapsed / STORE_NUMBER * 1e6:.1f} us/payload")
+
+    # Payloads cycling through 50 namespaces and the 4 severities, so most routing decisions repeat
+    payloads = [
+        {**PAYLOADS["match"], "severity": severity, "labels": {"causely.ai/namespace": f"team-{i}-sandbox"}}
+        for i in range(50)
+        for severity in ["Low", "Medium", "High", "Critical"]
+    ]
+    cached_store = build_store()
+    payload_cycle = itertools.cycle(payloads)
+    elapsed = timeit.timeit(lambda: cached_store.filter_payload(next(payload_cycle)), number=STORE_NUMBER)
+    stats = cached_store.decision_cache.stats()
+    print(
+        f"filter_payload with decision cache, {STORE_WEBHOOKS} webhooks, {len(payloads)} distinct payloads: "
+        f"{elapsed / STORE_NUMBER * 1e6:.1f} us/payload (hit rate {stats['hit_rate']:.2f})",
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Benchmark the compiled message templates, producing the serialized body bytes the way deliver does.
+The 300 SLO payload shows that messages are rendered within their size budget, at about the cost of the 10 SLO one.
+
+Run from the project root:
+
+    python benchmarks/bench_render.py
+"""
+from __future__ import annotations
+
+import timeit
+
+from causely_notification.message_templates import DEFAULT_TEMPLATES
+from causely_notification.message_templates import MESSAGE_BUDGETS
+from causely_notification.message_templates import MessageTemplates
+from causely_notification.message_templates import SAMPLE_PAYLOAD
+from causely_notification.message_templates import template_context
+from causely_notification.message_templates import TemplateContexts
+
+NUMBER = 3_000
+REPEAT = 5
+
+PAYLOADS = {
+    "sample": SAMPLE_PAYLOAD,
+    "10 slos": {**SAMPLE_PAYLOAD, "slos": SAMPLE_PAYLOAD["slos"] * 10},
+    "300 slos": {**SAMPLE_PAYLOAD, "slos": SAMPLE_PAYLOAD["slos"] * 300},
+}
+
+
+def measure(function):
+    """Return the best time of a function over REPEAT runs, in microseconds per call."""
+    return min(timeit.repeat(function, number=NUMBER, repeat=REPEAT)) / NUMBER * 1e6
+
+
+def render_all(templates, payload):
+    """Render every built-in template the way deliver does, sharing the contexts of the payload."""
+    contexts = TemplateContexts(payload)
+    return [
+        templates.render(name, contexts.get(MESSAGE_BUDGETS[hook_type])).encode('utf-8')
+        for hook_type, name in DEFAULT_TEMPLATES.items()
+    ]
+
+
+def main():
+    templates = MessageTemplates()
+    # The template context is computed once per payload and budget and shared by every template using it,
+    # so it is timed separately
+    print(f"{'template':<20}{'payload':<10}{'render (us)':>14}")
+    for label, payload in PAYLOADS.items():
+        for hook_type, name in DEFAULT_TEMPLATES.items():
+            context = template_context(payload, MESSAGE_BUDGETS[hook_type])
+            rendered = measure(lambda: templates.render(name, context).encode('utf-8'))
+            print(f"{name:<20}{label:<10}{rendered:>14.1f}")
+        context_time = measure(lambda: template_context(payload, MESSAGE_BUDGETS['slack']))
+        print(f"{'template context':<20}{label:<10}{context_time:>14.1f}")
+
+    print(f"\n{'all four hook types':<20}{'payload':<10}{'render (us)':>14}")
+    for label, payload in PAYLOADS.items():
+        rendered = measure(lambda: render_all(templates, payload))
+        print(f"{'':<20}{label:<10}{rendered:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""
+Benchmark building the webhook lookup map and filter store for a 10k-webhook configuration.
+
+Every team and namespace has a Slack and a Jira webhook with the same filters, so the 10k webhooks have 5k
+distinct filter sets. Run from the project root:
+
+    python benchmarks/bench_startup.py
+
+Exits with status 1 if the build time or resident memory target is missed.
+"""
+from __future__ import annotations
+
+import os
+import resource
+import sys
+import time
+import timeit
+
+from causely_notification.server import populate_webhooks
+
+TEAMS = 250
+NAMESPACES_PER_TEAM = 20
+HOOK_TYPES = ["slack", "jira"]
+FILTER_NUMBER = 200
+
+# Targets for the 10k-webhook configuration
+BUILD_TIME_TARGET_S = 2.0
+RESIDENT_MEMORY_TARGET_MB = 150
+
+
+def build_config():
+    webhooks = []
+    for team in range(TEAMS):
+        for namespace in range(NAMESPACES_PER_TEAM):
+            for hook_type in HOOK_TYPES:
+                name = f"{hook_type}-team-{team}-ns-{namespace}"
+                os.environ[f"URL_{name.upper()}"] = f"https://{hook_type}.example.com/team-{team}"
+                os.environ[f"TOKEN_{name.upper()}"] = f"{hook_type}-token-{team}"
+                webhooks.append({
+                    "name": name,
+                    "hook_type": hook_type,
+                    "filters": {
+                        "enabled": True,
+                        "values": [
+                            {"field": "severity", "operator": "gte", "value": "High"},
+                            {
+                                "field": "labels.k8s.namespace.name", "operator": "equals",
+                                "value": f"team-{team}-ns-{namespace}",
+                            },
+                        ],
+                    },
+                })
+    return webhooks
+
+
+def max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+
+def main():
+    webhooks = build_config()
+    rss_before = max_rss_mb()
+    start = time.perf_counter()
+    filter_store, webhook_lookup_map = populate_webhooks(webhooks)
+    # The evaluation plan and decision cache projection are built on first use
+    filter_store.distinct_filter_indexes()
+    build_time = time.perf_counter() - start
+    rss_growth = max_rss_mb() - rss_before
+
+    print(f"webhooks: {len(webhook_lookup_map)}, distinct filter sets: {len(filter_store.filter_sets)}")
+    print(f"build time: {build_time:.2f} s (target {BUILD_TIME_TARGET_S:.1f} s)")
+    print(f"resident memory growth: {rss_growth:.1f} MB (target {RESIDENT_MEMORY_TARGET_MB} MB)")
+
+    payload = {"severity": "Critical", "labels": {"causely.ai/namespace": "team-7-ns-3"}}
+    assert filter_store.filter_payload(payload) == ["slack-team-7-ns-3", "jira-team-7-ns-3"]
+    filter_store.decision_cache.size = 0
+    elapsed = timeit.timeit(lambda: filter_store.filter_payload(payload), number=FILTER_NUMBER)
+    print(f"filter_payload without decision cache: {elapsed / FILTER_NUMBER * 1e3:.2f} ms/payload")
+
+    if build_time > BUILD_TIME_TARGET_S or rss_growth > RESIDENT_MEMORY_TARGET_MB:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
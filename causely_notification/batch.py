@@ -0,0 +1,189 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This script defines batch filtering of many payloads against a WebhookFilterStore, used for replay, backfill and
+batch ingest. Each filtered field is extracted into a dictionary-encoded column, every field check runs once per
+distinct value, and the webhook matches are combined as array operations with NumPy when it is installed.
+Filter groups (any, all, not) are evaluated row by row on the payloads the field filters matched.
+"""
+from __future__ import annotations
+
+from causely_notification.compiler import compile_filters
+from causely_notification.compiler import compile_value_check
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, batch filtering falls back to plain Python
+    np = None
+
+
+class EncodedColumn:
+    """
+    A field extracted from every payload of a batch, dictionary-encoded.
+    codes[i] is the index in values of the field value of payload i.
+    """
+
+    def __init__(self, field_values):
+        self.values = []
+        codes = []
+        lookup = {}
+        for value in field_values:
+            key = _dictionary_key(value)
+            if key is None:
+                # Unhashable values are never shared
+                codes.append(len(self.values))
+                self.values.append(value)
+                continue
+            code = lookup.get(key)
+            if code is None:
+                code = lookup[key] = len(self.values)
+                self.values.append(value)
+            codes.append(code)
+        self.codes = codes
+
+    def matching_codes(self, value_check):
+        """Return the codes of the distinct values passing the check."""
+        return [code for code, value in enumerate(self.values) if value_check(value)]
+
+
+def build_match_matrix(store, payloads, use_numpy=True):
+    """
+    Build the payload x webhook match matrix of a batch.
+
+    Args:
+        store (WebhookFilterStore): The store holding the webhook filters.
+        payloads (list): The payloads to filter.
+        use_numpy (bool): Use NumPy when it is installed.
+
+    Returns:
+        tuple: The webhook names, in column order, and the matrix as a boolean NumPy array or a list of lists.
+    """
+    payloads = list(payloads)
+    webhook_names = list(store.webhook_filters)
+    columns = _extract_columns(store, payloads)
+    views = _LazyViews(store.field_registry, payloads)
+
+    # Webhooks sharing a filter index share its column
+    computed = {}
+
+    if use_numpy and np is not None:
+        matrix = np.ones((len(payloads), len(webhook_names)), dtype=bool)
+        codes = {field: np.asarray(column.codes, dtype=np.int64) for field, column in columns.items()}
+        for j, webhook_name in enumerate(webhook_names):
+            filter_index = store.webhook_filters[webhook_name]
+            if not filter_index.enabled:
+                continue
+            if id(filter_index) in computed:
+                matrix[:, j] = matrix[:, computed[id(filter_index)]]
+                continue
+            computed[id(filter_index)] = j
+            column_mask = matrix[:, j]
+            for field, filters in filter_index.field_filters.items():
+                _, value_check = compile_value_check(filters)
+                matching = columns[field].matching_codes(value_check)
+                column_mask &= np.isin(codes[field], matching)
+            if filter_index.expressions:
+                column_mask &= np.fromiter(
+                    _expression_matches(filter_index, views, column_mask), dtype=bool, count=len(payloads),
+                )
+        return webhook_names, matrix
+
+    matrix = [[True] * len(webhook_names) for _ in payloads]
+    for j, webhook_name in enumerate(webhook_names):
+        filter_index = store.webhook_filters[webhook_name]
+        if not filter_index.enabled:
+            continue
+        if id(filter_index) in computed:
+            shared = computed[id(filter_index)]
+            for row in matrix:
+                row[j] = row[shared]
+            continue
+        computed[id(filter_index)] = j
+        for field, filters in filter_index.field_filters.items():
+            _, value_check = compile_value_check(filters)
+            matching = set(columns[field].matching_codes(value_check))
+            for i, code in enumerate(columns[field].codes):
+                if code not in matching:
+                    matrix[i][j] = False
+        if filter_index.expressions:
+            column_mask = [row[j] for row in matrix]
+            for i, match in enumerate(_expression_matches(filter_index, views, column_mask)):
+                matrix[i][j] = match
+    return webhook_names, matrix
+
+
+def filter_many(store, payloads, use_numpy=True):
+    """Return the matching webhook names of each payload, the same as calling filter_payload on each."""
+    webhook_names, matrix = build_match_matrix(store, payloads, use_numpy)
+    if use_numpy and np is not None:
+        return [[webhook_names[j] for j in np.flatnonzero(row)] for row in matrix]
+    return [[name for name, match in zip(webhook_names, row) if match] for row in matrix]
+
+
+def _expression_matches(filter_index, views, column_mask):
+    """
+    Evaluate the filter groups of a webhook row by row, only for the payloads its field filters matched.
+    Groups combine fields with any and not, so they are not split into per-field columns.
+    """
+    predicate = compile_filters({}, filter_index.field_registry, filter_index.expressions)
+    for i, match in enumerate(column_mask):
+        yield bool(match) and predicate(views[i])
+
+
+class _LazyViews:
+    """The PayloadViews of a batch, created on first use and shared between webhooks."""
+
+    def __init__(self, field_registry, payloads):
+        self.field_registry = field_registry
+        self.payloads = payloads
+        self.views = [None] * len(payloads)
+
+    def __getitem__(self, i):
+        view = self.views[i]
+        if view is None:
+            view = self.views[i] = self.field_registry.view(self.payloads[i])
+        return view
+
+
+def _extract_columns(store, payloads):
+    """Extract one column per registered field referenced by an enabled webhook filter."""
+    fields = []
+    for filter_index in store.distinct_filter_indexes():
+        if not filter_index.enabled:
+            continue
+        for field in filter_index.field_filters:
+            if field not in fields:
+                fields.append(field)
+
+    columns = {}
+    for field in fields:
+        extractor = store.field_registry.get_extractor(field)
+        columns[field] = EncodedColumn(extractor(payload) for payload in payloads)
+    return columns
+
+
+def _dictionary_key(value):
+    """
+    Return the dictionary key of a field value, or None if the value cannot be shared.
+    The type is part of the key so that values comparing equal across types (True, 1, 1.0) keep distinct
+    string forms for membership checks.
+    """
+    try:
+        hash(value)
+    except TypeError:
+        return None
+    return (type(value), value)
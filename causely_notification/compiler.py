@@ -0,0 +1,197 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This script compiles the filters of a FilterIndex into a single predicate. Operators are resolved and their values
+converted once, when the filter is added, so checking a payload only runs the bound checks, cheapest first.
+Conjunctions and disjunctions of several checks are evaluated by an AdaptiveGroup, which can reorder them by their
+observed selectivity.
+"""
+from __future__ import annotations
+
+from causely_notification.expression import AdaptiveGroup
+from causely_notification.expression import Check
+from causely_notification.op import Operator
+from causely_notification.patterns import compile_pattern_test
+
+# Relative cost of extracting a field, by field definition type, in units of roughly one dict lookup.
+# Direct and map paths use precompiled accessors, computed fields call a function on the payload.
+# Fields registered without a definition run arbitrary code and are checked last.
+FIELD_TYPE_COST = {
+    'direct': 1,
+    'map_path': 2,
+    'computed': 2,
+}
+DEFAULT_FIELD_COST = 4
+
+# Relative cost of a value check, by operator. Membership checks hash the value, the rest compare it.
+# Membership sets stringify the value first, and large ones also check a Bloom filter.
+MEMBERSHIP_COST = 1
+BLOOM_COST = 4
+# Prefix checks walk the shared prefix trie and comparisons bisect the shared sorted thresholds,
+# both once per payload value for all webhooks.
+OPERATOR_COST = {
+    'equals': 0,
+    'not_equals': 0,
+    'in': 1,
+    'not_in': 1,
+    'starts_with': 2,
+    'not_starts_with': 2,
+    'glob': 5,
+    'not_glob': 5,
+    'matches': 5,
+    'not_matches': 5,
+    'gte': 1,
+    'lte': 1,
+    'gt': 1,
+    'lt': 1,
+}
+
+
+def compile_filters(field_filters, field_registry, expressions=()):
+    """
+    Compile the field filters and filter expressions of a FilterIndex into a predicate taking a PayloadView.
+
+    Args:
+        field_filters (dict): The FilterIndex field filters, keyed by field name.
+        field_registry (FieldRegistry): The registry the PayloadView field IDs come from.
+        expressions (list): The FilterIndex filter groups, see compile_expression.
+
+    Returns:
+        callable: A function returning True if the payload view matches all filters.
+    """
+    return compile_check(field_filters, field_registry, expressions).predicate
+
+
+def compile_check(field_filters, field_registry, expressions=()):
+    """
+    Compile the field filters and filter expressions of a FilterIndex into a Check.
+    Its group is the AdaptiveGroup recording the selectivity of the checks, or None if there is nothing to order.
+    """
+    checks = [
+        _compile_field_check(field, field, filters, field_registry)
+        for field, filters in field_filters.items()
+    ]
+    checks.extend(
+        compile_expression(node, field_registry)
+        for node in expressions
+    )
+    if not checks:
+        return Check('all()', 0, lambda view: True)
+    if len(checks) == 1:
+        return checks[0]
+    return _compile_group('all', checks)
+
+
+def compile_expression(node, field_registry):
+    """
+    Compile a filter expression node into a Check.
+
+    Args:
+        node (tuple): ('field', name, field, filters) for a field filter, ('all', [nodes]) or ('any', [nodes])
+            for a group, or ('not', node).
+        field_registry (FieldRegistry): The registry the PayloadView field IDs come from.
+
+    Returns:
+        Check: The predicate taking a PayloadView with its name and estimated cost.
+    """
+    kind = node[0]
+    if kind == 'field':
+        _, name, field, filters = node
+        return _compile_field_check(name, field, filters, field_registry)
+    if kind == 'not':
+        check = compile_expression(node[1], field_registry)
+        predicate = check.predicate
+        sampled = check.sampled
+        return Check(
+            f"not {check.name}", check.cost,
+            lambda view: not predicate(view),
+            lambda view: not sampled(view),
+            check.group,
+        )
+
+    checks = [compile_expression(child, field_registry) for child in node[1]]
+    if len(checks) == 1:
+        return checks[0]
+    return _compile_group(kind, checks)
+
+
+def compile_value_check(filters):
+    """
+    Compile the filters of a single field into a check on the extracted field value.
+
+    Args:
+        filters (dict): The FilterIndex filters of one field.
+
+    Returns:
+        tuple: The estimated cost of the check and a function returning True if the value matches.
+    """
+    tests = []
+    members = filters['members']
+    if members is not None:
+        cost = MEMBERSHIP_COST if members.bloom is None else BLOOM_COST
+        tests.append((cost, members.compile()))
+    for op in filters['operator']:
+        operator = op['operator']
+        if op.get('prefix_trie') is not None:
+            test = compile_pattern_test(operator, op['value'], op['prefix_trie'])
+        elif op.get('thresholds') is not None:
+            test = op['thresholds'].compile_test(operator, op['value'])
+        else:
+            test = Operator(operator).compile(op['value'])
+        tests.append((OPERATOR_COST.get(operator, 1), test))
+    tests.sort(key=lambda test: test[0])
+    cost = sum(cost for cost, _ in tests)
+    tests = tuple(test for _, test in tests)
+
+    if len(tests) == 1:
+        test = tests[0]
+
+        def check_single(value):
+            # If the field value is None, the filter does not match
+            return value is not None and test(value)
+        return cost, check_single
+
+    def check_all(value):
+        if value is None:
+            return False
+        for test in tests:
+            if not test(value):
+                return False
+        return True
+    return cost, check_all
+
+
+def _compile_field_check(name, field, filters, field_registry):
+    """Return a Check reading a field from the payload view and applying its value check."""
+    field_id = field_registry.get_field_id(field)
+    cost, value_check = compile_value_check(filters)
+    field_cost = FIELD_TYPE_COST.get(
+        field_registry.get_field_type(field), DEFAULT_FIELD_COST,
+    )
+    return Check(name, field_cost + cost, lambda view: value_check(view.get(field_id)))
+
+
+def _compile_group(kind, checks):
+    """Return a Check evaluating checks in an AdaptiveGroup, short-circuiting on the first deciding check."""
+    group = AdaptiveGroup(kind, checks)
+    return Check(
+        f"{kind}({', '.join(check.name for check in group.checks)})",
+        sum(check.cost for check in checks),
+        group.evaluate,
+        group.evaluate_sampled,
+        group,
+    )
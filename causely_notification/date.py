@@ -14,28 +14,69 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+"""
+This script formats the ISO 8601 timestamps of notifications for display.
+Timestamps are parsed with datetime.fromisoformat, and each formatted result is kept in an LRU cache keyed by the
+raw string, the display timezone and the format, so all renderers of a payload share one parse.
+"""
 from __future__ import annotations
 
+import functools
 from datetime import datetime
+from datetime import timezone as dt_timezone
+from zoneinfo import ZoneInfo
+from zoneinfo import ZoneInfoNotFoundError
 
+DEFAULT_DATE_FORMAT = "%B %d, %Y at %I:%M:%S %p"
 
-def parse_iso_date(iso_date_str):
+# Maximum number of formatted timestamps kept
+DATE_CACHE_SIZE = 1024
+
+
+def parse_iso_date(iso_date_str, timezone=None, date_format=None):
     """
     Parse an ISO 8601 date string and return a human-readable format.
 
     Args:
         iso_date_str (str): The ISO 8601 date string.
+        timezone (str): Optional IANA timezone to display the date in, e.g. "Europe/Berlin".
+            By default the date is displayed as it was given.
+        date_format (str): Optional strftime format, DEFAULT_DATE_FORMAT by default.
 
     Returns:
-        str: A human-readable date string.
+        str: A human-readable date string, or the original string if it is not an ISO 8601 date.
     """
     if iso_date_str is None:
         return "Unknown"
+    return _format_iso_date(iso_date_str, timezone, date_format or DEFAULT_DATE_FORMAT)
+
+
+def validate_timezone(timezone):
+    """Raise ValueError if a display timezone is not a known IANA timezone."""
+    try:
+        _zone(timezone)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"Unknown timezone '{timezone}'") from e
+
+
+@functools.lru_cache(maxsize=None)
+def _zone(timezone):
+    return ZoneInfo(timezone)
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def _format_iso_date(iso_date_str, timezone, date_format):
     try:
-        # Parse the ISO 8601 date string
-        parsed_date = datetime.strptime(iso_date_str[:19], "%Y-%m-%dT%H:%M:%S")
-        # Convert to human-readable format
-        readable_date = parsed_date.strftime("%B %d, %Y at %I:%M:%S %p")
-        return readable_date
+        parsed_date = datetime.fromisoformat(iso_date_str)
     except ValueError:
-        return iso_date_str
+        try:
+            # Fall back to the date and time without fractional seconds or offset
+            parsed_date = datetime.strptime(iso_date_str[:19], "%Y-%m-%dT%H:%M:%S")
+        except ValueError:
+            return iso_date_str
+    if timezone is not None:
+        if parsed_date.tzinfo is None:
+            # Timestamps without an offset are in UTC
+            parsed_date = parsed_date.replace(tzinfo=dt_timezone.utc)
+        parsed_date = parsed_date.astimezone(_zone(timezone))
+    return parsed_date.strftime(date_format)
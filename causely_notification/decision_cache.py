@@ -0,0 +1,124 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""
+This script defines the routing decision cache of a WebhookFilterStore. A payload is projected onto the fields
+referenced by any filter, and the matching webhooks are cached per projection, so payloads sharing the same
+filtered values skip the filter evaluation. Fields seen with too many distinct values make most projections
+unique, so the cache bypasses itself while such a field is projected.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+# Maximum number of cached routing decisions
+DECISION_CACHE_SIZE = 4096
+# Distinct values of a projected field above which the cache is bypassed
+HIGH_CARDINALITY_THRESHOLD = 1000
+
+
+class DecisionCache:
+    """LRU cache of the matching webhooks, keyed by the projection of the payload onto the filtered fields."""
+
+    def __init__(self, size=DECISION_CACHE_SIZE, high_cardinality_threshold=HIGH_CARDINALITY_THRESHOLD):
+        self.size = size
+        self.high_cardinality_threshold = high_cardinality_threshold
+        self._lock = threading.Lock()
+        self.configure({})
+
+    def configure(self, fields):
+        """
+        Set the projected fields, as a {field name: field ID} dict, and invalidate all cached decisions.
+        Called whenever the webhook filters change.
+        """
+        with self._lock:
+            self.fields = dict(fields)
+            self._field_ids = tuple(self.fields.values())
+            self._distinct = [set() for _ in self._field_ids]
+            self.high_cardinality_fields = []
+            self._entries = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+            self.bypassed = 0
+
+    def key(self, view):
+        """Return the cache key of a PayloadView, or None if the cache is bypassed for it."""
+        if self.size <= 0 or self.high_cardinality_fields:
+            self.bypassed += 1
+            return None
+        # Values are tagged with their type: True, 1 and 1.0 are equal but can route differently
+        key = []
+        for field_id in self._field_ids:
+            value = view.get(field_id)
+            key.append(value.__class__)
+            key.append(value)
+        key = tuple(key)
+        try:
+            hash(key)
+        except TypeError:
+            # Lists and dicts cannot be cached
+            self.bypassed += 1
+            return None
+        self._track_cardinality(key)
+        return key
+
+    def _track_cardinality(self, key):
+        threshold = self.high_cardinality_threshold
+        for i, distinct in enumerate(self._distinct):
+            if len(distinct) <= threshold:
+                distinct.add(key[2 * i:2 * i + 2])
+                if len(distinct) > threshold:
+                    names = list(self.fields)
+                    self.high_cardinality_fields.append(names[i])
+                    with self._lock:
+                        # Projections with a high-cardinality field are mostly unique, so the entries are dropped
+                        self._entries.clear()
+
+    def get(self, key):
+        """Return the cached matching webhooks of a key, or None on a miss."""
+        with self._lock:
+            decision = self._entries.get(key)
+            if decision is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return decision
+
+    def put(self, key, decision):
+        """Cache the matching webhooks of a key, evicting the least recently used decision when full."""
+        with self._lock:
+            if self.high_cardinality_fields:
+                return
+            self._entries[key] = decision
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'capacity': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'projected_fields': list(self.fields),
+            'high_cardinality_fields': list(self.high_cardinality_fields),
+        }
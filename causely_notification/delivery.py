@@ -0,0 +1,217 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This script delivers a payload to the webhooks it matched, with rendering split from delivery.
+The payload is rendered once per message template and timestamp display settings, and the body bytes are shared
+by every webhook using them. Messages are rendered within the size budget of their hook type, and a body still
+over the byte limit of its destination is rendered again with a smaller budget. Webhooks posting the same body to
+the same URL with the same headers are sent a single POST, and its response is reported for each of them.
+Slack webhooks with a channel are threaded by root cause with the Slack Web API, Jira webhooks keep one issue and
+Opsgenie webhooks one alert per root cause. These are delivered one by one, as are GitHub and debug webhooks.
+"""
+from __future__ import annotations
+
+import json
+import sys
+import threading
+
+import requests
+
+from causely_notification.debug import forward_to_debug
+from causely_notification.github import forward_to_github
+from causely_notification.jira import forward_to_jira_issue
+from causely_notification.message_templates import DEFAULT_BUDGET
+from causely_notification.message_templates import DEFAULT_TEMPLATES
+from causely_notification.message_templates import MESSAGE_BUDGETS
+from causely_notification.message_templates import MessageTemplates
+from causely_notification.message_templates import TemplateContexts
+from causely_notification.object_index import ObjectIndexes
+from causely_notification.opsgenie import forward_to_opsgenie_alert
+from causely_notification.slack import forward_to_slack_thread
+from causely_notification.utils import make_error_response
+
+REQUEST_TIMEOUT = 30
+
+
+def _json_headers(authorization=None):
+    headers = {'Content-Type': 'application/json'}
+    if authorization is not None:
+        headers['Authorization'] = authorization
+    return headers
+
+
+def _generic_target(webhook):
+    authorization = f"Bearer {webhook.token}" if webhook.token else None
+    return webhook.url, _json_headers(authorization)
+
+
+# Hook types delivered with a rendered body, by the function returning the URL and headers of a webhook's request
+REQUEST_TARGETS = {
+    'slack': lambda webhook: (webhook.url, _json_headers(f"Bearer {webhook.token}")),
+    'teams': lambda webhook: (webhook.url, _json_headers()),
+    'generic': _generic_target,
+}
+# Hook types delivered with a rendered body, each webhook keeping one issue or alert per root cause
+ROOT_CAUSE_HOOK_TYPES = {'jira', 'opsgenie'}
+
+
+def is_root_cause_webhook(webhook):
+    """Return True if a webhook keeps one message, issue or alert per root cause, which updates change."""
+    hook_type = webhook.hook_type.lower()
+    if hook_type == 'slack':
+        return webhook.channel is not None
+    return hook_type in ROOT_CAUSE_HOOK_TYPES or hook_type == 'github'
+
+
+class DeliveryStats:
+    """
+    Counts of the bodies rendered, the POSTs sent, the deliveries collapsed into another POST, and the bodies
+    rendered again with a smaller budget to fit the size limit of their destination.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.posted = 0
+        self.collapsed = 0
+        self.reduced = 0
+
+    def record(self, rendered, posted, collapsed, reduced=0):
+        with self._lock:
+            self.rendered += rendered
+            self.posted += posted
+            self.collapsed += collapsed
+            self.reduced += reduced
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rendered": self.rendered,
+                "posted": self.posted,
+                "collapsed": self.collapsed,
+                "reduced": self.reduced,
+            }
+
+
+delivery_stats = DeliveryStats()
+
+_default_templates = None
+# The objectId indexes of Slack channel and Jira webhooks when none are given, kept in memory only
+_memory_indexes = ObjectIndexes()
+
+
+def default_templates():
+    """Return the built-in message templates, compiled on first use."""
+    global _default_templates
+    if _default_templates is None:
+        _default_templates = MessageTemplates()
+    return _default_templates
+
+
+def template_name(webhook):
+    """Return the name of the template a webhook is rendered with, or None to forward the payload as is."""
+    return webhook.template or DEFAULT_TEMPLATES.get(webhook.hook_type)
+
+
+def deliver(payload, webhooks, templates=None, stats=delivery_stats, indexes=None):
+    """
+    Deliver a payload to webhooks.
+
+    Args:
+        payload (dict): The notification payload.
+        webhooks (list): The WebhookDefinitions of the matching webhooks.
+        templates (MessageTemplates): The compiled message templates, the built-in ones by default.
+        stats (DeliveryStats): The counters to update.
+        indexes (ObjectIndexes): The objectId index of each Slack channel and Jira webhook.
+
+    Returns:
+        list: (webhook, response) pairs in webhook order. The response is None for an unknown hook type.
+    """
+    if templates is None:
+        templates = default_templates()
+    if indexes is None:
+        indexes = _memory_indexes
+    contexts = TemplateContexts(payload)
+    bodies = {}
+    responses = {}
+    results = []
+    collapsed = 0
+    reduced = 0
+    separate = 0
+    for webhook in webhooks:
+        hook_type = webhook.hook_type
+        target = REQUEST_TARGETS.get(hook_type)
+        if target is not None or hook_type in ROOT_CAUSE_HOOK_TYPES:
+            name = template_name(webhook)
+            # Payloads forwarded as is do not depend on the timestamp display settings
+            key = (name, webhook.timezone, webhook.date_format) if name is not None else None
+            body = bodies.get(key)
+            if body is None:
+                if name is None:
+                    # Serialized the same way requests serializes a json argument
+                    body = json.dumps(payload, allow_nan=False).encode('utf-8')
+                else:
+                    budget = MESSAGE_BUDGETS.get(hook_type, DEFAULT_BUDGET)
+                    context = contexts.get(budget, webhook.timezone, webhook.date_format)
+                    body = templates.render(name, context).encode('utf-8')
+                    # Rendering stops at the budget limits, so this only loops for unusually long texts
+                    while budget.max_bytes is not None and len(body) > budget.max_bytes and budget.reducible():
+                        budget = budget.reduce()
+                        context = contexts.get(budget, webhook.timezone, webhook.date_format)
+                        body = templates.render(name, context).encode('utf-8')
+                        reduced += 1
+                bodies[key] = body
+            # Webhooks keeping one message, issue or alert per root cause are never collapsed
+            if hook_type == 'slack' and webhook.channel is not None:
+                response = forward_to_slack_thread(
+                    payload, json.loads(body), webhook.url, webhook.token, webhook.channel, indexes.get(webhook.name),
+                )
+                separate += 1
+            elif hook_type == 'jira':
+                response = forward_to_jira_issue(
+                    payload, json.loads(body), webhook.url, webhook.token, webhook.project, indexes.get(webhook.name),
+                )
+                separate += 1
+            elif hook_type == 'opsgenie':
+                response = forward_to_opsgenie_alert(payload, json.loads(body), webhook.url, webhook.token)
+                separate += 1
+            else:
+                url, headers = target(webhook)
+                key = (url, tuple(headers.items()), body)
+                response = responses.get(key)
+                if response is None:
+                    response = responses[key] = _post(url, body, headers)
+                else:
+                    collapsed += 1
+        elif hook_type == "github":
+            response = forward_to_github(payload, webhook.url, webhook.token, assignee=webhook.assignee)
+        elif hook_type == "debug":
+            response = forward_to_debug(payload, webhook.url, webhook.token)
+        else:
+            response = None
+        results.append((webhook, response))
+    stats.record(len(bodies), len(responses) + separate, collapsed, reduced)
+    return results
+
+
+def _post(url, body, headers):
+    """POST a serialized body, returning a synthetic error response if the request fails."""
+    try:
+        return requests.post(url, data=body, headers=headers, timeout=REQUEST_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        print(f"Exception occurred while posting to {url}: {e}", file=sys.stderr)
+        return make_error_response(500, f"Request failed: {str(e)}")
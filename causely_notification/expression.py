@@ -0,0 +1,208 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""
+This script defines boolean filter expressions. Besides plain field filters, the filter values of a webhook can hold
+nested groups:
+
+    - any: [<filter or group>, ...]   matches if one of the entries matches
+    - all: [<filter or group>, ...]   matches if every entry matches
+    - not: <filter or group>          matches if the entry does not match
+
+Groups, and the implicit conjunction of a webhook's filters, are evaluated by AdaptiveGroup, which short-circuits.
+Sampled evaluations also record which check decided the result, and reorder() sorts the checks so the cheapest,
+most selective ones run first.
+"""
+from __future__ import annotations
+
+GROUP_KINDS = ('any', 'all', 'not')
+
+# Every SAMPLE_INTERVAL-th payload is evaluated with the recording predicates
+SAMPLE_INTERVAL = 10
+# Payloads between two reorderings of the checks
+REORDER_INTERVAL = 10000
+
+
+def group_of(filter_):
+    """
+    Return the (kind, operand) of a filter group, or None for a plain field filter.
+
+    Raises:
+        ValueError: If the group is malformed.
+    """
+    if not isinstance(filter_, dict) or 'field' in filter_:
+        return None
+    kinds = [kind for kind in GROUP_KINDS if kind in filter_]
+    if len(kinds) != 1 or len(filter_) != 1:
+        raise ValueError(
+            f"A filter must have 'field', 'operator' and 'value', or exactly one of {
+                list(GROUP_KINDS)
+            }, but got {filter_!r}",
+        )
+    kind = kinds[0]
+    operand = filter_[kind]
+    if kind == 'not':
+        if not isinstance(operand, dict):
+            raise ValueError(f"'not' requires a single filter or group, but got {operand!r}")
+    elif not isinstance(operand, list) or not operand:
+        raise ValueError(f"'{kind}' requires a non-empty list of filters or groups, but got {operand!r}")
+    return kind, operand
+
+
+class Check:
+    """
+    An entry of an AdaptiveGroup: a predicate on a PayloadView with its static cost and observed outcomes.
+    sampled is the same predicate, recording the outcomes of nested groups.
+    """
+
+    __slots__ = ('name', 'cost', 'predicate', 'sampled', 'group', 'evaluated', 'passed')
+
+    def __init__(self, name, cost, predicate, sampled=None, group=None):
+        self.name = name
+        self.cost = cost
+        self.predicate = predicate
+        self.sampled = sampled if sampled is not None else predicate
+        # The nested AdaptiveGroup behind the predicate, if any
+        self.group = group
+        self.evaluated = 0
+        self.passed = 0
+
+    def pass_rate(self):
+        # Laplace smoothing, so checks that were never evaluated count as 50% selective
+        return (self.passed + 1) / (self.evaluated + 2)
+
+    def stats(self):
+        stats = {
+            'predicate': self.name,
+            'cost': self.cost,
+            'evaluated': self.evaluated,
+            'passed': self.passed,
+            'selectivity': self.passed / self.evaluated if self.evaluated else None,
+        }
+        if self.group is not None:
+            stats['group'] = self.group.stats()
+        return stats
+
+
+class AdaptiveGroup:
+    """
+    A short-circuiting 'all' or 'any' over checks.
+    evaluate runs the checks in the current order. evaluate_sampled also counts the position of the deciding check
+    (the first failing check of an 'all', the first passing check of an 'any'), which is enough to derive how often
+    every check was evaluated and passed. reorder() then sorts the checks by cost divided by the probability that
+    they decide the result.
+    """
+
+    def __init__(self, kind, checks):
+        if kind not in ('all', 'any'):
+            raise ValueError(f"Invalid group kind '{kind}'")
+        self.kind = kind
+        self.evaluations = 0
+        # sort() is stable, so checks of equal cost keep their configuration order
+        self.checks = sorted(checks, key=lambda check: check.cost)
+        # The evaluators read the current order from this list, so reordering never recompiles the callers
+        self._state = [None, None]
+        self._install()
+        if kind == 'all':
+            self.evaluate, self.evaluate_sampled = _compile_all(self._state)
+        else:
+            self.evaluate, self.evaluate_sampled = _compile_any(self._state)
+
+    def _install(self):
+        # The sampled predicates and their outcome counts are replaced together, so a concurrent sampled
+        # evaluation counts its outcome in a histogram of the same length
+        self._state[1] = (
+            tuple(check.sampled for check in self.checks), [0] * (len(self.checks) + 1),
+        )
+        self._state[0] = tuple(check.predicate for check in self.checks)
+
+    def reorder(self):
+        """Fold the recorded outcomes into the checks' counts and reorder them, nested groups first."""
+        for check in self.checks:
+            if check.group is not None:
+                check.group.reorder()
+        self._collect()
+        if self.kind == 'all':
+            def rank(check):
+                return check.cost / max(1 - check.pass_rate(), 1e-6)
+        else:
+            def rank(check):
+                return check.cost / max(check.pass_rate(), 1e-6)
+        self.checks = sorted(self.checks, key=rank)
+        self._install()
+
+    def _collect(self):
+        _, outcomes = self._state[1]
+        counts = list(outcomes)
+        outcomes[:] = [0] * len(outcomes)
+        reached = sum(counts)
+        self.evaluations += reached
+        for position, check in enumerate(self.checks):
+            decided = counts[position]
+            check.evaluated += reached
+            if self.kind == 'any':
+                check.passed += decided
+            else:
+                check.passed += reached - decided
+            reached -= decided
+
+    def stats(self):
+        """Return the observed selectivity of the checks, in their current evaluation order."""
+        self._collect()
+        return {
+            'kind': self.kind,
+            'evaluations': self.evaluations,
+            'checks': [check.stats() for check in self.checks],
+        }
+
+
+def _compile_all(state):
+    def evaluate(view):
+        for predicate in state[0]:
+            if not predicate(view):
+                return False
+        return True
+
+    def evaluate_sampled(view):
+        predicates, outcomes = state[1]
+        position = 0
+        for predicate in predicates:
+            if not predicate(view):
+                break
+            position += 1
+        outcomes[position] += 1
+        return position == len(predicates)
+    return evaluate, evaluate_sampled
+
+
+def _compile_any(state):
+    def evaluate(view):
+        for predicate in state[0]:
+            if predicate(view):
+                return True
+        return False
+
+    def evaluate_sampled(view):
+        predicates, outcomes = state[1]
+        position = 0
+        for predicate in predicates:
+            if predicate(view):
+                break
+            position += 1
+        outcomes[position] += 1
+        return position < len(predicates)
+    return evaluate, evaluate_sampled
@@ -16,9 +16,16 @@
 
 """
 This script defines field registry class which stores all the valid fields and how to access them in the payload.
+Besides the defined fields, any "labels.<key>" and any other dotted path can be filtered on: their accessors are
+created on demand. Computed fields can be added without changing this file, with the computed_field decorator or
+a "module:function" reference.
 """
-# TODO: Add more fields as needed
 from __future__ import annotations
+
+import importlib
+import threading
+from collections import OrderedDict
+
 FIELD_DEFINITIONS = {
     "severity": {"type": "direct", "path": "severity"},
     "entity.type": {"type": "direct", "path": "entity.type"},
@@ -26,18 +33,61 @@ FIELD_DEFINITIONS = {
     "labels.k8s.namespace.name": {"type": "map_path", "path": "labels", "map_key": "causely.ai/namespace"},
     "impactsSLO": {"type": "computed", "func": "compute_impact_slo"},
     "name": {"type": "direct", "path": "name"},
+    "entity.name": {"type": "direct", "path": "entity.name"},
 }
 
+# Maximum number of on-demand accessors kept for dynamic fields that are looked up but not filtered on
+DYNAMIC_FIELD_CACHE_SIZE = 1024
+
+# Computed fields registered by plugins with the computed_field decorator, by field name
+COMPUTED_FIELDS = {}
+
+
+def computed_field(field_name):
+    """
+    Register the decorated function as a computed field, available to every FieldRegistry.
+    The function takes the payload and returns the field value; it runs at most once per payload and field.
+    """
+    def register(func):
+        COMPUTED_FIELDS[field_name] = func
+        return func
+    return register
+
+
+def resolve_function(reference):
+    """Return the function referenced by a "module:function" string."""
+    module_name, _, func_name = reference.partition(':')
+    if not module_name or not func_name:
+        raise ValueError(f"Function reference '{reference}' must have the form 'module:function'.")
+    try:
+        func = getattr(importlib.import_module(module_name), func_name, None)
+    except ImportError as error:
+        raise ValueError(f"Module '{module_name}' of function reference '{reference}' not found.") from error
+    if not callable(func):
+        raise ValueError(f"Function '{reference}' not found.")
+    return func
+
 
 class FieldRegistry:
     """
     Manages field access and computation for nested and computed fields in a payload.
     """
 
-    def __init__(self, field_definitions):
+    def __init__(self, field_definitions, computed_fields=None, dynamic_cache_size=DYNAMIC_FIELD_CACHE_SIZE):
         self.registry = {}
+        # Field IDs index the extractors list, so hot paths avoid string-keyed lookups
+        self.field_ids = {}
+        self.extractors = []
+        self.field_types = {}
         self.field_definitions = field_definitions
+        # Accessors of dynamic fields only looked up by name, least recently used first
+        self.dynamic_cache_size = dynamic_cache_size
+        self._dynamic_extractors = OrderedDict()
+        self._dynamic_lock = threading.Lock()
         self._register_fields()
+        # Computed fields from the configuration, as {"field name": "module:function"}
+        for field_name, reference in (computed_fields or {}).items():
+            self.register_field(field_name, resolve_function(reference), 'computed')
 
     def _register_fields(self):
         """Automatically register all fields based on the field definitions."""
@@ -47,32 +97,105 @@ class FieldRegistry:
                     field_name, self._create_extractor_for_path(
                         config['path'],
                     ),
+                    'direct',
                 )
             elif config['type'] == 'computed':
+                # Functions are looked up in this module, then as "module:function" references
                 func = globals().get(config['func'])
+                if func is None and ':' in config['func']:
+                    func = resolve_function(config['func'])
                 if func is None:
                     raise ValueError(f"Function '{config['func']}' for field '{
                                      field_name
                                      }' not found.")
-                self.register_field(field_name, func)
+                self.register_field(field_name, func, 'computed')
             elif config['type'] == 'map_path':
                 self.register_field(
                     field_name, self._create_extractor_for_map_path(
                         config['path'], config['map_key']
                     ),
+                    'map_path',
                 )
 
-    def register_field(self, field_name, extractor_func):
+    def register_field(self, field_name, extractor_func, field_type=None):
         """Register a field with an extraction function."""
         self.registry[field_name] = extractor_func
+        self.field_types[field_name] = field_type
+        field_id = self.field_ids.get(field_name)
+        if field_id is None:
+            self.field_ids[field_name] = len(self.extractors)
+            self.extractors.append(extractor_func)
+        else:
+            self.extractors[field_id] = extractor_func
 
     def get_field_value(self, payload, field_name):
-        """Retrieve the value of the field from the payload using the registered extractor."""
-        if field_name not in self.registry:
-            raise ValueError(f"Field '{field_name}' is not registered.")
+        """Retrieve the value of the field from the payload, or from a PayloadView, using the field's extractor."""
+        if isinstance(payload, PayloadView):
+            field_id = self.field_ids.get(field_name)
+            if field_id is not None and field_id < len(payload._values):
+                return payload.get(field_id)
+            payload = payload.payload
+        return self.get_extractor(field_name)(payload)
 
-        extractor_func = self.registry[field_name]
-        return extractor_func(payload)
+    def get_extractor(self, field_name):
+        """Return the extraction function for a registered, plugin or dynamic field."""
+        extractor = self.registry.get(field_name)
+        if extractor is not None:
+            return extractor
+        if field_name in COMPUTED_FIELDS:
+            return COMPUTED_FIELDS[field_name]
+        return self._dynamic_extractor(field_name)
+
+    def get_field_id(self, field_name):
+        """
+        Return the ID of a field, used to read it from a PayloadView.
+        Plugin and dynamic fields are registered on first use, so filters keep a stable ID for them.
+        """
+        field_id = self.field_ids.get(field_name)
+        if field_id is not None:
+            return field_id
+        if field_name in COMPUTED_FIELDS:
+            self.register_field(field_name, COMPUTED_FIELDS[field_name], 'computed')
+        else:
+            field_type, extractor = self._create_dynamic_extractor(field_name)
+            self.register_field(field_name, extractor, field_type)
+        return self.field_ids[field_name]
+
+    def _dynamic_extractor(self, field_name):
+        """Return the accessor of a dynamic field from the bounded cache, creating it on a miss."""
+        with self._dynamic_lock:
+            extractor = self._dynamic_extractors.get(field_name)
+            if extractor is not None:
+                self._dynamic_extractors.move_to_end(field_name)
+                return extractor
+        _, extractor = self._create_dynamic_extractor(field_name)
+        with self._dynamic_lock:
+            self._dynamic_extractors[field_name] = extractor
+            while len(self._dynamic_extractors) > self.dynamic_cache_size:
+                self._dynamic_extractors.popitem(last=False)
+        return extractor
+
+    def _create_dynamic_extractor(self, field_name):
+        """
+        Return the field type and accessor of a dynamic field: "labels.<key>" reads a key of the labels map and
+        any other dotted path reads a nested value. Other names must be registered.
+        """
+        if field_name.startswith('labels.') and len(field_name) > len('labels.'):
+            return 'map_path', compile_map_accessor('labels', field_name[len('labels.'):])
+        if '.' in field_name and all(field_name.split('.')):
+            return 'direct', compile_path_accessor(field_name)
+        raise ValueError(f"Field '{field_name}' is not registered.")
+
+    def view(self, payload):
+        """Return a PayloadView extracting each field of the payload at most once."""
+        return PayloadView(payload, self)
+
+    def get_field_type(self, field_name):
+        """Return the definition type of a field, or None for manually registered fields."""
+        field_type = self.field_types.get(field_name)
+        if field_type is not None:
+            return field_type
+        return self.field_definitions.get(field_name, {}).get('type')
 
     def list_fields(self):
         """List all available registered fields."""
@@ -80,11 +203,98 @@ class FieldRegistry:
 
     def _create_extractor_for_path(self, field_path):
         """Return an extractor function for a simple dot-notated field path."""
-        return lambda payload: get_nested_value(payload, field_path.split('.'))
+        return compile_path_accessor(field_path)
 
     def _create_extractor_for_map_path(self, field_path, map_key):
-        """Return an extractor function for a simple dot-notated field path."""
-        return lambda payload: get_map_value(payload, field_path, map_key)
+        """Return an extractor function for a key of the map found at a dot-notated field path."""
+        return compile_map_accessor(field_path, map_key)
+
+
+def compile_path_accessor(field_path):
+    """
+    Compile a dot-notated field path into an accessor with the same results as get_nested_value.
+    The flat dotted key and the nested keys are computed once, and short paths get an unrolled accessor.
+    Intermediate values that are not dicts yield None.
+    """
+    keys = tuple(field_path.split('.'))
+
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda payload: payload.get(key)
+
+    if len(keys) == 2:
+        first, second = keys
+
+        def access_two(payload):
+            if field_path in payload:
+                return payload[field_path]
+            value = payload.get(first)
+            if not isinstance(value, dict):
+                return None
+            return value.get(second)
+        return access_two
+
+    def access(payload):
+        if field_path in payload:
+            return payload[field_path]
+        value = payload
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+    return access
+
+
+def compile_map_accessor(field_path, map_key):
+    """
+    Compile a map path into an accessor with the same results as get_map_value.
+    Handles both the nested shape ({"labels": {"k8s.cluster.name": ...}}) and the flat dotted shape
+    ({"labels.k8s.cluster.name": ...}) with a precomputed flat key.
+    """
+    flat_key = f"{field_path}.{map_key}"
+    if '.' in field_path:
+        map_accessor = compile_path_accessor(field_path)
+    else:
+        def map_accessor(payload):
+            return payload.get(field_path)
+
+    def access(payload):
+        map_value = map_accessor(payload)
+        if map_value is None:
+            return payload.get(flat_key)
+        if not isinstance(map_value, dict):
+            return None
+        return map_value.get(map_key)
+    return access
+
+
+# Marks a field of a PayloadView that has not been extracted yet (None is a valid field value)
+_MISSING = object()
+
+
+class PayloadView:
+    """
+    Read-only view of a payload for a single routing decision.
+    Each field is extracted lazily on first access and memoized, so every webhook filtering on the same
+    field shares one extraction.
+    """
+
+    __slots__ = ('payload', '_extractors', '_values')
+
+    def __init__(self, payload, field_registry):
+        self.payload = payload
+        self._extractors = field_registry.extractors
+        self._values = [_MISSING] * len(self._extractors)
+
+    def get(self, field_id):
+        """Return the value of the field with the given ID."""
+        value = self._values[field_id]
+        if value is _MISSING:
+            value = self._values[field_id] = self._extractors[field_id](
+                self.payload,
+            )
+        return value
 
 
 def get_nested_value(obj, path):
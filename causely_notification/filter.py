@@ -20,117 +20,593 @@ Otherwise, it does not forward the payload to any slack channel.
 """
 from __future__ import annotations
 
+import json
+import math
+import sys
+import time
+
 import bitarray
 import mmh3
 
+from causely_notification import batch
+from causely_notification.compiler import compile_check
+from causely_notification.decision_cache import DECISION_CACHE_SIZE
+from causely_notification.decision_cache import DecisionCache
+from causely_notification.decision_cache import HIGH_CARDINALITY_THRESHOLD
+from causely_notification.expression import group_of
+from causely_notification.expression import REORDER_INTERVAL
+from causely_notification.expression import SAMPLE_INTERVAL
 from causely_notification.field_registry import FIELD_DEFINITIONS
 from causely_notification.field_registry import FieldRegistry
+from causely_notification.field_registry import PayloadView
 from causely_notification.op import Operator
+from causely_notification.patterns import PATTERN_OPERATORS
+from causely_notification.patterns import PatternIndex
+from causely_notification.thresholds import COMPARISON_OPERATORS
+from causely_notification.thresholds import Ordering
+from causely_notification.thresholds import ThresholdIndex
+
+# Membership lists with more values than this are backed by a Bloom filter in front of the exact set
+MEMBERSHIP_BLOOM_THRESHOLD = 10000
+# Target false-positive rate used to size those Bloom filters
+MEMBERSHIP_FALSE_POSITIVE_RATE = 0.001
 
 
 class WebhookFilterStore:
     """
     Stores filters for each webhook.
-    Uses Bloom filters to quickly check if a payload matches any webhook's filters.
+    Uses exact membership sets to quickly check if a payload matches any webhook's filters,
+    and caches the matching webhooks per projection of the payload onto the filtered fields.
+    Webhooks with identical filters share one FilterIndex, which is evaluated once per payload.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        bloom_threshold=MEMBERSHIP_BLOOM_THRESHOLD,
+        false_positive_rate=MEMBERSHIP_FALSE_POSITIVE_RATE,
+        severity_order=None,
+        sample_interval=SAMPLE_INTERVAL,
+        reorder_interval=REORDER_INTERVAL,
+        computed_fields=None,
+        decision_cache_size=DECISION_CACHE_SIZE,
+        high_cardinality_threshold=HIGH_CARDINALITY_THRESHOLD,
+    ):
         self.webhook_filters = {}
-        self.field_registry = FieldRegistry(FIELD_DEFINITIONS)
+        # The distinct filter sets, keyed by their canonical form, and the filters each webhook was given
+        self.filter_sets = {}
+        self._webhook_specs = {}
+        # The distinct filter indexes and the (webhook name, index position) pairs, built on first use
+        self._plan = None
+        self.field_registry = FieldRegistry(FIELD_DEFINITIONS, computed_fields)
+        self.decision_cache = DecisionCache(decision_cache_size, high_cardinality_threshold)
+        self.bloom_threshold = bloom_threshold
+        self.false_positive_rate = false_positive_rate
+        # Every sample_interval-th payload records the selectivity of the filter checks,
+        # which are reordered every reorder_interval payloads
+        self.sample_interval = sample_interval
+        self.reorder_interval = reorder_interval
+        self._payload_count = 0
+        # Literal prefixes of pattern filters and thresholds of comparison filters, shared by all webhooks
+        self.pattern_index = PatternIndex()
+        self.threshold_index = ThresholdIndex(Ordering(severity_order))
 
     def add_webhook_filters(self, webhook_name, filters, enabled=False):
-        """Add filters for a specific webhook."""
-        if webhook_name not in self.webhook_filters:
-            self.webhook_filters[webhook_name] = FilterIndex(
-                self.field_registry, enabled,
-            )
+        """
+        Add filters for a specific webhook.
+        If another webhook already has the same filters, their FilterIndex is shared. Invalid filters raise
+        before the webhook is changed.
+        """
+        spec = self._webhook_specs.get(webhook_name)
+        if spec is not None:
+            # Filters added later extend the webhook, which keeps its first enabled flag
+            enabled, filters = spec[0], spec[1] + list(filters)
+        else:
+            filters = list(filters)
+
+        key = _filter_set_key(enabled, filters)
+        filter_index = self.filter_sets.get(key)
+        if filter_index is None:
+            try:
+                filter_index = self._build_filter_index(enabled, filters)
+            except ValueError as error:
+                raise ValueError(f"Invalid filters for webhook '{webhook_name}': {error}") from error
+            self.filter_sets[key] = filter_index
+        self._webhook_specs[webhook_name] = (enabled, filters)
+        self.webhook_filters[webhook_name] = filter_index
+        self._plan = None
 
+    def _build_filter_index(self, enabled, filters):
+        filter_index = FilterIndex(
+            self.field_registry, enabled,
+            bloom_threshold=self.bloom_threshold,
+            false_positive_rate=self.false_positive_rate,
+            pattern_index=self.pattern_index,
+            threshold_index=self.threshold_index,
+        )
         for filter_ in filters:
+            # Groups of filters (any, all, not) are compiled as expressions
+            if group_of(filter_) is not None:
+                filter_index.add_expression(filter_)
+                continue
             field = filter_['field']
             operator = filter_['operator']
             value = filter_['value']
-            self.webhook_filters[webhook_name].add_filter(
+            filter_index.add_filter(
                 field, operator, value,
             )
+        return filter_index
+
+    def _prepare(self):
+        """Build the evaluation plan and the decision cache projection after the webhooks changed."""
+        indexes = []
+        positions = {}
+        order = []
+        for webhook_name, filter_index in self.webhook_filters.items():
+            position = positions.get(id(filter_index))
+            if position is None:
+                position = positions[id(filter_index)] = len(indexes)
+                indexes.append(filter_index)
+            order.append((webhook_name, position))
+        # Filter sets no webhook uses anymore are dropped
+        self.filter_sets = {
+            key: filter_index for key, filter_index in self.filter_sets.items()
+            if id(filter_index) in positions
+        }
+        self._configure_decision_cache(indexes)
+        plan = self._plan = (tuple(indexes), tuple(order))
+        return plan
+
+    def _configure_decision_cache(self, indexes):
+        """Project the decision cache onto the fields referenced by any enabled filter, dropping cached decisions."""
+        fields = {}
+        for filter_index in indexes:
+            if filter_index.enabled:
+                for field in filter_index.referenced_fields():
+                    fields[field] = self.field_registry.get_field_id(field)
+        self.decision_cache.configure(fields)
 
     def filter_payload(self, payload):
         """Filter the payload against all webhooks and return matching webhooks."""
-        matching_webhooks = []
-        for webhook_name, filter_index in self.webhook_filters.items():
-            # If the filter index is not enabled, then this is a match webhook as it allows all payloads by default
-            if not filter_index.enabled:
-                matching_webhooks.append(webhook_name)
-                continue
-            # If we get here, then we need to check the payload against the filters
-            if filter_index.check_payload(payload):
-                matching_webhooks.append(webhook_name)
+        plan = self._plan if self._plan is not None else self._prepare()
+        # One view per payload, so each field is extracted once and shared by all webhooks
+        view = self.field_registry.view(payload)
+        key = self.decision_cache.key(view)
+        if key is not None:
+            decision = self.decision_cache.get(key)
+            if decision is not None:
+                return list(decision)
+        matching_webhooks = self._evaluate(plan, view)
+        if key is not None:
+            self.decision_cache.put(key, tuple(matching_webhooks))
         return matching_webhooks
 
+    def _evaluate(self, plan, view):
+        """Check a PayloadView against every distinct filter index, then list the webhooks of the matching ones."""
+        indexes, order = plan
+        self._payload_count = count = self._payload_count + 1
+        # If the filter index is not enabled, then this is a match webhook as it allows all payloads by default
+        if count % self.sample_interval == 0:
+            results = [not index.enabled or index.check_view_sampled(view) for index in indexes]
+        else:
+            results = [not index.enabled or index.check_view(view) for index in indexes]
+        if count % self.reorder_interval == 0:
+            self.reorder()
+        return [webhook_name for webhook_name, position in order if results[position]]
+
+    def decision_cache_stats(self):
+        """Return the hit rate and projection of the decision cache."""
+        if self._plan is None:
+            self._prepare()
+        return self.decision_cache.stats()
+
+    def distinct_filter_indexes(self):
+        """Return the distinct filter indexes, each shared by one or more webhooks."""
+        plan = self._plan if self._plan is not None else self._prepare()
+        return plan[0]
+
+    def filter_many(self, payloads):
+        """
+        Filter many payloads at once and return the matching webhooks of each payload.
+        Gives the same results as filter_payload, evaluated column-wise over the batch.
+        """
+        return batch.filter_many(self, payloads)
+
+    def match_matrix(self, payloads):
+        """Return the webhook names and the payload x webhook boolean match matrix of a batch."""
+        return batch.build_match_matrix(self, payloads)
+
+    def explain(self, payload):
+        """
+        Evaluate the payload against every webhook without the decision cache and explain each result.
+
+        Returns:
+            dict: The matching webhooks, and for each webhook whether it matched, the time spent evaluating its
+                compiled filters, the extracted field values and the result of each condition.
+        """
+        explanations = {}
+        webhooks = {}
+        for webhook_name, filter_index in self.webhook_filters.items():
+            # Webhooks sharing a filter index share its explanation
+            explanation = explanations.get(id(filter_index))
+            if explanation is None:
+                explanation = explanations[id(filter_index)] = filter_index.explain(payload)
+            webhooks[webhook_name] = explanation
+        return {
+            'matching_webhooks': [name for name, result in webhooks.items() if result['matched']],
+            'webhooks': webhooks,
+        }
+
+    def clear_cache(self):
+        """Drop all cached routing decisions, e.g. after a filter was changed in place."""
+        self._prepare()
+
+    def reorder(self):
+        """Reorder the filter checks of every webhook by their observed selectivity."""
+        for filter_index in self.distinct_filter_indexes():
+            filter_index.reorder()
+
+    def selectivity(self):
+        """Return the observed selectivity of the filter checks of each enabled webhook with several checks."""
+        stats_by_index = {
+            id(filter_index): filter_index.selectivity()
+            for filter_index in self.distinct_filter_indexes()
+            if filter_index.enabled
+        }
+        return {
+            webhook_name: stats
+            for webhook_name, filter_index in self.webhook_filters.items()
+            if (stats := stats_by_index.get(id(filter_index))) is not None
+        }
+
+
+def _filter_set_key(enabled, filters):
+    """Return the canonical form of a filter set, equal for webhooks with the same filters."""
+    return json.dumps([enabled, filters], sort_keys=True, default=repr)
+
 
 class FilterIndex:
     """
     Represents a collection of filters for a specific webhook.
-    Uses Bloom filters to store membership-based filters
+    Uses membership sets to store membership-based filters
     and Operator class for numeric or string comparison operators.
+    The filters are compiled into a single predicate every time a filter is added.
     """
 
-    def __init__(self, field_registry, enabled):
+    def __init__(
+        self,
+        field_registry,
+        enabled,
+        bloom_threshold=MEMBERSHIP_BLOOM_THRESHOLD,
+        false_positive_rate=MEMBERSHIP_FALSE_POSITIVE_RATE,
+        pattern_index=None,
+        threshold_index=None,
+    ):
         self.field_filters = {}
+        # Filter groups (any, all, not), as expression nodes, see compile_expression
+        self.expressions = []
         self.field_registry = field_registry
         self.enabled = enabled
+        self.bloom_threshold = bloom_threshold
+        self.false_positive_rate = false_positive_rate
+        self.pattern_index = pattern_index if pattern_index is not None else PatternIndex()
+        self.threshold_index = threshold_index if threshold_index is not None else ThresholdIndex()
+        self._compile()
 
     def add_filter(self, field, operator, value):
         """Add a filter for a specific field."""
+        self._validate(field, operator, value)
+
         if field not in self.field_filters:
             self.field_filters[field] = {
-                'bloom': None,
+                'members': None,
                 'operator': [],
             }
+        self._add_to_filters(self.field_filters[field], field, operator, value)
+        self._compile()
+
+    def add_expression(self, filter_):
+        """Add a filter group (any, all or not), ANDed with the other filters of this webhook."""
+        # The whole group is validated before anything is stored
+        self._validate_expression(filter_)
+        self.expressions.append(self._build_expression(filter_))
+        self._compile()
+
+    def referenced_fields(self):
+        """Return the names of the fields the filters of this webhook read, in order of first reference."""
+        fields = list(self.field_filters)
+
+        def collect(node):
+            if node[0] == 'field':
+                if node[2] not in fields:
+                    fields.append(node[2])
+            elif node[0] == 'not':
+                collect(node[1])
+            else:
+                for child in node[1]:
+                    collect(child)
+        for node in self.expressions:
+            collect(node)
+        return fields
+
+    def _validate(self, field, operator, value):
+        # Raises for unregistered fields
+        self.field_registry.get_field_id(field)
+        if operator not in ['equals', 'in']:
+            # Compiling validates the operator and its value
+            try:
+                Operator(operator, self.threshold_index.ordering).compile(value)
+            except ValueError as error:
+                raise ValueError(f"Field '{field}': {error}") from error
 
-        # Use Bloom filters for 'in' and 'equals'
+    def _validate_expression(self, filter_):
+        group = group_of(filter_)
+        if group is None:
+            self._validate(filter_['field'], filter_['operator'], filter_['value'])
+            return
+        kind, operand = group
+        for child in [operand] if kind == 'not' else operand:
+            self._validate_expression(child)
+
+    def _build_expression(self, filter_):
+        group = group_of(filter_)
+        if group is None:
+            field, operator, value = filter_['field'], filter_['operator'], filter_['value']
+            filters = {'members': None, 'operator': []}
+            self._add_to_filters(filters, field, operator, value)
+            return ('field', f"{field} {operator} {value!r}", field, filters)
+        kind, operand = group
+        if kind == 'not':
+            return ('not', self._build_expression(operand))
+        return (kind, [self._build_expression(child) for child in operand])
+
+    def _add_to_filters(self, filters, field, operator, value):
+        # Use membership sets for 'in' and 'equals'
         if operator in ['equals', 'in']:
-            if self.field_filters[field]['bloom'] is None:
-                self.field_filters[field]['bloom'] = BloomFilter(
-                    size=1000, num_hashes=3,
+            values = value if isinstance(value, list) else [value]
+            if filters['members'] is None:
+                filters['members'] = MembershipSet(
+                    bloom_threshold=self.bloom_threshold,
+                    false_positive_rate=self.false_positive_rate,
+                    expected_size=len(values),
                 )
 
-            if isinstance(value, list):
-                for val in value:
-                    self.field_filters[field]['bloom'].add(str(val))
-            else:
-                self.field_filters[field]['bloom'].add(str(value))
+            members = filters['members']
+            for val in values:
+                members.add(str(val))
+        elif operator in PATTERN_OPERATORS:
+            # Pattern filters register their literal prefix in the field's shared prefix trie
+            filters['operator'].append({
+                'operator': operator,
+                'value': value,
+                'prefix_trie': self.pattern_index.trie_for(field),
+            })
+        elif operator in COMPARISON_OPERATORS:
+            # Comparison filters register their threshold in the field's shared sorted thresholds
+            filters['operator'].append({
+                'operator': operator,
+                'value': value,
+                'thresholds': self.threshold_index.for_field(field),
+            })
         else:
-            # For greater_than, less_than, and other complex operators
-            self.field_filters[field]['operator'].append({
+            # For not_equals, not_in, and other complex operators
+            filters['operator'].append({
                 'operator': operator,
                 'value': value,
             })
 
+    def _compile(self):
+        check = compile_check(
+            self.field_filters, self.field_registry, self.expressions,
+        )
+        self._predicate = check.predicate
+        self._sampled_predicate = check.sampled
+        self._group = check.group
+
     def check_payload(self, payload):
         """Check if the payload matches all filters for this webhook."""
+        if not isinstance(payload, PayloadView):
+            payload = self.field_registry.view(payload)
+        return self._predicate(payload)
+
+    def check_view(self, view):
+        """Check if the payload behind a PayloadView of this index's field registry matches all filters."""
+        return self._predicate(view)
+
+    def check_view_sampled(self, view):
+        """Same as check_view, also recording which checks decided the result."""
+        return self._sampled_predicate(view)
+
+    def explain(self, payload):
+        """Evaluate the payload and return whether it matched, the time taken and the result of every condition."""
+        if not self.enabled:
+            return {'enabled': False, 'matched': True, 'elapsed_us': 0.0, 'fields': {}, 'conditions': []}
+        # A fresh view, so the timing includes extracting the fields
+        view = self.field_registry.view(payload)
+        start = time.perf_counter_ns()
+        matched = self._predicate(view)
+        elapsed_us = (time.perf_counter_ns() - start) / 1000
+
+        fields = {
+            field: self.field_registry.get_field_value(view, field)
+            for field in self.referenced_fields()
+        }
+        conditions = []
         for field, filters in self.field_filters.items():
-            field_value = self.field_registry.get_field_value(payload, field)
+            conditions.extend(self._explain_field(field, filters, fields[field]))
+        for node in self.expressions:
+            conditions.append(self._explain_expression(node, fields))
+        return {
+            'enabled': True,
+            'matched': matched,
+            'elapsed_us': elapsed_us,
+            'fields': fields,
+            'conditions': conditions,
+        }
+
+    def _explain_expression(self, node, fields):
+        kind = node[0]
+        if kind == 'field':
+            conditions = self._explain_field(node[2], node[3], fields[node[2]])
+            return conditions[0] if len(conditions) == 1 else {
+                'all': conditions, 'matched': all(c['matched'] for c in conditions),
+            }
+        if kind == 'not':
+            condition = self._explain_expression(node[1], fields)
+            return {'not': condition, 'matched': not condition['matched']}
+        conditions = [self._explain_expression(child, fields) for child in node[1]]
+        results = [condition['matched'] for condition in conditions]
+        return {kind: conditions, 'matched': any(results) if kind == 'any' else all(results)}
+
+    def _explain_field(self, field, filters, field_value):
+        conditions = []
+        if filters['members'] is not None:
+            members = filters['members']
+            conditions.append({
+                'field': field,
+                'operator': 'in',
+                # Large membership lists are summarized
+                'value': sorted(members.members) if len(members) <= 20 else f"<{len(members)} values>",
+                'matched': field_value is not None and members.check(str(field_value)),
+            })
+        for op in filters['operator']:
+            operator_instance = Operator(op['operator'], self.threshold_index.ordering)
+            conditions.append({
+                'field': field,
+                'operator': op['operator'],
+                'value': op['value'],
+                'matched': field_value is not None and operator_instance.apply(field_value, op['value']),
+            })
+        return conditions
+
+    def reorder(self):
+        """Reorder the checks by their recorded selectivity, the most selective and cheapest first."""
+        if self._group is not None:
+            self._group.reorder()
 
-            # If the field value is None, the filter does not match
-            if field_value is None:
+    def selectivity(self):
+        """Return the observed selectivity of the checks, or None if there is a single check to order."""
+        if self._group is not None:
+            return self._group.stats()
+        return None
+
+    def check_payload_interpreted(self, payload):
+        """
+        Check the payload by interpreting the filter configuration on every call.
+        This is the reference behaviour for the compiled predicate, kept for tests and benchmarks.
+        """
+        for field, filters in self.field_filters.items():
+            if not self._interpret_field(payload, field, filters):
                 return False
+        return all(self._interpret_expression(payload, node) for node in self.expressions)
+
+    def _interpret_expression(self, payload, node):
+        kind = node[0]
+        if kind == 'field':
+            return self._interpret_field(payload, node[2], node[3])
+        if kind == 'not':
+            return not self._interpret_expression(payload, node[1])
+        results = (self._interpret_expression(payload, child) for child in node[1])
+        return any(results) if kind == 'any' else all(results)
+
+    def _interpret_field(self, payload, field, filters):
+        field_value = self.field_registry.get_field_value(payload, field)
+
+        # If the field value is None, the filter does not match
+        if field_value is None:
+            return False
 
-            # Check membership-based conditions using Bloom filter
-            if filters['bloom'] is not None and field_value is not None:
-                if not filters['bloom'].check(str(field_value)):
-                    return False
+        # Check membership-based conditions using the membership set
+        if filters['members'] is not None:
+            if not filters['members'].check(str(field_value)):
+                return False
 
-            # Check non-membership conditions using the Operator class
-            for op in filters['operator']:
-                operator_instance = Operator(op['operator'])
-                if not operator_instance.apply(field_value, op['value']):
-                    return False
+        # Check non-membership conditions using the Operator class
+        for op in filters['operator']:
+            operator_instance = Operator(
+                op['operator'], self.threshold_index.ordering,
+            )
+            if not operator_instance.apply(field_value, op['value']):
+                return False
 
         return True
 
 
+class MembershipSet:
+    """
+    Exact set of the string forms of membership filter values.
+    Above bloom_threshold members, a Bloom filter sized for false_positive_rate is checked first
+    so most misses are rejected without touching the set; every Bloom hit is confirmed against the set.
+    """
+
+    def __init__(
+        self,
+        bloom_threshold=MEMBERSHIP_BLOOM_THRESHOLD,
+        false_positive_rate=MEMBERSHIP_FALSE_POSITIVE_RATE,
+        expected_size=0,
+    ):
+        self.bloom_threshold = bloom_threshold
+        self.false_positive_rate = false_positive_rate
+        self.members = set()
+        self.bloom = None
+        self._bloom_capacity = 0
+        self._expected_size = expected_size
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, item):
+        return self.check(item)
+
+    def add(self, item):
+        item = sys.intern(item)
+        if item in self.members:
+            return
+        self.members.add(item)
+        if self.bloom is not None and len(self.members) <= self._bloom_capacity:
+            self.bloom.add(item)
+        elif len(self.members) > self.bloom_threshold:
+            self._build_bloom()
+
+    def check(self, item):
+        if self.bloom is not None and not self.bloom.check(item):
+            return False
+        return item in self.members
+
+    def compile(self):
+        """Return a predicate testing the string form of a field value against a snapshot of the members."""
+        members = frozenset(self.members)
+        bloom = self.bloom
+
+        if bloom is None:
+            def contains(value):
+                return (value if type(value) is str else str(value)) in members
+            return contains
+
+        bloom_check = bloom.check
+
+        def contains_with_bloom(value):
+            if type(value) is not str:
+                value = str(value)
+            return bloom_check(value) and value in members
+        return contains_with_bloom
+
+    def _build_bloom(self):
+        # Size for the larger of the configured list and twice the current members, so growing
+        # lists are not rebuilt on every add
+        self._bloom_capacity = max(self._expected_size, 2 * len(self.members))
+        self.bloom = BloomFilter.for_capacity(
+            self._bloom_capacity, self.false_positive_rate,
+        )
+        for member in self.members:
+            self.bloom.add(member)
+
+
 class BloomFilter:
-    """Simple implementation of a Bloom filter."""
+    """
+    Simple implementation of a Bloom filter.
+    One 128-bit murmur hash is split into two 64-bit halves, combined into num_hashes bit indices
+    (Kirsch-Mitzenmacher double hashing).
+    """
 
     def __init__(self, size, num_hashes):
         self.size = size
@@ -138,13 +614,30 @@ class BloomFilter:
         self.bit_array = bitarray.bitarray(size)
         self.bit_array.setall(0)
 
+    @classmethod
+    def for_capacity(cls, capacity, false_positive_rate):
+        """Return a Bloom filter sized to hold capacity items at the target false-positive rate."""
+        capacity = max(capacity, 1)
+        size = math.ceil(
+            -capacity * math.log(false_positive_rate) / (math.log(2) ** 2),
+        )
+        num_hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size=size, num_hashes=num_hashes)
+
     def _hashes(self, item):
-        for i in range(self.num_hashes):
-            yield mmh3.hash(item, i) % self.size
+        digest = mmh3.hash128(item, signed=False)
+        h1 = digest & 0xFFFFFFFFFFFFFFFF
+        h2 = digest >> 64
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.num_hashes)]
 
     def add(self, item):
         for hash_value in self._hashes(item):
             self.bit_array[hash_value] = 1
 
     def check(self, item):
-        return all(self.bit_array[hash_value] for hash_value in self._hashes(item))
+        bit_array = self.bit_array
+        for hash_value in self._hashes(item):
+            if not bit_array[hash_value]:
+                return False
+        return True
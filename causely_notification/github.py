@@ -3,58 +3,64 @@ GitHub integration: create or find GitHub issues for Causely root cause events.
 
 Follows the same behavior as the server.js blueprint:
 - Only creates issues for ProblemUpdated or ProblemDetected.
-- Deduplicates by root cause objectId (Causely Root Cause ID in issue body).
+- Comments on the issue when ProblemUpdated changes the severity, and closes it on ProblemCleared.
+- Deduplicates by root cause objectId (Causely Root Cause ID in issue body), looked up in a per-repo index
+  warmed by one scan of the open issues and kept current with the issues updated since the last sync.
 - Supports assigning to Copilot (copilot-swe-agent) via GraphQL when REST returns 422.
+- Creates the issues of root causes arriving together for the same repo with one aliased GraphQL mutation.
 """
-
 from __future__ import annotations
 
 import sys
+import threading
+import time
+from datetime import datetime
+from datetime import timezone
 from types import SimpleNamespace
 
 import requests
 
+from causely_notification.github_client import GITHUB_API_BASE
+from causely_notification.github_client import github_client
+from causely_notification.github_client import github_headers
+from causely_notification.github_client import GITHUB_TIMEOUT
+from causely_notification.github_client import token_fingerprint
+from causely_notification.micro_batch import MicroBatcher
+from causely_notification.micro_batch import MicroBatchers
+
 RC_ID_MARKER = "Causely Root Cause ID: "
+SEVERITY_MARKER = "**Severity:** "
 COPILOT_LOGIN = "copilot-swe-agent"
-GITHUB_API_BASE = "https://api.github.com"
+ISSUES_PAGE_SIZE = 100
+# Seconds the repository and Copilot IDs are reused. A repository without Copilot is asked again sooner,
+# so enabling Copilot takes effect without a restart.
+REPO_IDS_TTL = 3600
+MISSING_IDS_TTL = 300
+# Issues created by one GraphQL mutation at most. Each createIssue returns a single issue node, far below the node
+# limit, and the count stays below the secondary limit on content creation.
+MAX_BATCH_ISSUES = 20
 
 
-def _github_headers(token, extra=None):
-    h = {
-        "Accept": "application/vnd.github+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
-    if extra:
-        h.update(extra)
-    return h
+def github_request(path, token, method="GET", json_body=None):
+    return github_client.request(method, path, token, json_body)
 
 
-def github_request(path, token, method="GET", json_body=None):
-    url = f"{GITHUB_API_BASE}{path}"
-    resp = requests.request(
-        method,
-        url,
-        headers=_github_headers(token),
-        json=json_body,
-        timeout=30,
+def _graphql_post(token, query, variables):
+    return github_client.call(
+        token,
+        "graphql",
+        True,
+        lambda: requests.post(
+            f"{GITHUB_API_BASE}/graphql",
+            headers=github_headers(token, {"GraphQL-Features": "issues_copilot_assignment_api_support"}),
+            json={"query": query, "variables": variables or {}},
+            timeout=GITHUB_TIMEOUT,
+        ),
     )
-    if not resp.ok:
-        raise RuntimeError(f"GitHub API {resp.status_code}: {resp.text}")
-    return resp.json() if resp.content else None
 
 
 def github_graphql(token, query, variables=None):
-    resp = requests.post(
-        f"{GITHUB_API_BASE}/graphql",
-        headers={
-            **_github_headers(token),
-            "GraphQL-Features": "issues_copilot_assignment_api_support",
-        },
-        json={"query": query, "variables": variables or {}},
-        timeout=30,
-    )
+    resp = _graphql_post(token, query, variables)
     data = resp.json()
     if isinstance(data, dict) and data.get("errors"):
         raise RuntimeError(
@@ -65,8 +71,81 @@ def github_graphql(token, query, variables=None):
     return data.get("data")
 
 
+def github_graphql_results(token, query, variables=None):
+    """
+    Send a GraphQL document whose fields may fail on their own, as the aliased mutations of a batch.
+    Returns the data and the list of errors. Raises only if no data came back.
+    """
+    resp = _graphql_post(token, query, variables)
+    data = resp.json()
+    if not isinstance(data, dict):
+        raise RuntimeError(f"GraphQL HTTP {resp.status_code}: {data}")
+    errors = data.get("errors") or []
+    if data.get("data") is None:
+        if errors:
+            raise RuntimeError("GraphQL: " + "; ".join(e.get("message", str(e)) for e in errors))
+        raise RuntimeError(f"GraphQL HTTP {resp.status_code}: {data}")
+    return data["data"], errors
+
+
+class RepoIdsCache:
+    """
+    The repository and Copilot IDs of each (owner, repo, token fingerprint), kept for a TTL. Repositories that
+    were not found or have no Copilot are cached too, for a shorter TTL. Concurrent misses of the same key wait
+    for a single query. Errors are not cached.
+    """
+
+    def __init__(self, ttl=REPO_IDS_TTL, missing_ttl=MISSING_IDS_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._loading = {}
+
+    def get(self, owner, repo, token, load):
+        """Return the cached IDs of a repository, calling load() once when they are missing or expired."""
+        # The token itself is not kept, only which token the IDs were visible to
+        key = (owner.lower(), repo.lower(), token_fingerprint(token))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self.hits += 1
+                return entry[1]
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > self.clock():
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+            ids = load()
+            ttl = self.ttl if ids and ids.get("copilot_id") else self.missing_ttl
+            with self._lock:
+                self._entries[key] = (self.clock() + ttl, ids)
+                self._loading.pop(key, None)
+            return ids
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+repo_ids_cache = RepoIdsCache()
+
+
 def get_repo_and_copilot_ids(owner, repo, token):
-    """Get repository node ID and Copilot bot ID for GraphQL issue creation with assignee."""
+    """Get repository node ID and Copilot bot ID for GraphQL issue creation with assignee, cached per token."""
+    return repo_ids_cache.get(owner, repo, token, lambda: _query_repo_and_copilot_ids(owner, repo, token))
+
+
+def _query_repo_and_copilot_ids(owner, repo, token):
     data = github_graphql(
         token,
         """
@@ -96,25 +175,163 @@ def get_repo_and_copilot_ids(owner, repo, token):
     }
 
 
+def _root_cause_id(issue):
+    """Return the root cause objectId written in the body of an issue, or None for other issues and PRs."""
+    if issue.get("pull_request"):
+        return None
+    body = issue.get("body") or ""
+    start = body.find(RC_ID_MARKER)
+    if start < 0:
+        return None
+    object_id = body[start + len(RC_ID_MARKER):].split("\n", 1)[0].strip()
+    return object_id or None
+
+
+def _index_entry(issue):
+    """Return the index entry of an issue: its number, URL and the severity written in its body."""
+    body = issue.get("body") or ""
+    start = body.find(SEVERITY_MARKER)
+    severity = body[start + len(SEVERITY_MARKER):].split("\n", 1)[0].strip() if start >= 0 else None
+    return {"number": issue["number"], "url": issue.get("html_url", ""), "severity": severity or None}
+
+
+class RepoIssueIndex:
+    """
+    The open issues of a repo created for root causes, by objectId, so finding the issue of a root cause does not
+    scan every open issue. The first lookup lists the open issues once. Later lookups only request the issues
+    updated since the last sync, which the client sends with the ETag of the previous answer, so an unchanged repo
+    answers 304, which does not count against the rate limit. Issues created by the bot are added in place.
+    """
+
+    def __init__(self, owner, repo):
+        self.owner = owner
+        self.repo = repo
+        self.warmed = False
+        self._lock = threading.Lock()
+        self._issues = {}
+        self._since = None
+        self._syncs = 0
+
+    def lookup(self, object_id, token):
+        """Return {number, url} of the open issue of a root cause, or None."""
+        syncs = self._syncs
+        with self._lock:
+            if not self.warmed:
+                self._warm(token)
+            elif self._syncs == syncs:
+                # A sync started after this lookup arrived is as good as its own, so lookups arriving together
+                # share one request
+                self._sync(token)
+            return self._issues.get(object_id)
+
+    def warm(self, token):
+        """List the open issues of the repo, replacing the index. Returns the number of root cause issues."""
+        with self._lock:
+            self._warm(token)
+            return len(self._issues)
+
+    def add(self, object_id, issue):
+        with self._lock:
+            self._issues[object_id] = issue
+
+    def remove(self, object_id):
+        with self._lock:
+            self._issues.pop(object_id, None)
+
+    def __len__(self):
+        return len(self._issues)
+
+    def _warm(self, token):
+        # Issues updated while listing are seen again by the next sync
+        since = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        issues = {}
+        page = 1
+        while True:
+            batch = github_request(
+                f"/repos/{self.owner}/{self.repo}/issues?state=open&per_page={ISSUES_PAGE_SIZE}&page={page}",
+                token,
+            )
+            for issue in batch:
+                object_id = _root_cause_id(issue)
+                if object_id:
+                    issues[object_id] = _index_entry(issue)
+            if len(batch) < ISSUES_PAGE_SIZE:
+                break
+            page += 1
+        self._issues = issues
+        self._since = since
+        self.warmed = True
+
+    def _sync(self, token):
+        """Apply the issues opened, edited or closed since the last sync."""
+        self._syncs += 1
+        path = f"/repos/{self.owner}/{self.repo}/issues?state=all&since={self._since}&per_page={ISSUES_PAGE_SIZE}"
+        batch, modified = github_client.get(path, token)
+        if not modified:
+            return
+        batch = batch or []
+        updated = list(batch)
+        page = 1
+        while len(batch) == ISSUES_PAGE_SIZE:
+            page += 1
+            batch = github_request(f"{path}&page={page}", token) or []
+            updated.extend(batch)
+        for issue in updated:
+            self._apply(issue)
+        newest = max((issue.get("updated_at") or "" for issue in updated), default="")
+        if newest > self._since:
+            self._since = newest
+
+    def _apply(self, issue):
+        object_id = _root_cause_id(issue)
+        if not object_id:
+            return
+        known = self._issues.get(object_id) or {}
+        if issue.get("state") == "open":
+            entry = _index_entry(issue)
+            if known.get("number") == entry["number"] and known.get("severity"):
+                # Severity changes are commented, the body keeps the first one
+                entry["severity"] = known["severity"]
+            self._issues[object_id] = entry
+        elif known.get("number") == issue["number"]:
+            del self._issues[object_id]
+
+
+class RepoIssueIndexes:
+    """The RepoIssueIndex of each repo, created on first use and shared by the webhooks of the repo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}
+
+    def get(self, owner, repo):
+        key = (owner.lower(), repo.lower())
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = RepoIssueIndex(owner, repo)
+            return index
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def stats(self):
+        return {f"{index.owner}/{index.repo}": len(index) for index in list(self._indexes.values())}
+
+
+issue_indexes = RepoIssueIndexes()
+
+
 def find_existing_issue_for_root_cause(object_id, owner, repo, token):
     """Return {number, url} of an open issue whose body contains RC_ID_MARKER + object_id, else None."""
-    page = 1
-    per_page = 100
-    while True:
-        issues = github_request(
-            f"/repos/{owner}/{repo}/issues?state=open&per_page={per_page}&page={page}",
-            token,
-        )
-        for issue in issues:
-            if issue.get("pull_request"):
-                continue
-            body = issue.get("body") or ""
-            if RC_ID_MARKER + object_id in body:
-                return {"number": issue["number"], "url": issue.get("html_url", "")}
-        if len(issues) < per_page:
-            break
-        page += 1
-    return None
+    return issue_indexes.get(owner, repo).lookup(object_id, token)
+
+
+def warm_issue_index(repo_spec, token):
+    """List the open issues of an "owner/repo" once, so the first notification does not wait for it."""
+    owner, repo = repo_spec.strip().split("/")
+    return issue_indexes.get(owner, repo).warm(token)
 
 
 def _build_issue_body(payload):
@@ -154,13 +371,16 @@ def _build_issue_body(payload):
     return "\n".join(p for p in parts if p is not None)
 
 
-def create_issue_for_root_cause(payload, owner, repo, token, assignee=None):
-    """Create a GitHub issue for the root cause. Returns dict with number and url."""
-    object_id = payload.get("objectId", "")
+def _issue_title(payload):
     name = payload.get("name") or "Root cause"
     entity = payload.get("entity") or {}
     entity_name = entity.get("name") or entity.get("id") or "unknown"
-    title = f"[Causely] {name}: {entity_name}"[:256]
+    return f"[Causely] {name}: {entity_name}"[:256]
+
+
+def create_issue_for_root_cause(payload, owner, repo, token, assignee=None):
+    """Create a GitHub issue for the root cause. Returns dict with number and url."""
+    title = _issue_title(payload)
     body = _build_issue_body(payload)
 
     assign_to_copilot = assignee and assignee.strip() == COPILOT_LOGIN
@@ -233,16 +453,121 @@ def create_issue_for_root_cause(payload, owner, repo, token, assignee=None):
     return {"number": number, "url": url}
 
 
+def create_issues_for_root_causes(payloads, owner, repo, token, assignee=None):
+    """
+    Create the issues of several root causes with one mutation of aliased createIssue fields. Returns, in order,
+    the dict with number and url of each issue or the error of its field. A single root cause, or an assignee
+    other than Copilot, whose user ID GraphQL would need, is created with create_issue_for_root_cause.
+    """
+    if len(payloads) == 1 or (assignee and assignee != COPILOT_LOGIN):
+        results = []
+        for payload in payloads:
+            try:
+                results.append(create_issue_for_root_cause(payload, owner, repo, token, assignee=assignee))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    ids = get_repo_and_copilot_ids(owner, repo, token)
+    if not ids:
+        raise RuntimeError(f"GitHub repository {owner}/{repo} not found")
+    assignee_ids = [ids["copilot_id"]] if assignee and ids.get("copilot_id") else []
+    if assignee and not assignee_ids:
+        print(
+            f"[webhook] {COPILOT_LOGIN} not in suggestedActors for repo; creating issues without assignee",
+            file=sys.stderr,
+        )
+    declarations = ["$repoId: ID!", "$assigneeIds: [ID!]"]
+    fields = []
+    variables = {"repoId": ids["repo_id"], "assigneeIds": assignee_ids}
+    for i, payload in enumerate(payloads):
+        declarations += [f"$title{i}: String!", f"$body{i}: String!"]
+        fields.append(
+            f"  issue{i}: createIssue(input: {{repositoryId: $repoId, title: $title{i}, body: $body{i}, "
+            f"assigneeIds: $assigneeIds}}) {{ issue {{ number url }} }}"
+        )
+        variables[f"title{i}"] = _issue_title(payload)
+        variables[f"body{i}"] = _build_issue_body(payload)
+    query = f"mutation({', '.join(declarations)}) {{\n" + "\n".join(fields) + "\n}"
+
+    data, errors = github_graphql_results(token, query, variables)
+    field_errors = {}
+    for error in errors:
+        path = error.get("path") or []
+        if path:
+            field_errors.setdefault(path[0], error.get("message", str(error)))
+    results = []
+    for i in range(len(payloads)):
+        issue = (data.get(f"issue{i}") or {}).get("issue")
+        if issue:
+            results.append({"number": issue["number"], "url": issue["url"]})
+        else:
+            results.append(RuntimeError("GraphQL: " + field_errors.get(f"issue{i}", "issue was not created")))
+    return results
+
+
+def _create_issue_batch(items):
+    """Send the creates batched for one repo, creating a single issue for a root cause submitted twice."""
+    _, owner, repo, token, assignee = items[0]
+    positions = {}
+    payloads = []
+    for payload, *_ in items:
+        object_id = payload.get("objectId")
+        if object_id not in positions:
+            positions[object_id] = len(payloads)
+            payloads.append(payload)
+    results = create_issues_for_root_causes(payloads, owner, repo, token, assignee=assignee)
+    return [results[positions[payload.get("objectId")]] for payload, *_ in items]
+
+
+issue_batchers = MicroBatchers(lambda key: MicroBatcher(_create_issue_batch, MAX_BATCH_ISSUES))
+
+
+def create_issue(payload, owner, repo, token, assignee=None):
+    """Create the issue of a root cause, together with the issues of the same repo created at the same time."""
+    key = (owner.lower(), repo.lower(), token_fingerprint(token), assignee)
+    return issue_batchers.get(key).submit((payload, owner, repo, token, assignee))
+
+
+def comment_on_issue(owner, repo, number, token, payload, previous_severity):
+    """Add a comment with the new severity of a root cause to its issue."""
+    severity = payload.get("severity") or ""
+    summary = (payload.get("description") or {}).get("summary") or ""
+    lines = [
+        f"Severity changed from **{previous_severity or 'unknown'}** to **{severity}**.",
+        f"**Updated:** {payload.get('timestamp') or ''}",
+    ]
+    if summary:
+        lines += ["", summary]
+    return github_request(
+        f"/repos/{owner}/{repo}/issues/{number}/comments",
+        token,
+        method="POST",
+        json_body={"body": "\n".join(lines)},
+    )
+
+
+def close_issue(owner, repo, number, token):
+    """Close the issue of a cleared root cause as completed."""
+    return github_request(
+        f"/repos/{owner}/{repo}/issues/{number}",
+        token,
+        method="PATCH",
+        json_body={"state": "closed", "state_reason": "completed"},
+    )
+
+
 def forward_to_github(payload, repo_spec, token, assignee=None):
     """
-    Ensure a GitHub issue exists for this root cause (ProblemUpdated or ProblemDetected).
+    Keep one GitHub issue per root cause. ProblemDetected and ProblemUpdated create it when there is none,
+    ProblemUpdated comments on it when the severity changed and ProblemCleared closes it.
     repo_spec should be "owner/repo". Returns a response-like object with .status_code.
     """
     print(payload, file=sys.stderr)
     print(payload.get("type"), file=sys.stderr)
 
     event_type = payload.get("type")
-    if event_type not in ("ProblemUpdated", "ProblemDetected"):
+    if event_type not in ("ProblemUpdated", "ProblemDetected", "ProblemCleared"):
         return SimpleNamespace(status_code=200, content=b"", text="ignored event type")
 
     object_id = payload.get("objectId")
@@ -260,18 +585,33 @@ def forward_to_github(payload, repo_spec, token, assignee=None):
         )
 
     owner, repo = parts[0], parts[1]
+    index = issue_indexes.get(owner, repo)
 
     try:
-        existing = find_existing_issue_for_root_cause(object_id, owner, repo, token)
+        existing = index.lookup(object_id, token)
+        if event_type == "ProblemCleared":
+            if not existing:
+                return SimpleNamespace(status_code=200, content=b"", text="no open issue")
+            close_issue(owner, repo, existing["number"], token)
+            index.remove(object_id)
+            print(
+                f"[webhook] closed issue for root cause {object_id}: {existing['url']} (#{existing['number']})",
+                file=sys.stderr,
+            )
+            return SimpleNamespace(status_code=200, content=b"", text="closed")
+        severity = payload.get("severity")
+        if existing and event_type == "ProblemUpdated" and severity and severity != existing.get("severity"):
+            comment_on_issue(owner, repo, existing["number"], token, payload, existing.get("severity"))
+            index.add(object_id, {**existing, "severity": severity})
+            return SimpleNamespace(status_code=201, content=b"", text="commented")
         if existing:
             print(
                 f"[webhook] issue already exists for root cause {object_id}: {existing['url']} (#{existing['number']}), skipping",
                 file=sys.stderr,
             )
             return SimpleNamespace(status_code=200, content=b"", text="existing")
-        issue = create_issue_for_root_cause(
-            payload, owner, repo, token, assignee=(assignee or "").strip() or None
-        )
+        issue = create_issue(payload, owner, repo, token, assignee=(assignee or "").strip() or None)
+        index.add(object_id, {**issue, "severity": severity})
         print(
             f"[webhook] created issue for root cause {object_id}: {issue['url']} (#{issue['number']})",
             file=sys.stderr,
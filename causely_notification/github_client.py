@@ -0,0 +1,241 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This script defines the client sending the GitHub API calls of the GitHub webhooks. It keeps the rate limit of each
+token from the X-RateLimit headers of the responses, and spaces the calls out when the quota runs low. The last part
+of the quota is kept for writes, so issues are still created and closed when lookups have to wait. It also waits
+out the Retry-After of secondary rate limits. GET responses are cached with their ETag and requested again with
+If-None-Match, as a 304 answer does not count against the rate limit.
+"""
+from __future__ import annotations
+
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+GITHUB_API_BASE = "https://api.github.com"
+GITHUB_TIMEOUT = 30
+
+# Calls left below which the calls of a token are spread over the time until the reset
+SLOW_DOWN_REMAINING = 500
+# Calls left that lookups do not use, so creates, comments and closes are not starved
+WRITE_RESERVE = 50
+# Longest wait for the quota before a call fails instead
+MAX_WAIT = 30
+# Number of GET responses kept with their ETag
+ETAG_CACHE_SIZE = 1000
+
+
+def github_headers(token, extra=None):
+    h = {
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+    }
+    if extra:
+        h.update(extra)
+    return h
+
+
+def token_fingerprint(token):
+    """Identify a token in caches and metrics without keeping the token itself."""
+    return hashlib.sha256((token or "").encode()).hexdigest()[:16]
+
+
+class RateLimitError(RuntimeError):
+    """Raised instead of sending a call that would have to wait longer than MAX_WAIT for the quota."""
+
+
+class _Quota:
+    """What the last response told about the rate limit of one token and resource."""
+
+    __slots__ = ('limit', 'remaining', 'reset', 'blocked_until', 'next_call')
+
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset = 0.0
+        self.blocked_until = 0.0
+        self.next_call = 0.0
+
+
+class GitHubClient:
+    """
+    Sends GitHub API calls within the rate limit of their token. The quota of each (token, resource) is
+    updated from every response. Calls that have to wait sleep in the calling thread for up to max_wait
+    seconds, and raise RateLimitError when the wait would be longer.
+    """
+
+    def __init__(self, max_wait=MAX_WAIT, etag_cache_size=ETAG_CACHE_SIZE, clock=time.time, sleep=time.sleep):
+        self.max_wait = max_wait
+        self.etag_cache_size = etag_cache_size
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._quotas = {}
+        self._etags = OrderedDict()
+        self._stats = {"requests": 0, "not_modified": 0, "delayed": 0, "rate_limited": 0, "rejected": 0}
+
+    def request(self, method, path, token, json_body=None):
+        """Send a REST call and return its JSON body, or None if it has none. Raises RuntimeError if it fails."""
+        response, data = self._rest(method, path, token, json_body)
+        return data
+
+    def get(self, path, token):
+        """GET a REST path. Returns its JSON body and False if it did not change since the last GET, else True."""
+        response, data = self._rest("GET", path, token)
+        return data, response.status_code != 304
+
+    def call(self, token, resource, write, send):
+        """
+        Send a call within the rate limit of a token. send() sends the call and returns its response.
+        Lookups are made with write False, and wait for the reset while only the write reserve is left.
+        A call answered with a rate limit error is sent once more if the limit ends within max_wait.
+        """
+        key = (token_fingerprint(token), resource)
+        for attempt in range(2):
+            self._wait(key, write)
+            response = send()
+            with self._lock:
+                self._stats["requests"] += 1
+                limited = self._update(key, response)
+            if not limited or attempt:
+                return response
+            with self._lock:
+                self._stats["rate_limited"] += 1
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._quotas.clear()
+            self._etags.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            remaining = [quota.remaining for quota in self._quotas.values() if quota.remaining is not None]
+            stats["lowest_remaining"] = min(remaining) if remaining else None
+            return stats
+
+    def _rest(self, method, path, token, json_body=None):
+        url = f"{GITHUB_API_BASE}{path}"
+        cache_key = (token_fingerprint(token), path) if method == "GET" else None
+        with self._lock:
+            cached = self._etags.get(cache_key) if cache_key else None
+        extra = {"If-None-Match": cached[0]} if cached else None
+        response = self.call(
+            token, "core", method != "GET",
+            lambda: requests.request(method, url, headers=github_headers(token, extra), json=json_body,
+                                     timeout=GITHUB_TIMEOUT),
+        )
+        if response.status_code == 304 and cached:
+            with self._lock:
+                self._stats["not_modified"] += 1
+                if cache_key in self._etags:
+                    self._etags.move_to_end(cache_key)
+            return response, cached[1]
+        if not response.ok:
+            raise RuntimeError(f"GitHub API {response.status_code}: {response.text}")
+        data = response.json() if response.content else None
+        etag = response.headers.get("ETag")
+        if cache_key and isinstance(etag, str):
+            with self._lock:
+                self._etags[cache_key] = (etag, data)
+                self._etags.move_to_end(cache_key)
+                while len(self._etags) > self.etag_cache_size:
+                    self._etags.popitem(last=False)
+        return response, data
+
+    def _wait(self, key, write):
+        with self._lock:
+            quota = self._quotas.get(key)
+            if quota is None:
+                return
+            now = self.clock()
+            delay = self._delay(quota, write, now)
+            if delay > self.max_wait:
+                self._stats["rejected"] += 1
+                raise RateLimitError(f"GitHub rate limit reached, retry in {int(delay) + 1}s")
+            if quota.remaining is not None and quota.reset > now:
+                # Reserved now, so concurrent calls do not all count the same remaining call
+                quota.remaining -= 1
+            if delay > 0:
+                self._stats["delayed"] += 1
+        if delay > 0:
+            self.sleep(delay)
+
+    @staticmethod
+    def _delay(quota, write, now):
+        if quota.blocked_until > now:
+            return quota.blocked_until - now
+        if quota.remaining is None or quota.reset <= now:
+            return 0
+        available = quota.remaining - (0 if write else WRITE_RESERVE)
+        if available <= 0:
+            return quota.reset - now
+        if quota.remaining > SLOW_DOWN_REMAINING:
+            return 0
+        # Spread the calls left over the time until the reset
+        delay = max(0.0, quota.next_call - now)
+        quota.next_call = max(now, quota.next_call) + (quota.reset - now) / available
+        return delay
+
+    def _update(self, key, response):
+        """Record the rate limit headers of a response. Returns True if the call was rejected by a rate limit."""
+        quota = self._quotas.get(key)
+        if quota is None:
+            quota = self._quotas[key] = _Quota()
+        headers = response.headers
+        limit = _header_number(headers, "X-RateLimit-Limit")
+        remaining = _header_number(headers, "X-RateLimit-Remaining")
+        reset = _header_number(headers, "X-RateLimit-Reset")
+        if limit is not None:
+            quota.limit = limit
+        if remaining is not None:
+            quota.remaining = remaining
+        if reset is not None:
+            quota.reset = reset
+        if response.status_code not in (403, 429):
+            return False
+        retry_after = _header_number(headers, "Retry-After")
+        if retry_after is not None:
+            quota.blocked_until = self.clock() + retry_after
+        elif remaining == 0 and reset is not None:
+            quota.blocked_until = reset
+        else:
+            # A 403 without rate limit headers is a permission error
+            return False
+        print(f"GitHub rate limit reached, calls wait until {quota.blocked_until:.0f}", file=sys.stderr)
+        return True
+
+
+def _header_number(headers, name):
+    value = headers.get(name)
+    if not isinstance(value, str):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+github_client = GitHubClient()
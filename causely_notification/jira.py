@@ -18,125 +18,231 @@ from __future__ import annotations
 
 import json
 import sys
+from urllib.parse import quote
+from urllib.parse import unquote
 
 import requests
 
-from .date import parse_iso_date
+from .micro_batch import MicroBatcher
+from .micro_batch import MicroBatchers
 from .utils import check_problem_detected
-
-
-def create_jira_description(payload):
-    description = payload.get("description", {}).get("summary", "No summary provided.")
-    return description
-
-
-def create_jira_remediation(payload):
-    remediation_options = payload.get("description", {}).get("remediationOptions", [])
-    if not remediation_options:
-        return "No remediation options provided."
-    return "\n".join(
-        [f"* {option.get('title')}: {option.get('description')}" for option in remediation_options]
-    )
-
-
-def create_jira_slos(payload):
-    slos = payload.get("slos", [])
-    if not slos:
-        return "No SLOs impacted."
-
-    # Jira uses different status mappings
-    status_icons = {
-        "AT_RISK": "🔸 At Risk",
-        "HEALTHY": "✅ Healthy",
-        "VIOLATED": "🔴 Violated",
-        "NORMAL": "ℹ️ Normal",
-        "UNKNOWN": "❓ Unknown",
-    }
-
-    slo_lines = ["h2. Impacted SLOs\n"]  # Using Jira markup
-    for slo in slos:
-        slo_entity = slo.get("slo_entity", {})
-        slo_name = slo_entity.get("name", "Unknown SLO")
-        slo_status = slo.get("status", "UNKNOWN")
-        slo_status_text = status_icons.get(slo_status, slo_status)
-
-        related_entity = slo.get("related_entity", {})
-        related_entity_name = related_entity.get("name", "Unknown Service")
-
-        slo_lines.append(f"* {slo_name} ({slo_status_text}) - Impacted Service: {related_entity_name}")
-
-    return "\n".join(slo_lines)
-
-
-def create_jira_payload(payload, type_: str):
-    entity = payload.get("entity", {})
-    entity_name = entity.get("name", "Unknown Entity")
-    timestamp = parse_iso_date(payload.get("timestamp"))
-    severity = payload.get("severity", "Unknown")
-    
-    # Map severity to Jira priority levels
-    priority_map = {
-        "critical": "Highest",
-        "high": "High",
-        "medium": "Medium",
-        "low": "Low",
-        "info": "Lowest",
-    }
-    
-    jira_priority = priority_map.get(severity.lower(), "Medium")
-    
-    description = create_jira_description(payload)
-    remediation = create_jira_remediation(payload)
-    slos = create_jira_slos(payload)
-
-    # Format description in Jira markup
-    formatted_description = f"""h1. Incident Details
-{description}
-
-h2. Affected Entity
-{entity_name}
-
-h2. Severity
-{severity}
-
-h2. Timestamp
-{timestamp}
-
-h2. Remediation Steps
-{remediation}
-
-{slos}
-"""
-
+from .utils import make_error_response
+from .utils import make_response
+
+# At most MAX_SLOS SLOs are listed, so the description stays bounded
+MAX_SLOS = 100
+
+JIRA_TIMEOUT = 30
+# Every issue created by the bot has the ALERT_LABEL, and the issue of a root cause also its objectId label
+ALERT_LABEL = "causely-alert"
+ROOT_CAUSE_LABEL_PREFIX = "causely-root-cause-"
+SEARCH_PAGE_SIZE = 100
+# Issues created concurrently are sent with one bulk call of at most JIRA_BULK_SIZE issues, the limit of Jira,
+# after waiting up to the shared BATCH_WINDOW for others. The Jira webhooks of one payload are delivered one after
+# the other, so only the issues of payloads delivered concurrently are batched, and each create waits the window.
+JIRA_BULK_SIZE = 50
+
+# Jira uses different status mappings
+SLO_STATUS_TEXT = {
+    "AT_RISK": "🔸 At Risk",
+    "HEALTHY": "✅ Healthy",
+    "VIOLATED": "🔴 Violated",
+    "NORMAL": "ℹ️ Normal",
+    "UNKNOWN": "❓ Unknown",
+}
+
+# Map severity to Jira priority levels
+PRIORITY_MAP = {
+    "critical": "Highest",
+    "high": "High",
+    "medium": "Medium",
+    "low": "Low",
+    "info": "Lowest",
+}
+
+
+def root_cause_label(object_id):
+    """
+    Return the label of the issue of a root cause. Jira labels cannot contain spaces, so the objectId is
+    percent-encoded, which root_cause_id reverses.
+    """
+    return ROOT_CAUSE_LABEL_PREFIX + quote(object_id, safe="")
+
+
+def root_cause_id(label):
+    """Return the objectId of a root cause label, or None for other labels."""
+    if not label.startswith(ROOT_CAUSE_LABEL_PREFIX):
+        return None
+    return unquote(label[len(ROOT_CAUSE_LABEL_PREFIX):])
+
+
+def _jira_headers(jira_auth_token):
     return {
-        "fields": {
-            "project": {"key": "OPS"},  # This should be configurable
-            "summary": f"{type_}: {payload.get('name', 'No name provided')}",
-            "description": formatted_description,
-            "issuetype": {"name": "Incident"},
-            "priority": {"name": jira_priority},
-            "labels": ["causely-alert"],
-        }
-    }
-
-
-def forward_to_jira(payload, jira_api_url, jira_auth_token):
-    print(payload, file=sys.stderr)
-    print(payload.get("type"), file=sys.stderr)
-
-    type_ = "Root Cause Identified" if check_problem_detected(payload) else "Root Cause Cleared"
-    jira_data = create_jira_payload(payload, type_)
-
-    headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {jira_auth_token}",
     }
 
-    response = requests.post(f"{jira_api_url}/rest/api/2/issue", json=jira_data, headers=headers)
 
-    if response.status_code not in (200, 201):  # Jira returns 201 for created issues
-        print(f"Error creating Jira issue: {response.status_code}, {response.text}", file=sys.stderr)
-    else:
-        print("Issue successfully created in Jira.", file=sys.stderr)
-
-    return response 
\ No newline at end of file
+def _jira_post(url, jira_auth_token, body):
+    """POST to the Jira REST API, returning a synthetic error response if the request fails."""
+    try:
+        return requests.post(
+            url, data=json.dumps(body).encode("utf-8"), headers=_jira_headers(jira_auth_token), timeout=JIRA_TIMEOUT,
+        )
+    except requests.exceptions.RequestException as e:
+        return make_error_response(500, f"Jira request failed: {e}")
+
+
+def _create_issue_batch(items):
+    """
+    Create the issues of a batch of (jira_api_url, jira_auth_token, issue) items, with one bulk call when there
+    are several. Returns one response per item: a 201 with the created issue, or the error of the item.
+    """
+    jira_api_url, jira_auth_token, issue = items[0]
+    if len(items) == 1:
+        return [_jira_post(f"{jira_api_url}/rest/api/2/issue", jira_auth_token, issue)]
+    response = _jira_post(
+        f"{jira_api_url}/rest/api/2/issue/bulk", jira_auth_token, {"issueUpdates": [issue for *_, issue in items]},
+    )
+    try:
+        result = response.json()
+    except ValueError:
+        result = None
+    if not isinstance(result, dict) or not (result.get("issues") or result.get("errors")):
+        # The whole call failed, every delivery reports its response
+        return [response] * len(items)
+    # Created issues are listed in order, skipping the failed elements
+    errors = {error.get("failedElementNumber"): error for error in result.get("errors") or ()}
+    created = iter(result.get("issues") or ())
+    responses = []
+    for i in range(len(items)):
+        error = errors.get(i)
+        if error is not None:
+            message = json.dumps(error.get("elementErrors") or error)
+            responses.append(make_error_response(error.get("status") or 400, message))
+            continue
+        issue = next(created, None)
+        if issue is None:
+            responses.append(make_error_response(500, "Jira did not return the issue of a bulk create"))
+        else:
+            responses.append(make_response(201, json.dumps(issue)))
+    return responses
+
+
+jira_batchers = MicroBatchers(lambda key: MicroBatcher(_create_issue_batch, JIRA_BULK_SIZE))
+
+
+def create_jira_issue(jira_api_url, jira_auth_token, issue):
+    """Create an issue, together with the issues created on the same Jira at the same time."""
+    return jira_batchers.get((jira_api_url, jira_auth_token)).submit((jira_api_url, jira_auth_token, issue))
+
+
+def _resolve_issue(jira_api_url, jira_auth_token, issue_key):
+    """Transition an issue to the first status of the done category its workflow allows."""
+    url = f"{jira_api_url}/rest/api/2/issue/{issue_key}/transitions"
+    try:
+        response = requests.get(url, headers=_jira_headers(jira_auth_token), timeout=JIRA_TIMEOUT)
+        transitions = response.json().get("transitions", []) if response.ok else []
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return make_error_response(500, f"Jira request failed: {e}")
+    if not response.ok:
+        return response
+    done = next(
+        (
+            transition for transition in transitions
+            if (transition.get("to") or {}).get("statusCategory", {}).get("key") == "done"
+        ),
+        None,
+    )
+    if done is None:
+        return make_error_response(500, f"No transition of Jira issue {issue_key} leads to a done status")
+    return _jira_post(url, jira_auth_token, {"transition": {"id": done["id"]}})
+
+
+def forward_to_jira_issue(payload, issue, jira_api_url, jira_auth_token, project, index):
+    """
+    Keep one Jira issue per root cause.
+    The first notification of a root cause creates an issue labeled with its objectId, and the issue key is stored
+    in the index. Updates add a comment to the issue, and clears add a comment and transition it to done.
+    Payloads without an objectId create an issue each, as before.
+
+    Args:
+        payload (dict): The notification payload.
+        issue (dict): The Jira issue rendered from templates/jira.json.j2.
+        jira_api_url (str): The Jira base URL.
+        jira_auth_token (str): The Jira API token.
+        project (str): The key of the project to create issues in, or None for the project of the template.
+        index (ObjectIndex): The issue key of each root cause.
+
+    Returns:
+        requests.Response: The response of the last call, a synthetic response if no call was needed or it failed.
+    """
+    fields = issue.setdefault("fields", {})
+    if project is not None:
+        fields["project"] = {"key": project}
+    object_id = payload.get("objectId")
+    detected = check_problem_detected(payload)
+
+    issue_key = index.get(object_id) if object_id else None
+    if issue_key is not None:
+        comment = f"*{fields.get('summary', '')}*\n\n{fields.get('description', '')}"
+        response = _jira_post(
+            f"{jira_api_url}/rest/api/2/issue/{issue_key}/comment", jira_auth_token, {"body": comment},
+        )
+        if response.status_code != 404:
+            if response.ok and not detected:
+                response = _resolve_issue(jira_api_url, jira_auth_token, issue_key)
+                if response.ok:
+                    index.remove(object_id)
+            return response
+        # The issue was deleted, a new one is created
+        index.remove(object_id)
+
+    if object_id and not detected:
+        # A cleared root cause without an open issue needs none
+        return make_response(200, f"No open Jira issue for root cause {object_id}")
+
+    if object_id:
+        fields["labels"] = list(fields.get("labels") or ()) + [root_cause_label(object_id)]
+    response = create_jira_issue(jira_api_url, jira_auth_token, issue)
+    if object_id and response.status_code == 201:
+        try:
+            index.put(object_id, response.json()["key"])
+        except (ValueError, KeyError):
+            print(f"Jira did not return the key of the issue of root cause {object_id}", file=sys.stderr)
+    return response
+
+
+def rebuild_jira_index(jira_api_url, jira_auth_token, project, index):
+    """
+    Add the open issues created by the bot to the index, found by a JQL search on their labels, oldest first.
+    Raises requests.exceptions.RequestException if the search fails.
+
+    Returns:
+        int: The number of root causes with an open issue.
+    """
+    jql = f'labels = "{ALERT_LABEL}" AND statusCategory != Done ORDER BY created ASC'
+    if project is not None:
+        jql = f'project = "{project}" AND {jql}'
+    found = []
+    start = 0
+    while True:
+        response = requests.get(
+            f"{jira_api_url}/rest/api/2/search",
+            params={"jql": jql, "fields": "labels", "startAt": start, "maxResults": SEARCH_PAGE_SIZE},
+            headers=_jira_headers(jira_auth_token),
+            timeout=JIRA_TIMEOUT,
+        )
+        response.raise_for_status()
+        data = response.json()
+        issues = data.get("issues") or []
+        for issue in issues:
+            for label in (issue.get("fields") or {}).get("labels") or ():
+                object_id = root_cause_id(label)
+                if object_id:
+                    found.append((object_id, issue["key"]))
+        start += len(issues)
+        if not issues or start >= data.get("total", 0):
+            break
+    index.update(found)
+    return len(found)
@@ -0,0 +1,317 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This script defines the message templates the Slack, Teams, Jira and Opsgenie bodies are rendered from.
+Templates are Jinja2 files rendering JSON. The built-in templates live in the templates directory next to this
+script, and a configured template directory can override them or add per-webhook variants. Each template is
+compiled once, when the configuration is loaded, and its static text is emitted as preformatted string constants.
+Messages are rendered within the budget of their destination: the number of SLOs listed and the length of the
+payload texts are capped before rendering, so the render cost stays bounded however large the payload is.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from json.encoder import encode_basestring_ascii
+from typing import NamedTuple
+
+import jinja2
+
+from causely_notification import jira
+from causely_notification import opsgenie
+from causely_notification import slack
+from causely_notification import teams
+from causely_notification.date import parse_iso_date
+from causely_notification.jira import PRIORITY_MAP as JIRA_PRIORITY_MAP
+from causely_notification.jira import SLO_STATUS_TEXT as JIRA_SLO_STATUS_TEXT
+from causely_notification.opsgenie import PRIORITY_MAP as OPSGENIE_PRIORITY_MAP
+from causely_notification.opsgenie import SLO_STATUS_TEXT as OPSGENIE_SLO_STATUS_TEXT
+from causely_notification.slack import SLO_STATUS_ICONS as SLACK_SLO_STATUS_ICONS
+from causely_notification.teams import SLO_STATUS_ICONS as TEAMS_SLO_STATUS_ICONS
+from causely_notification.utils import check_problem_detected
+from causely_notification.utils import truncate_text
+
+BUILTIN_TEMPLATE_DIRECTORY = os.path.join(os.path.dirname(__file__), 'templates')
+
+# The template of each hook type, unless a webhook names its own
+DEFAULT_TEMPLATES = {
+    'slack': 'slack.json.j2',
+    'teams': 'teams.json.j2',
+    'jira': 'jira.json.j2',
+    'opsgenie': 'opsgenie.json.j2',
+}
+
+# Remediation options listed in a message, the first ones are the most relevant
+MAX_REMEDIATION_OPTIONS = 10
+# Shortest text a message budget is reduced to
+MIN_TEXT_LENGTH = 100
+
+
+class MessageBudget(NamedTuple):
+    """
+    The size limits a message is rendered within.
+
+    Attributes:
+        max_slos (int): SLOs listed, the others are summarized in one line.
+        max_text_length (int): Characters kept of each summary and remediation text.
+        max_bytes (int): Size of the rendered body, or None if the destination has no limit.
+    """
+    max_slos: int
+    max_text_length: int
+    max_bytes: int | None = None
+
+    def reduce(self):
+        """Return a smaller budget, listing half the SLOs and, once none are left, keeping half the text."""
+        if self.max_slos > 0:
+            return self._replace(max_slos=self.max_slos // 2)
+        return self._replace(max_text_length=max(self.max_text_length // 2, MIN_TEXT_LENGTH))
+
+    def reducible(self):
+        return self.max_slos > 0 or self.max_text_length > MIN_TEXT_LENGTH
+
+
+# The budget of each hook type. Slack limits the blocks of a message and the text of a section to 3000 characters,
+# Teams limits the size of a card to about 28 KB.
+MESSAGE_BUDGETS = {
+    'slack': MessageBudget(max_slos=slack.MAX_SLOS, max_text_length=1400),
+    'teams': MessageBudget(max_slos=teams.MAX_SLOS, max_text_length=4000, max_bytes=28_000),
+    'jira': MessageBudget(max_slos=jira.MAX_SLOS, max_text_length=10_000),
+    'opsgenie': MessageBudget(max_slos=opsgenie.MAX_SLOS, max_text_length=5_000),
+}
+DEFAULT_BUDGET = MessageBudget(max_slos=100, max_text_length=10_000)
+
+# Read in place of a missing SLO entity, never modified
+_EMPTY = {}
+# Display titles of the SLO statuses the messages know, others are computed per SLO
+_STATUS_TITLES = {status: status.replace('_', ' ').title() for status in JIRA_SLO_STATUS_TEXT}
+
+# Static lookup tables available to every template
+TEMPLATE_GLOBALS = {
+    'slack_slo_status_icons': SLACK_SLO_STATUS_ICONS,
+    'teams_slo_status_icons': TEAMS_SLO_STATUS_ICONS,
+    'jira_slo_status_text': JIRA_SLO_STATUS_TEXT,
+    'jira_priorities': JIRA_PRIORITY_MAP,
+    'opsgenie_priorities': OPSGENIE_PRIORITY_MAP,
+    'opsgenie_slo_status_text': OPSGENIE_SLO_STATUS_TEXT,
+}
+
+# Rendered when a template is loaded, to check it produces JSON for both detected and cleared notifications
+SAMPLE_PAYLOAD = {
+    "link": "https://portal.causely.app/rootCauses/1",
+    "name": "Malfunction",
+    "type": "ProblemDetected",
+    "entity": {"id": "1", "name": "checkout", "type": "Service", "link": "https://portal.causely.app/entities/1"},
+    "labels": {"causely.ai/cluster": "prod", "causely.ai/namespace": "shop"},
+    "objectId": "1",
+    "severity": "High",
+    "timestamp": "2025-08-07T18:51:54.164185287Z",
+    "description": {
+        "summary": "High error rate",
+        "details": "Details",
+        "remediationOptions": [
+            {"title": "Check Logs", "description": "Inspect the logs"},
+            {"title": "Restart", "description": "Restart the service"},
+        ],
+    },
+    "slos": [
+        {
+            "status": "AT_RISK",
+            "slo_entity": {"name": "checkout-availability", "link": "https://portal.causely.app/slos/1"},
+            "related_entity": {"name": "checkout", "link": "https://portal.causely.app/entities/1"},
+        },
+    ],
+}
+
+
+def slo_entry(slo):
+    """Return the template context entry of an SLO of a payload."""
+    slo_entity = slo.get('slo_entity') or _EMPTY
+    related_entity = slo.get('related_entity') or _EMPTY
+    status = slo.get('status', 'UNKNOWN')
+    return {
+        'name': slo_entity.get('name', 'Unknown SLO'),
+        'link': slo_entity.get('link'),
+        'status': status,
+        'status_title': _STATUS_TITLES.get(status) or status.replace('_', ' ').title(),
+        'related_entity': {
+            'name': related_entity.get('name', 'Unknown Service'),
+            'link': related_entity.get('link'),
+        },
+    }
+
+
+def template_context(payload, budget=DEFAULT_BUDGET, slos=None):
+    """
+    Return the variables templates are rendered with, computed once per payload and budget and shared by all
+    templates. Missing values are None, except for the entity and SLO names, which every message names the same way.
+    Templates read them with subscripts, which Jinja2 evaluates much faster than method calls on the payload.
+    Only the SLOs and texts within the budget are read, slos_omitted counts the SLOs left out. The slo_entry of
+    the first SLOs can be given as slos when they were already computed for another budget.
+    """
+    description = payload.get('description') or {}
+    entity = payload.get('entity') or {}
+    labels = payload.get('labels') or {}
+    max_text_length = budget.max_text_length
+    payload_slos = payload.get('slos') or ()
+    if slos is None:
+        slos = [slo_entry(slo) for slo in payload_slos[:budget.max_slos]]
+    else:
+        slos = slos[:budget.max_slos]
+    return {
+        'payload': payload,
+        'object_id': payload.get('objectId'),
+        'detected': check_problem_detected(payload),
+        'name': payload.get('name'),
+        'severity': payload.get('severity'),
+        'timestamp': parse_iso_date(payload.get('timestamp')),
+        'link': payload.get('link'),
+        'entity': {
+            'name': entity.get('name', 'Unknown Entity'),
+            'link': entity.get('link'),
+        },
+        'cluster': labels.get('causely.ai/cluster', 'Unknown Cluster'),
+        'namespace': labels.get('causely.ai/namespace', 'Unknown Namespace'),
+        'summary': truncate_text(description.get('summary'), max_text_length),
+        'remediation_options': [
+            {
+                'title': truncate_text(option.get('title'), max_text_length),
+                'description': truncate_text(option.get('description'), max_text_length),
+            }
+            for option in (description.get('remediationOptions') or ())[:MAX_REMEDIATION_OPTIONS]
+        ],
+        'slos': slos,
+        'slos_omitted': max(len(payload_slos) - budget.max_slos, 0),
+    }
+
+
+class TemplateContexts:
+    """
+    The template contexts of one payload, each computed once per budget and timestamp display settings.
+    Budgets listing all the SLOs of the payload and keeping its texts whole give the same context, so the hook
+    types whose budgets the payload fits share one. The SLO entries are computed once for all the budgets.
+    """
+
+    def __init__(self, payload):
+        self.payload = payload
+        self._contexts = {}
+        self._slos = []
+        self._slo_count = None
+        self._longest_text = None
+
+    def get(self, budget=DEFAULT_BUDGET, timezone=None, date_format=None):
+        key = (budget, timezone, date_format)
+        context = self._contexts.get(key)
+        if context is None:
+            base = self._base(budget)
+            context = base
+            if timezone is not None or date_format is not None:
+                context = {**base, 'timestamp': parse_iso_date(self.payload.get('timestamp'), timezone, date_format)}
+            self._contexts[key] = context
+        return context
+
+    def budget(self, budget):
+        """Return the smallest budget giving the payload the same context as budget."""
+        if self._slo_count is None:
+            description = self.payload.get('description') or {}
+            texts = [description.get('summary')]
+            for option in (description.get('remediationOptions') or ())[:MAX_REMEDIATION_OPTIONS]:
+                texts.append(option.get('title'))
+                texts.append(option.get('description'))
+            self._longest_text = max((len(text) for text in texts if isinstance(text, str)), default=0)
+            self._slo_count = len(self.payload.get('slos') or ())
+        return MessageBudget(
+            max_slos=min(budget.max_slos, self._slo_count),
+            max_text_length=min(budget.max_text_length, self._longest_text),
+        )
+
+    def _base(self, budget):
+        budget = self.budget(budget)
+        key = (budget, None, None)
+        base = self._contexts.get(key)
+        if base is None:
+            if len(self._slos) < budget.max_slos:
+                self._slos.extend(slo_entry(slo) for slo in self.payload['slos'][len(self._slos):budget.max_slos])
+            base = self._contexts[key] = template_context(self.payload, budget, self._slos)
+        return base
+
+
+def json_value(value):
+    """The json filter: serialize a value as JSON, with a fast path for strings."""
+    if type(value) is str:
+        return encode_basestring_ascii(value)
+    return json.dumps(value)
+
+
+class MessageTemplates:
+    """
+    The compiled message templates of a configuration.
+
+    Args:
+        directory (str): Optional directory searched for templates before the built-in ones.
+    """
+
+    def __init__(self, directory=None):
+        loaders = []
+        if directory:
+            loaders.append(jinja2.FileSystemLoader(directory))
+        loaders.append(jinja2.FileSystemLoader(BUILTIN_TEMPLATE_DIRECTORY))
+        self.environment = jinja2.Environment(
+            loader=jinja2.ChoiceLoader(loaders),
+            autoescape=False,
+            auto_reload=False,
+        )
+        self.environment.filters['json'] = json_value
+        self.environment.globals.update(TEMPLATE_GLOBALS)
+        self.templates = {}
+        self._lock = threading.Lock()
+        self.load(DEFAULT_TEMPLATES.values())
+
+    def load(self, names):
+        """Compile and check templates, raising ValueError if one is missing or does not render JSON."""
+        for name in names:
+            self.get(name)
+
+    def get(self, name):
+        """Return a compiled template, compiling it on first use."""
+        template = self.templates.get(name)
+        if template is None:
+            with self._lock:
+                template = self.templates.get(name)
+                if template is None:
+                    template = self.templates[name] = self._compile(name)
+        return template
+
+    def render(self, name, context):
+        """Render a template with a template_context, returning the JSON text."""
+        return self.get(name).render(context)
+
+    def _compile(self, name):
+        try:
+            template = self.environment.get_template(name)
+        except jinja2.TemplateError as e:
+            raise ValueError(f"Invalid message template '{name}': {e}") from e
+        # Every render copies the template globals into its context. They are a ChainMap of the template and
+        # environment globals, which copies several times slower than a dict and made up a third of a render.
+        template.globals = dict(template.globals)
+        for type_ in ('ProblemDetected', 'ProblemCleared'):
+            sample = template_context({**SAMPLE_PAYLOAD, 'type': type_})
+            try:
+                json.loads(template.render(sample))
+            except (jinja2.TemplateError, ValueError) as e:
+                raise ValueError(f"Message template '{name}' does not render valid JSON: {e}") from e
+        return template
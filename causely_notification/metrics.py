@@ -0,0 +1,43 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""
+This script defines the metrics served on the /metrics endpoint. Components register a collector, a function
+returning a JSON-serializable snapshot of their metrics, which is called on every request to the endpoint.
+"""
+from __future__ import annotations
+
+import threading
+
+
+class MetricsRegistry:
+    """Named metric collectors, snapshotted together."""
+
+    def __init__(self):
+        self.collectors = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, collector):
+        """Register a collector under a name, replacing any collector with the same name."""
+        with self._lock:
+            self.collectors[name] = collector
+
+    def snapshot(self):
+        """Return the metrics of every collector, keyed by collector name."""
+        with self._lock:
+            collectors = list(self.collectors.items())
+        return {name: collector() for name, collector in collectors}
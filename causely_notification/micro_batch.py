@@ -0,0 +1,128 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This script defines micro-batching of the API calls made by concurrent notifications. Items submitted to the same
+MicroBatcher within a short window, or until the batch is full, are sent together with one call, and each
+submitting thread gets back the result of its own item. During a storm of notifications this replaces many
+round-trips with a few, while a lone notification only waits for the window.
+"""
+from __future__ import annotations
+
+import threading
+
+# Seconds the first item of a batch waits for others
+BATCH_WINDOW = 0.05
+
+
+class _Batch:
+
+    def __init__(self):
+        self.items = []
+        self.results = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Collects the items submitted by concurrent threads for up to window seconds, or until max_items are pending,
+    and sends them with send(items). send returns one result per item, in order, and a result that is an
+    exception is raised in the thread that submitted the item. The thread submitting the first item of a batch
+    sends it, the others wait for their result.
+    """
+
+    def __init__(self, send, max_items, window=BATCH_WINDOW):
+        self.send = send
+        self.max_items = max_items
+        self.window = window
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+        self._lock = threading.Lock()
+        self._pending = None
+
+    def submit(self, item):
+        """Add an item to the pending batch and return its result once the batch is sent."""
+        with self._lock:
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = self._pending = _Batch()
+            position = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.max_items:
+                self._pending = None
+                batch.full.set()
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._pending is batch:
+                    self._pending = None
+            self._send(batch)
+        else:
+            batch.done.wait()
+        result = batch.results[position]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def stats(self):
+        return {"batches": self.batches, "items": self.items, "largest": self.largest}
+
+    def _send(self, batch):
+        try:
+            results = list(self.send(batch.items))
+            if len(results) != len(batch.items):
+                raise RuntimeError(f"Batch of {len(batch.items)} items returned {len(results)} results")
+        except Exception as e:
+            results = [e] * len(batch.items)
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch.items)
+            self.largest = max(self.largest, len(batch.items))
+        batch.results = results
+        batch.done.set()
+
+
+class MicroBatchers:
+    """The MicroBatcher of each key, such as a repository, created on first use with make(key)."""
+
+    def __init__(self, make):
+        self.make = make
+        self._lock = threading.Lock()
+        self._batchers = {}
+
+    def get(self, key):
+        with self._lock:
+            batcher = self._batchers.get(key)
+            if batcher is None:
+                batcher = self._batchers[key] = self.make(key)
+            return batcher
+
+    def clear(self):
+        with self._lock:
+            self._batchers.clear()
+
+    def stats(self):
+        with self._lock:
+            batchers = list(self._batchers.values())
+        stats = {"batches": 0, "items": 0, "largest": 0}
+        for batcher in batchers:
+            stats["batches"] += batcher.batches
+            stats["items"] += batcher.items
+            stats["largest"] = max(stats["largest"], batcher.largest)
+        return stats
@@ -0,0 +1,191 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This script defines the index of the messages and issues created for each root cause, keyed by its objectId, so
+later notifications of the same root cause update them instead of creating new ones. Each webhook has its own
+bounded LRU index. With a state directory, an index is loaded from a JSON file, and its changes are written back
+in the background at most every FLUSH_INTERVAL seconds and at exit, so the mapping survives a restart without a
+rewrite of the whole file on every notification.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+# Maximum number of root causes remembered per webhook
+OBJECT_INDEX_SIZE = 10_000
+# Seconds between two writes of a changed index, the changes a crash can lose
+FLUSH_INTERVAL = 1.0
+
+
+class ObjectIndex:
+    """
+    LRU map of root cause objectIds to the ID of the message or issue created for them, such as a Slack ts.
+    With a path, changes are only marked, and written to the file by flush.
+    """
+
+    def __init__(self, path=None, size=OBJECT_INDEX_SIZE):
+        self.path = path
+        self.size = size
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._dirty = False
+        if path is not None:
+            self._load()
+
+    def get(self, object_id):
+        """Return the ID stored for an objectId, or None if there is none."""
+        with self._lock:
+            value = self._entries.get(object_id)
+            if value is not None:
+                self._entries.move_to_end(object_id)
+            return value
+
+    def put(self, object_id, value):
+        """Store the ID of an objectId, evicting the least recently used one when full."""
+        with self._lock:
+            self._entries[object_id] = value
+            self._entries.move_to_end(object_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def update(self, items):
+        """Store many (objectId, ID) pairs, as when an index is rebuilt."""
+        with self._lock:
+            for object_id, value in items:
+                self._entries[object_id] = value
+                self._entries.move_to_end(object_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def remove(self, object_id):
+        with self._lock:
+            if self._entries.pop(object_id, None) is not None:
+                self._dirty = True
+
+    def flush(self):
+        """Write the index to its file if it changed since the last write. Returns True if it was written."""
+        if self.path is None:
+            return False
+        with self._flush_lock:
+            # Copied under the lock and written outside of it, so lookups never wait for the disk
+            with self._lock:
+                if not self._dirty:
+                    return False
+                entries = list(self._entries.items())
+                self._dirty = False
+            if self._save(entries):
+                return True
+            with self._lock:
+                self._dirty = True
+            return False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            # A damaged index only loses the threading of open root causes, so the bot still starts
+            print(f"Ignoring unreadable object index {self.path}: {e}", file=sys.stderr)
+            return
+        # Stored oldest first, as [objectId, ID] pairs
+        for object_id, value in entries[-self.size:]:
+            self._entries[object_id] = value
+
+    def _save(self, entries):
+        temporary = f"{self.path}.tmp"
+        try:
+            with open(temporary, 'w') as f:
+                json.dump(entries, f)
+            # Replaced atomically, so a crash never leaves a partial index
+            os.replace(temporary, self.path)
+            return True
+        except OSError as e:
+            print(f"Failed to save object index {self.path}: {e}", file=sys.stderr)
+            return False
+
+
+class ObjectIndexes:
+    """
+    The ObjectIndex of each webhook, created on first use. With a directory, the index of a webhook is persisted
+    to <directory>/<webhook name>.json, by a daemon thread flushing the changed indexes every flush_interval
+    seconds, and once more at exit or when stopped.
+    """
+
+    def __init__(self, directory=None, size=OBJECT_INDEX_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.size = size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def get(self, name):
+        index = self._indexes.get(name)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    path = None
+                    if self.directory is not None:
+                        # Percent-encoded, so different webhook names never share a file
+                        path = os.path.join(self.directory, f"{quote(name, safe='')}.json")
+                    index = self._indexes[name] = ObjectIndex(path, self.size)
+                    if path is not None:
+                        self._start()
+        return index
+
+    def flush(self):
+        """Write every index changed since its last write."""
+        with self._lock:
+            indexes = list(self._indexes.values())
+        for index in indexes:
+            index.flush()
+
+    def stop(self):
+        """Stop the background writes, after writing the changes left."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def stats(self):
+        return {name: len(index) for name, index in self._indexes.items()}
+
+    def _start(self):
+        if self._thread is None and not self._stopped.is_set():
+            self._thread = threading.Thread(target=self._run, name="object-indexes", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
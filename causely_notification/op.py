@@ -20,14 +20,23 @@ comparison to the filter data.
 """
 from __future__ import annotations
 
+from causely_notification.patterns import compile_pattern_test
+from causely_notification.patterns import PATTERN_OPERATORS
+from causely_notification.thresholds import compare
+from causely_notification.thresholds import COMPARISON_OPERATORS
+from causely_notification.thresholds import DEFAULT_ORDERING
+
 
 class Operator:
-    def __init__(self, operator):
+    valid_operators = [
+        'equals', 'not_equals',
+        'in', 'not_in',
+    ] + PATTERN_OPERATORS + COMPARISON_OPERATORS
+
+    def __init__(self, operator, ordering=None):
         self.operator = operator
-        self.valid_operators = [
-            'equals', 'not_equals',
-            'in', 'not_in',
-        ]
+        # Ranks the values compared by gte, lte, gt and lt
+        self.ordering = ordering if ordering is not None else DEFAULT_ORDERING
         if operator not in self.valid_operators:
             raise ValueError(f"Invalid operator '{operator}'. Valid operators are {
                              self.valid_operators
@@ -35,6 +44,10 @@ class Operator:
 
     def apply(self, field_value, value):
         """Apply the operator to the given field_value and target value."""
+        if self.operator in PATTERN_OPERATORS:
+            return compile_pattern_test(self.operator, value)(field_value)
+        if self.operator in COMPARISON_OPERATORS:
+            return self.compile(value)(field_value)
         method_name = f"_apply_{self.operator}"
         method = getattr(self, method_name, None)
         if not method:
@@ -43,6 +56,22 @@ class Operator:
             )
         return method(field_value, value)
 
+    def compile(self, value):
+        """
+        Bind the operator to its target value and return a single-argument predicate.
+        The value is validated and converted once here rather than on every apply.
+        """
+        if self.operator in PATTERN_OPERATORS:
+            return compile_pattern_test(self.operator, value)
+        if self.operator in COMPARISON_OPERATORS:
+            return self._compile_comparison(value)
+        method = getattr(self, f"_compile_{self.operator}", None)
+        if not method:
+            raise NotImplementedError(
+                f"Operator '{self.operator}' cannot be compiled.",
+            )
+        return method(value)
+
     def _apply_equals(self, field_value, value):
         return field_value == value
 
@@ -66,3 +95,60 @@ class Operator:
                 }",
             )
         return field_value not in value
+
+    def _compile_equals(self, value):
+        return lambda field_value: field_value == value
+
+    def _compile_not_equals(self, value):
+        return lambda field_value: field_value != value
+
+    def _compile_in(self, value):
+        if not isinstance(value, list):
+            raise ValueError(
+                f"Operator 'in' requires a list as value, but got {
+                    type(value)
+                }",
+            )
+        return _membership_predicate(value, negate=False)
+
+    def _compile_not_in(self, value):
+        if not isinstance(value, list):
+            raise ValueError(
+                f"Operator 'not_in' requires a list as value, but got {
+                    type(value)
+                }",
+            )
+        return _membership_predicate(value, negate=True)
+
+    def _compile_comparison(self, value):
+        operator = self.operator
+        rank = self.ordering.rank
+        threshold_rank = self.ordering.threshold_rank(operator, value)
+
+        def predicate(field_value):
+            field_rank = rank(field_value)
+            return field_rank is not None and compare(operator, field_rank, threshold_rank)
+        return predicate
+
+
+def _membership_predicate(values, negate):
+    """Return a predicate testing membership in values, using a frozenset when all values are hashable."""
+    try:
+        members = frozenset(values)
+    except TypeError:
+        # Unhashable filter values (e.g. nested lists) keep the list semantics
+        members = tuple(values)
+        if negate:
+            return lambda field_value: field_value not in members
+        return lambda field_value: field_value in members
+
+    def contains(field_value):
+        try:
+            return field_value in members
+        except TypeError:
+            # An unhashable field value cannot equal any of the hashable members
+            return False
+
+    if negate:
+        return lambda field_value: not contains(field_value)
+    return contains
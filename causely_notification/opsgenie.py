@@ -18,99 +18,187 @@ from __future__ import annotations
 
 import json
 import sys
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
 
 import requests
 
-from .date import parse_iso_date
 from .utils import check_problem_detected
-
-
-def create_opsgenie_description(payload):
-    description = payload.get("description", {}).get("summary", "No summary provided.")
-    return description
-
-
-def create_opsgenie_remediation(payload):
-    remediation_options = payload.get("description", {}).get("remediationOptions", [])
-    if not remediation_options:
-        return "No remediation options provided."
-    return "\n".join(
-        [f"- {option.get('title')}: {option.get('description')}" for option in remediation_options]
-    )
-
-
-def create_opsgenie_slos(payload):
-    slos = payload.get("slos", [])
-    if not slos:
-        return "No SLOs impacted."
-
-    status_icons = {
-        "AT_RISK": "⚠️ At Risk",
-        "HEALTHY": "✅ Healthy",
-        "VIOLATED": "❌ Violated",
-        "NORMAL": "ℹ️ Normal",
-        "UNKNOWN": "❓ Unknown",
-    }
-
-    slo_lines = ["Impacted SLOs:"]
-    for slo in slos:
-        slo_entity = slo.get("slo_entity", {})
-        slo_name = slo_entity.get("name", "Unknown SLO")
-        slo_status = slo.get("status", "UNKNOWN")
-        slo_status_text = status_icons.get(slo_status, slo_status)
-
-        related_entity = slo.get("related_entity", {})
-        related_entity_name = related_entity.get("name", "Unknown Service")
-
-        slo_lines.append(f"- {slo_name} ({slo_status_text}) - Impacted Service: {related_entity_name}")
-
-    return "\n".join(slo_lines)
-
-
-def create_opsgenie_payload(payload, type_: str):
-    entity = payload.get("entity", {})
-    entity_name = entity.get("name", "Unknown Entity")
-    timestamp = parse_iso_date(payload.get("timestamp"))
-    severity = payload.get("severity", "Unknown")
-    description = create_opsgenie_description(payload)
-    remediation = create_opsgenie_remediation(payload)
-    slos = create_opsgenie_slos(payload)
-
-    message = f"{type_}: {payload.get('name', 'No name provided')}"
-    details = {
-        "severity": severity,
-        "affected_entity": entity_name,
-        "timestamp": timestamp,
-        "description": description,
-        "remediation": remediation,
-        "slos": slos,
-    }
-
+from .utils import make_error_response
+
+# At most MAX_SLOS SLOs are listed, so the description stays bounded
+MAX_SLOS = 50
+
+OPSGENIE_TIMEOUT = 30
+# Opsgenie processes alert requests asynchronously. At most TRACKED_REQUESTS request IDs are kept, and each is
+# polled every POLL_INTERVAL seconds until it was processed or it was polled MAX_POLLS times.
+TRACKED_REQUESTS = 1000
+POLL_INTERVAL = 5
+MAX_POLLS = 6
+
+# Map severity to Opsgenie priority levels
+PRIORITY_MAP = {
+    "critical": "P1",
+    "high": "P2",
+    "medium": "P3",
+    "low": "P4",
+    "info": "P5",
+}
+
+SLO_STATUS_TEXT = {
+    "AT_RISK": "⚠️ At Risk",
+    "HEALTHY": "✅ Healthy",
+    "VIOLATED": "❌ Violated",
+    "NORMAL": "ℹ️ Normal",
+    "UNKNOWN": "❓ Unknown",
+}
+
+
+class OpsgenieRequests:
+    """
+    The asynchronous Opsgenie requests waiting to be processed, polled in the background so that delivering a
+    notification never waits for them. Bounded: when full, the oldest request is dropped unpolled.
+    """
+
+    def __init__(self, size=TRACKED_REQUESTS, poll_interval=POLL_INTERVAL, max_polls=MAX_POLLS):
+        self.size = size
+        self.poll_interval = poll_interval
+        self.max_polls = max_polls
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()
+        self._thread = None
+        self.succeeded = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def track(self, request_id, opsgenie_api_url, opsgenie_api_key, action):
+        with self._lock:
+            self._pending[request_id] = [opsgenie_api_url, opsgenie_api_key, action, 0]
+            while len(self._pending) > self.size:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+
+    def start(self):
+        """Start polling in a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="opsgenie-requests", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self.poll()
+
+    def poll(self):
+        """Poll the status of every pending request once."""
+        with self._lock:
+            pending = list(self._pending.items())
+        for request_id, entry in pending:
+            opsgenie_api_url, opsgenie_api_key, action, polls = entry
+            status = _request_status(opsgenie_api_url, opsgenie_api_key, request_id)
+            with self._lock:
+                if request_id not in self._pending:
+                    continue
+                if status is None:
+                    # Not processed yet
+                    entry[3] = polls + 1
+                    if entry[3] < self.max_polls:
+                        continue
+                    self.dropped += 1
+                elif status.get("isSuccess"):
+                    self.succeeded += 1
+                else:
+                    self.failed += 1
+                    print(f"Opsgenie {action} request {request_id} failed: {status.get('status')}", file=sys.stderr)
+                del self._pending[request_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "dropped": self.dropped,
+            }
+
+
+opsgenie_requests = OpsgenieRequests()
+
+
+def _request_status(opsgenie_api_url, opsgenie_api_key, request_id):
+    """Return the status of a processed request, or None if it was not processed yet or could not be read."""
+    try:
+        response = requests.get(
+            f"{opsgenie_api_url}/requests/{request_id}", headers=_opsgenie_headers(opsgenie_api_key),
+            timeout=OPSGENIE_TIMEOUT,
+        )
+        if response.status_code != 200:
+            return None
+        return response.json().get("data")
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+
+
+def _opsgenie_headers(opsgenie_api_key):
     return {
-        "message": message,
-        "description": description,
-        "details": details,
-        "priority": severity.upper(),
-    }
-
-
-def forward_to_opsgenie(payload, opsgenie_api_url, opsgenie_api_key):
-    print(payload, file=sys.stderr)
-    print(payload.get("type"), file=sys.stderr)
-
-    type_ = "Root Cause Identified" if check_problem_detected(payload) else "Root Cause Cleared"
-    opsgenie_data = create_opsgenie_payload(payload, type_)
-
-    headers = {
         "Content-Type": "application/json",
         "Authorization": f"GenieKey {opsgenie_api_key}",
     }
 
-    response = requests.post(opsgenie_api_url, json=opsgenie_data, headers=headers)
 
-    if response.status_code != 202:  # Opsgenie returns 202 for accepted requests
-        print(f"Error posting to Opsgenie: {response.status_code}, {response.text}", file=sys.stderr)
-    else:
-        print("Payload successfully forwarded to Opsgenie.", file=sys.stderr)
-
-    return response
\ No newline at end of file
+def _opsgenie_call(send, opsgenie_api_url, path, opsgenie_api_key, body, action, tracker):
+    """
+    Send an Opsgenie alert request and track its request ID, returning a synthetic error response if it fails.
+    Opsgenie accepts alert requests with 202 and processes them later.
+    """
+    try:
+        response = send(
+            opsgenie_api_url + path, data=json.dumps(body).encode("utf-8"), headers=_opsgenie_headers(opsgenie_api_key),
+            timeout=OPSGENIE_TIMEOUT,
+        )
+    except requests.exceptions.RequestException as e:
+        return make_error_response(500, f"Opsgenie {action} failed: {e}")
+    if response.status_code == 202:
+        try:
+            request_id = response.json().get("requestId")
+        except (ValueError, AttributeError):
+            request_id = None
+        if isinstance(request_id, str):
+            tracker.track(request_id, opsgenie_api_url, opsgenie_api_key, action)
+    return response
+
+
+def forward_to_opsgenie_alert(payload, alert, opsgenie_api_url, opsgenie_api_key, tracker=opsgenie_requests):
+    """
+    Keep one Opsgenie alert per root cause, identified by the objectId as its alias.
+    Detections create the alert, which Opsgenie deduplicates while it is open. Updates create it too, in case the
+    webhook's filters only match the new severity, and change its priority. Clears close it.
+
+    Args:
+        payload (dict): The notification payload.
+        alert (dict): The Opsgenie alert rendered from templates/opsgenie.json.j2.
+        opsgenie_api_url (str): The Opsgenie alert API URL, https://api.opsgenie.com/v2/alerts.
+        opsgenie_api_key (str): The Opsgenie API key.
+        tracker (OpsgenieRequests): The requests polled for their status.
+
+    Returns:
+        requests.Response: The response of the first failed request, or of the last one.
+    """
+    object_id = payload.get("objectId")
+    alias = f"/{quote(object_id, safe='')}" if object_id else None
+    if alias is not None and not check_problem_detected(payload):
+        return _opsgenie_call(
+            requests.post, opsgenie_api_url, f"{alias}/close?identifierType=alias", opsgenie_api_key,
+            {"note": alert.get("message", "Root Cause Cleared")}, "close", tracker,
+        )
+
+    response = _opsgenie_call(requests.post, opsgenie_api_url, "", opsgenie_api_key, alert, "create", tracker)
+    priority = PRIORITY_MAP.get(str(payload.get("severity", "")).lower())
+    if alias is None or payload.get("type") != "ProblemUpdated" or priority is None or response.status_code != 202:
+        return response
+    return _opsgenie_call(
+        requests.put, opsgenie_api_url, f"{alias}/priority?identifierType=alias", opsgenie_api_key,
+        {"priority": priority}, "priority", tracker,
+    )
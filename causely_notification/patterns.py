@@ -0,0 +1,211 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This script defines the pattern operators (matches, starts_with, glob and their negations).
+Patterns are compiled once into a shared regex cache. The literal prefixes of all patterns on a field are stored in
+a prefix trie shared by every webhook, so a payload value is scanned once to find all of the prefixes it starts
+with, and regexes whose literal prefix is absent are never run.
+"""
+from __future__ import annotations
+
+import fnmatch
+import re
+import threading
+
+PATTERN_OPERATORS = [
+    'matches', 'not_matches',
+    'starts_with', 'not_starts_with',
+    'glob', 'not_glob',
+]
+
+# Regex metacharacters ending the literal prefix of a pattern
+_REGEX_SPECIAL = set('.^$*+?{}[]\\|()')
+# Quantifiers making the preceding character optional
+_OPTIONAL_QUANTIFIERS = set('*?{')
+_GLOB_SPECIAL = set('*?[')
+
+_regex_cache = {}
+_regex_cache_lock = threading.Lock()
+
+
+def compile_regex(pattern):
+    """Return the compiled regex of a pattern, compiling each distinct pattern once."""
+    regex = _regex_cache.get(pattern)
+    if regex is None:
+        with _regex_cache_lock:
+            regex = _regex_cache.get(pattern)
+            if regex is None:
+                regex = _regex_cache[pattern] = re.compile(pattern)
+    return regex
+
+
+def compile_glob(pattern):
+    """Return the compiled, case-sensitive regex of a glob pattern."""
+    return compile_regex(fnmatch.translate(pattern))
+
+
+def regex_literal_prefix(pattern):
+    """
+    Return the literal text every match of an anchored regex starts with, or '' if there is none.
+    Only patterns anchored with '^' and without alternation have a literal prefix.
+    """
+    if not pattern.startswith('^') or '|' in pattern:
+        return ''
+    prefix = []
+    i = 1
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            # Escaped punctuation is literal, escapes like \d or \w are character classes
+            if i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+                prefix.append(pattern[i + 1])
+                i += 2
+                continue
+            break
+        if char in _REGEX_SPECIAL:
+            if char in _OPTIONAL_QUANTIFIERS and prefix:
+                prefix.pop()
+            break
+        prefix.append(char)
+        i += 1
+    return ''.join(prefix)
+
+
+def glob_literal_prefix(pattern):
+    """Return the literal text every match of a glob pattern starts with."""
+    for i, char in enumerate(pattern):
+        if char in _GLOB_SPECIAL:
+            return pattern[:i]
+    return pattern
+
+
+class PrefixTrie:
+    """
+    Trie of the literal prefixes registered for one field.
+    prefixes_of walks a value once and returns every registered prefix it starts with. The result for the last
+    value is kept, so all the webhooks checking the same payload value share one walk.
+    """
+
+    _END = object()
+
+    def __init__(self):
+        self.root = {}
+        self._last = (None, frozenset())
+
+    def add(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self._END] = prefix
+        self._last = (None, frozenset())
+
+    def prefixes_of(self, text):
+        last_text, last_prefixes = self._last
+        if last_text is not None and (last_text is text or last_text == text):
+            return last_prefixes
+
+        prefixes = []
+        node = self.root
+        end = self._END
+        if end in node:
+            prefixes.append(node[end])
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            if end in node:
+                prefixes.append(node[end])
+        result = frozenset(prefixes)
+        # A single tuple assignment, so concurrent readers never see a mismatched pair
+        self._last = (text, result)
+        return result
+
+
+class PatternIndex:
+    """The prefix tries of all pattern filters, one per field, shared by all webhooks of a store."""
+
+    def __init__(self):
+        self.tries = {}
+
+    def trie_for(self, field):
+        trie = self.tries.get(field)
+        if trie is None:
+            trie = self.tries[field] = PrefixTrie()
+        return trie
+
+
+def compile_pattern_test(operator, pattern, trie=None):
+    """
+    Compile a pattern operator into a predicate on a field value.
+    Patterns apply to the string form of the value. When a trie is given, the literal prefix of the pattern is
+    registered in it and checked before the regex runs.
+
+    Args:
+        operator (str): One of PATTERN_OPERATORS.
+        pattern (str): The pattern value of the filter.
+        trie (PrefixTrie): Optional shared prefix trie of the field.
+
+    Returns:
+        callable: A function returning True if the value satisfies the operator.
+    """
+    if not isinstance(pattern, str):
+        raise ValueError(
+            f"Operator '{operator}' requires a string pattern, but got {type(pattern)}",
+        )
+    negate = operator.startswith('not_')
+    kind = operator[4:] if negate else operator
+
+    if kind == 'starts_with':
+        prefix = pattern
+        regex_test = None
+    elif kind == 'matches':
+        try:
+            regex_test = compile_regex(pattern).search
+        except re.error as error:
+            raise ValueError(
+                f"Operator '{operator}' requires a valid regular expression, but got {pattern!r}: {error}",
+            ) from error
+        prefix = regex_literal_prefix(pattern)
+    elif kind == 'glob':
+        prefix = glob_literal_prefix(pattern)
+        regex_test = compile_glob(pattern).match
+    else:
+        raise ValueError(f"Invalid pattern operator '{operator}'")
+
+    if trie is not None and prefix:
+        trie.add(prefix)
+        prefixes_of = trie.prefixes_of
+        if regex_test is None:
+            def test(value):
+                text = value if type(value) is str else str(value)
+                return prefix in prefixes_of(text)
+        else:
+            def test(value):
+                text = value if type(value) is str else str(value)
+                return prefix in prefixes_of(text) and regex_test(text) is not None
+    elif regex_test is None:
+        def test(value):
+            text = value if type(value) is str else str(value)
+            return text.startswith(prefix)
+    else:
+        def test(value):
+            text = value if type(value) is str else str(value)
+            return regex_test(text) is not None
+
+    if negate:
+        return lambda value: not test(value)
+    return test
@@ -16,29 +16,44 @@
 
 from __future__ import annotations
 
+import inspect
 import json
 import os
+import signal
 import sys
+from typing import Any
+from typing import Dict
 
 import yaml
 from flask import Flask
 from flask import jsonify
 from flask import request
 
-from typing import Dict, Any
-
+from causely_notification.date import validate_timezone
+from causely_notification.delivery import deliver
+from causely_notification.delivery import delivery_stats
+from causely_notification.delivery import is_root_cause_webhook
 from causely_notification.filter import WebhookFilterStore
-from causely_notification.github import forward_to_github
-from causely_notification.jira import forward_to_jira
-from causely_notification.opsgenie import forward_to_opsgenie
-from causely_notification.slack import forward_to_slack
-from causely_notification.teams import forward_to_teams
-from causely_notification.opsgenie import forward_to_opsgenie
-from causely_notification.debug import forward_to_debug
-from causely_notification.generic import forward_to_generic
+from causely_notification.github import issue_batchers as github_issue_batchers
+from causely_notification.github import issue_indexes as github_issue_indexes
+from causely_notification.github import repo_ids_cache as github_repo_ids_cache
+from causely_notification.github import warm_issue_index
+from causely_notification.github_client import github_client
+from causely_notification.jira import jira_batchers
+from causely_notification.jira import rebuild_jira_index
+from causely_notification.message_templates import MessageTemplates
+from causely_notification.metrics import MetricsRegistry
+from causely_notification.object_index import OBJECT_INDEX_SIZE
+from causely_notification.object_index import ObjectIndexes
+from causely_notification.opsgenie import opsgenie_requests
+from causely_notification.webhook import WebhookDefinition
 
 app = Flask(__name__)
 
+# The options of the top-level "filtering" config section
+FILTERING_OPTIONS = frozenset(inspect.signature(WebhookFilterStore).parameters)
+
+
 def load_config():
     with open("/etc/causelybot/config.yaml", 'r') as stream:
         return yaml.safe_load(stream)
@@ -50,11 +65,55 @@ def get_config():
 
 EXPECTED_TOKEN = os.getenv("AUTH_TOKEN")
 
-@app.route('/webhook', methods=['POST'])
-def webhook_routing():
+metrics = MetricsRegistry()
+# Looked up on every snapshot, so the metrics follow the current filter store
+metrics.register("filter_selectivity", lambda: filter_store.selectivity())
+metrics.register("decision_cache", lambda: filter_store.decision_cache_stats())
+metrics.register("delivery", delivery_stats.stats)
+metrics.register("object_indexes", lambda: object_indexes.stats())
+metrics.register("opsgenie_requests", opsgenie_requests.stats)
+metrics.register("github_issue_indexes", github_issue_indexes.stats)
+metrics.register("github_repo_ids", github_repo_ids_cache.stats)
+metrics.register("github_client", github_client.stats)
+metrics.register("github_issue_batches", github_issue_batchers.stats)
+metrics.register("jira_issue_batches", jira_batchers.stats)
+
+# The built-in message templates until a configuration is loaded
+message_templates = MessageTemplates()
+# The objectId indexes of threaded webhooks, in memory until a state directory is configured
+object_indexes = ObjectIndexes()
+
+
+def is_authorized():
     # Check for Bearer token in Authorization header
     auth_header = request.headers.get('Authorization')
-    if auth_header and auth_header.split(" ")[1] == EXPECTED_TOKEN:
+    if not auth_header:
+        return False
+    parts = auth_header.split(" ")
+    return len(parts) == 2 and parts[1] == EXPECTED_TOKEN
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_snapshot():
+    if not is_authorized():
+        return jsonify({"message": "Unauthorized"}), 401
+    return jsonify(metrics.snapshot()), 200
+
+
+@app.route('/webhook/explain', methods=['POST'])
+def webhook_explain():
+    """Run the filters on a payload without delivering it, and explain the result of every webhook."""
+    if not is_authorized():
+        return jsonify({"message": "Unauthorized"}), 401
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"message": "Expected a JSON object payload"}), 400
+    return jsonify(filter_store.explain(payload)), 200
+
+
+@app.route('/webhook', methods=['POST'])
+def webhook_routing():
+    if is_authorized():
         payload = request.json
         
         # Log the received payload for debugging
@@ -69,7 +128,8 @@ def webhook_routing():
         if notifType == "ProblemUpdated":
             # put the payload old severity into the payload and check which webhooks
             # would have previously matched
-            tempPayload = request.json
+            # A copy, so the payload forwarded below keeps its new severity
+            tempPayload = dict(payload)
             oldSeverity = tempPayload.get("old_severity", "")
             if oldSeverity != "":
                 tempPayload["severity"] = oldSeverity
@@ -77,8 +137,15 @@ def webhook_routing():
                 # Check if it matched before but didn't know - send an update
                 # Check if it didn't match before but does not - send an update
                 # Otherwise, no need to send an update - so get the webhooks that aren't in both sets
-                new_matches = list(set(old_matches) ^ set(matching_webhooks))
-                matching_webhooks = new_matches
+                new_matches = set(old_matches) ^ set(matching_webhooks)
+                if oldSeverity != payload.get("severity"):
+                    # Webhooks keeping a message, issue or alert per root cause update it whenever the severity
+                    # changes, so they get the update if they match the old or the new severity
+                    new_matches |= {
+                        name for name in set(old_matches) | set(matching_webhooks)
+                        if is_root_cause_webhook(webhook_lookup_map[name])
+                    }
+                matching_webhooks = list(new_matches)
         # If there are no matching webhooks, return 200 OK
         if not matching_webhooks:
             return jsonify({"message": "No matching webhooks found"}), 200
@@ -87,31 +154,16 @@ def webhook_routing():
         successful_forwards = []
         failed_forwards = []
 
-        for name in matching_webhooks:
-            hook_url = webhook_lookup_map[name]['url']
-            hook_type = webhook_lookup_map[name]['hook_type']
-            hook_token = webhook_lookup_map[name]['token']
-            hook_assignee = webhook_lookup_map[name].get('assignee')
-            match hook_type.lower():  # case-insensitive
-                case "teams":
-                    response = forward_to_teams(payload, hook_url)
-                case "slack":
-                    response = forward_to_slack(payload, hook_url, hook_token)
-                case "opsgenie":
-                    response = forward_to_opsgenie(payload, hook_url, hook_token)
-                case "jira":
-                    response = forward_to_jira(payload, hook_url, hook_token)
-                case "github":
-                    response = forward_to_github(payload, hook_url, hook_token, assignee=hook_assignee)
-                case "debug":
-                    response = forward_to_debug(payload, hook_url, hook_token)
-                case "generic":
-                    response = forward_to_generic(payload, hook_url, hook_token)
-                case _:
-                    failed_forwards.append(f"Unknown hook type: {hook_type}")
-                    continue
-
-            if response.status_code in [200, 201, 202]:
+        # Each hook type is rendered once, and identical requests are posted once
+        webhooks = [webhook_lookup_map[name] for name in matching_webhooks]
+        for webhook, response in deliver(payload, webhooks, message_templates, indexes=object_indexes):
+            name = webhook.name
+            if response is None:
+                failed_forwards.append(f"Unknown hook type: {webhook.hook_type}")
+                continue
+
+            # Jira answers 204 to a transition
+            if response.status_code in [200, 201, 202, 204]:
                 successful_forwards.append(name)
             else:
                 print(f"Failed to forward to {name}: {response.content}", file=sys.stderr)
@@ -136,13 +188,22 @@ def webhook_routing():
     else:
         return jsonify({"message": "Unauthorized"}), 401
 
-def populate_webhooks(webhooks):
+def populate_webhooks(webhooks, filtering=None):
 
-    # Step 2: Initialize the webhook filter store
-    filter_store = WebhookFilterStore()
+    # Step 2: Initialize the webhook filter store, with optional tuning from the "filtering" config section
+    filtering = filtering or {}
+    unknown_options = sorted(set(filtering) - FILTERING_OPTIONS)
+    if unknown_options:
+        raise ValueError(
+            f"Unknown option(s) in the 'filtering' configuration: {', '.join(unknown_options)}. "
+            f"Allowed options are: {', '.join(sorted(FILTERING_OPTIONS))}",
+        )
+    filter_store = WebhookFilterStore(**filtering)
 
-    # Step 3: Map of webhook names to their (url, token) from environment variables
+    # Step 3: Map of webhook names to their definitions, with the url and token from environment variables
     webhook_lookup_map = {}
+    # One snapshot of the environment instead of a lookup per variable
+    environ = dict(os.environ)
 
     for webhook in webhooks:
         # Extract the webhook name, type, url, and token
@@ -159,8 +220,8 @@ def populate_webhooks(webhooks):
         # secret.  In docker, create env vars
         url_env_var = f"URL_{normalized_name}"
         token_env_var = f"TOKEN_{normalized_name}"
-        url = os.getenv(url_env_var)
-        token = os.getenv(token_env_var)
+        url = environ.get(url_env_var)
+        token = environ.get(token_env_var)
 
         if not url:
             raise ValueError(f"Missing environment variable '{
@@ -169,15 +230,30 @@ def populate_webhooks(webhooks):
 
         # Optional assignee (used by GitHub)
         assignee_env_var = f"ASSIGNEE_{normalized_name}"
-        assignee = os.getenv(assignee_env_var)
+        assignee = environ.get(assignee_env_var)
+
+        # Optional display timezone and date format of the notification timestamp
+        timezone = webhook.get("timezone")
+        if timezone:
+            validate_timezone(timezone)
+
+        channel = webhook.get("channel")
+        if channel and not token:
+            raise ValueError(f"Missing environment variable '{
+            token_env_var
+            }' for webhook '{webhook_name}': posting to a Slack channel requires a bot token")
 
-        # Store the webhook URL, token, hook type, and optional assignee in the lookup map
-        webhook_lookup_map[webhook_name] = {
-            'url': url,
-            'token': token,
-            'hook_type': webhook_type,
-            'assignee': assignee,
-        }
+        # Store the webhook URL, token, hook type, and optional settings in the lookup map
+        webhook_lookup_map[webhook_name] = WebhookDefinition(
+            webhook_name, webhook_type, url, token, assignee,
+            template=webhook.get("template"),
+            timezone=timezone,
+            date_format=webhook.get("date_format"),
+            # Slack webhooks with a channel are posted with the Web API and threaded by root cause
+            channel=channel,
+            # Jira project key, "OPS" or the project of the webhook's template by default
+            project=webhook.get("project"),
+        )
 
         # Extract and add filters for the webhook (if enabled)
         filters = webhook.get("filters", {})
@@ -188,12 +264,83 @@ def populate_webhooks(webhooks):
         filter_store.add_webhook_filters(webhook_name, filter_values, enabled)
     return filter_store, webhook_lookup_map
 
-if __name__ == '__main__':
-    # Step 1: Read the configuration file
+def reload_config():
+    """
+    Re-read the configuration file and replace the webhooks and their filters.
+    The new filter store starts with an empty decision cache, so no routing decision of the old filters is reused.
+    The message templates are compiled again, so edited templates take effect.
+    The objectId indexes are kept unless the state settings change, in which case the changes of the old ones
+    are written before they are dropped.
+    """
+    global filter_store, webhook_lookup_map, message_templates, object_indexes
     config = get_config()
     webhooks = config.get("webhooks", [])
     if not webhooks:
         raise ValueError("No webhooks found in the config.")
-    filter_store, webhook_lookup_map = populate_webhooks(webhooks)
+    new_filter_store, new_webhook_lookup_map = populate_webhooks(
+        webhooks, config.get("filtering"),
+    )
+    templates = MessageTemplates((config.get("templates") or {}).get("directory"))
+    templates.load({webhook.template for webhook in new_webhook_lookup_map.values() if webhook.template})
+    state = config.get("state") or {}
+    indexes = object_indexes
+    directory, size = state.get("directory"), state.get("index_size", OBJECT_INDEX_SIZE)
+    if (directory, size) != (indexes.directory, indexes.size):
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        indexes = ObjectIndexes(directory, size)
+    filter_store, webhook_lookup_map, message_templates = new_filter_store, new_webhook_lookup_map, templates
+    if indexes is not object_indexes:
+        object_indexes.stop()
+    object_indexes = indexes
+
+
+def rebuild_jira_indexes():
+    """
+    Add the open Jira issue of each root cause to the objectId indexes, found by their labels, so a restart
+    without a state directory does not create duplicate issues.
+    """
+    for webhook in webhook_lookup_map.values():
+        if webhook.hook_type != "jira":
+            continue
+        try:
+            count = rebuild_jira_index(webhook.url, webhook.token, webhook.project, object_indexes.get(webhook.name))
+            print(f"Found {count} open Jira issues for webhook {webhook.name}", file=sys.stderr)
+        except Exception as e:
+            print(f"Failed to search the open Jira issues of webhook {webhook.name}: {e}", file=sys.stderr)
+
+
+def warm_github_indexes():
+    """List the open issues of each GitHub repo once, so later notifications only sync the recent changes."""
+    for webhook in webhook_lookup_map.values():
+        if webhook.hook_type != "github":
+            continue
+        try:
+            count = warm_issue_index(webhook.url, webhook.token)
+            print(f"Found {count} open GitHub issues for webhook {webhook.name}", file=sys.stderr)
+        except Exception as e:
+            print(f"Failed to list the open GitHub issues of webhook {webhook.name}: {e}", file=sys.stderr)
+
+
+def handle_reload_signal(signum, frame):
+    # A broken configuration keeps the previous one running
+    try:
+        reload_config()
+        print("Configuration reloaded", file=sys.stderr)
+    except Exception as e:
+        print(f"Failed to reload configuration: {e}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    # Step 1: Read the configuration file
+    reload_config()
+    rebuild_jira_indexes()
+    warm_github_indexes()
+    # Poll the asynchronous Opsgenie requests in the background
+    opsgenie_requests.start()
+    # Reload the configuration on SIGHUP
+    signal.signal(signal.SIGHUP, handle_reload_signal)
+    # Exit on SIGTERM through sys.exit, so the changed objectId indexes are written at exit
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     # Start the application
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000)
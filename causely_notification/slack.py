@@ -17,270 +17,100 @@
 from __future__ import annotations
 
 import json
-import sys
 
 import requests
 
-from .date import parse_iso_date
 from .utils import check_problem_detected
-
-
-def create_slack_description_block(payload):
-    summary = payload.get("description", {}).get("summary", None)
-    if summary is None:
-        return None
-
-    b = {
-        "type": "section",
-        "block_id": "block1",
-        "text": {
-            "type": "mrkdwn",
-            "text": f"*Summary:*\n{summary}",
-        },
-    }
-    return b
-
-
-def create_slack_remediation_option_block(payload):
-    ro = payload.get("description", {}).get("remediationOptions", [])
-    if len(ro) == 0:
-        return None
-
-    b = {
-        "type": "section",
-        "block_id": "block2",
-        "text": {
-            "type": "mrkdwn",
-            "text": f"*Remediation: {ro[0].get('title')}*\n{ro[0].get('description')}",
-        },
-    }
-
-    link = payload.get("link", None)
-    if len(ro) > 1 and link is not None:
-        b["accessory"] = {
-            "type": "button",
-            "text": {
-                "type": "plain_text",
-                "text": "View More",
-                "emoji": True,
-            },
-            "value": "click_me_123",
-            "url": link,
-            "action_id": "button-action",
-        }
-
-    return b
-
-
-def create_slack_slo_blocks(payload):
-    slos = payload.get("slos", [])
-    if not slos:
-        return None
-
-    # We'll return multiple blocks: a header and a section for each SLO
-    blocks = []
-
-    # Add a header for impacted SLOs
-    blocks.append({
-        "type": "header",
-        "text": {
-            "type": "plain_text",
-            "text": "Impacted SLOs",
-        },
-    })
-
-    # Add each SLO as a section block
-    for slo in slos:
-        slo_entity = slo.get("slo_entity", {})
-        slo_name = slo_entity.get("name", "Unknown SLO")
-        slo_link = slo_entity.get("link")
-        slo_status = slo.get("status", "UNKNOWN")
-
-        related_entity = slo.get("related_entity", {})
-        related_entity_name = related_entity.get("name", "Unknown Service")
-        related_entity_link = related_entity.get("link")
-        related_entity_text = f"<{related_entity_link}|{
-            related_entity_name
-        }>" if related_entity_link else related_entity_name
-
-        # Icons for status with tooltip text (hover over icon)
-        status_icons = {
-            "AT_RISK": {"icon": ":warning:", "tooltip": "At Risk"},
-            "HEALTHY": {"icon": ":white_check_mark:", "tooltip": "Healthy"},
-            "VIOLATED": {"icon": ":x:", "tooltip": "Violated"},
-            "NORMAL": {"icon": ":grey_question:", "tooltip": "Normal"},
-            "UNKNOWN": {"icon": ":grey_question:", "tooltip": "Unknown"},
-        }
-        status_data = status_icons.get(
-            slo_status, {"icon": ":grey_question:", "tooltip": slo_status},
-        )
-
-        # Construct the SLO text visually appealing with impacted service
-        slo_text_lines = []
-        icon_with_status = f"{status_data['icon']} *<{slo_link}|{slo_name}>* ({status_data['tooltip']})" if slo_link else f"{
-            status_data['icon']
-        } *{slo_name}* ({status_data['tooltip']})"
-        slo_text_lines.append(icon_with_status)
-        slo_text_lines.append(f"\t- *Impacted Service:* {related_entity_text}")
-
-        blocks.append({
-            "type": "section",
-            "text": {
-                "type": "mrkdwn",
-                "text": "\n".join(slo_text_lines),
-            },
-        })
-
-    return blocks
-
-
-def create_slack_values_block(payload):
-    entity = payload.get("entity", {})
-    entity_name = entity.get("name", "Unknown Entity")
-    entity_link = entity.get("link")
-    entity_text = f"<{entity_link}|{
-        entity_name
-    }>" if entity_link else entity_name
-
-    return {
-        "type": "section",
-        "text": {
-            "type": "mrkdwn",
-            "text": (
-                f"*Severity:* {payload.get('severity')}\n"
-                f"*Affected Entity:* {entity_text}\n"
-                f"*Identified At:* {parse_iso_date(payload.get('timestamp'))}"
-            ),
-        },
-    }
-
-
-def create_slack_detected_payload(payload):
-    blocks = [
-        {
-            "type": "section",
-            "text": {
-                "type": "mrkdwn",
-                "text": f":exclamation: *Root Cause Identified: {payload.get('name')}*",
-            },
-        },
-        {"type": "divider"},
-        create_slack_values_block(payload),
-        {"type": "divider"},
-    ]
-
-    desc_block = create_slack_description_block(payload)
-    if desc_block is not None:
-        blocks.append(desc_block)
-        blocks.append({
-            "type": "divider",
-        })
-
-    rem_block = create_slack_remediation_option_block(payload)
-    if rem_block is not None:
-        blocks.append(rem_block)
-        blocks.append({
-            "type": "divider",
-        })
-
-    # Add SLO blocks if they exist
-    slo_blocks = create_slack_slo_blocks(payload)
-    if slo_blocks is not None:
-        blocks.extend(slo_blocks)
-        blocks.append({"type": "divider"})
-
-    buttons = []
-
-    link = payload.get("link", None)
-    if link is not None:
-        buttons.append({
-            "type": "button",
-            "text": {
-                    "type": "plain_text",
-                    "text": "View Root Cause",
-                    "emoji": True,
-            },
-            "value": "click_me_123",
-            "url": link,
-            "action_id": "button-action",
-        })
-
-    if buttons:
-        blocks.append({
-            "type": "actions",
-            "elements": buttons,
-        })
-
-    return blocks
-
-
-def create_slack_cleared_payload(payload):
-    blocks = [
-        {
-            "type": "section",
-            "text": {
-                "type": "mrkdwn",
-                "text": f":white_check_mark: *Root Cause Cleared: {payload.get('name')}*",
-            },
-        },
-        {"type": "divider"},
-        create_slack_values_block(payload),
-        {"type": "divider"},
-    ]
-
-    desc_block = create_slack_description_block(payload)
-    if desc_block is not None:
-        blocks.append(desc_block)
-        blocks.append({
-            "type": "divider",
-        })
-
-    buttons = []
-
-    link = payload.get("link", None)
-    if link is not None:
-        buttons.append({
-            "type": "button",
-            "text": {
-                    "type": "plain_text",
-                    "text": "View Root Cause",
-                    "emoji": True,
-            },
-            "value": "click_me_123",
-            "url": link,
-            "action_id": "button-action",
-        })
-
-        blocks.append({
-            "type": "actions",
-            "elements": buttons,
-        })
-
-    return blocks
-
-
-def forward_to_slack(payload, slack_webhook_url, slack_webhook_token):
-    # Prettify the payload and send it to Slack
-    print(payload, file=sys.stderr)
-    print(payload.get("type"), file=sys.stderr)
-
-    if check_problem_detected(payload):
-        slack_data = {
-            "username": "Causely",
-            "icon_emoji": ":causely:",
-            "blocks": create_slack_detected_payload(payload),
-        }
-    else:
-        slack_data = {
-            "username": "Causely",
-            "icon_emoji": ":causely:",
-            "blocks": create_slack_cleared_payload(payload),
-        }
-
-    print(json.dumps(slack_data), file=sys.stderr)
-
+from .utils import make_error_response
+
+# Slack rejects messages with more than 50 blocks. A detected message has up to 12 blocks besides the SLO
+# sections, including the summary of the SLOs left out.
+MAX_BLOCKS = 50
+MAX_SLOS = MAX_BLOCKS - 12
+
+SLACK_API_TIMEOUT = 30
+# Errors of chat.update and chat.postMessage when the parent message of a thread was deleted
+PARENT_GONE_ERRORS = {"message_not_found", "thread_not_found", "cant_update_message"}
+
+# Icons for SLO status with tooltip text (hover over icon)
+SLO_STATUS_ICONS = {
+    "AT_RISK": {"icon": ":warning:", "tooltip": "At Risk"},
+    "HEALTHY": {"icon": ":white_check_mark:", "tooltip": "Healthy"},
+    "VIOLATED": {"icon": ":x:", "tooltip": "Violated"},
+    "NORMAL": {"icon": ":grey_question:", "tooltip": "Normal"},
+    "UNKNOWN": {"icon": ":grey_question:", "tooltip": "Unknown"},
+}
+
+
+def create_slack_fallback_text(payload):
+    """Return the plain text Slack shows in the notifications of a message."""
+    title = "Root Cause Identified" if check_problem_detected(payload) else "Root Cause Cleared"
+    entity_name = (payload.get("entity") or {}).get("name", "Unknown Entity")
+    return f"{title}: {payload.get('name')} on {entity_name}"
+
+
+def slack_api_call(api_url, token, method, message):
+    """
+    Call a Slack Web API method with a JSON message.
+    Slack reports errors with "ok": false in a 200 response, these are returned as a synthetic error response.
+
+    Returns:
+        tuple: The response and the decoded result, empty if the call failed.
+    """
     headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {slack_webhook_token}',
+        'Content-Type': 'application/json; charset=utf-8',
+        'Authorization': f'Bearer {token}',
     }
-    return requests.post(slack_webhook_url, json=slack_data, headers=headers)
+    try:
+        response = requests.post(
+            f"{api_url.rstrip('/')}/{method}", data=json.dumps(message).encode('utf-8'), headers=headers,
+            timeout=SLACK_API_TIMEOUT,
+        )
+        result = response.json()
+    except requests.exceptions.RequestException as e:
+        return make_error_response(500, f"Slack {method} failed: {e}"), {}
+    except ValueError:
+        return make_error_response(500, f"Slack {method} returned {response.status_code}: {response.text}"), {}
+    if not result.get("ok"):
+        return make_error_response(500, f"Slack {method} failed: {result.get('error')}"), result
+    return response, result
+
+
+def forward_to_slack_thread(payload, message, api_url, token, channel, index):
+    """
+    Post a message with the Slack Web API, threaded by root cause.
+    The first notification of a root cause posts a parent message, and its ts is stored in the index under the
+    objectId. Updates edit the parent message, later detections and clears reply in its thread. A root cause
+    without a parent message, because it was evicted from the index or deleted in Slack, gets a new one.
+
+    Args:
+        payload (dict): The notification payload.
+        message (dict): The Slack message rendered from templates/slack.json.j2.
+        api_url (str): The Slack Web API base URL, https://slack.com/api.
+        token (str): The bot token, with the chat:write scope.
+        channel (str): The ID of the channel to post to.
+        index (ObjectIndex): The ts of the parent message of each root cause.
+
+    Returns:
+        requests.Response: The response of the last call, a synthetic error response if it failed.
+    """
+    object_id = payload.get("objectId")
+    message = {**message, "channel": channel, "text": create_slack_fallback_text(payload)}
+    ts = index.get(object_id) if object_id else None
+    if ts is not None:
+        if payload.get("type") == "ProblemUpdated":
+            # chat.update does not take the username and icon of the message
+            update = {key: value for key, value in message.items() if key not in ("username", "icon_emoji")}
+            response, result = slack_api_call(api_url, token, "chat.update", {**update, "ts": ts})
+        else:
+            # A detection after a clear is also shown in the channel
+            reply = {**message, "thread_ts": ts, "reply_broadcast": check_problem_detected(payload)}
+            response, result = slack_api_call(api_url, token, "chat.postMessage", reply)
+        if result.get("error") not in PARENT_GONE_ERRORS:
+            return response
+        index.remove(object_id)
+
+    response, result = slack_api_call(api_url, token, "chat.postMessage", message)
+    if object_id and result.get("ok"):
+        index.put(object_id, result["ts"])
+    return response
@@ -0,0 +1,150 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This script defines the ordinal comparison operators (gte, lte, gt, lt).
+Values are ranked by a configurable ordering: severity names by their position in the severity order, numbers and
+numeric strings by their value. The thresholds of all webhooks on a field are kept in sorted lists, so the thresholds
+a payload value satisfies are found with one bisect per operator and shared by every webhook.
+"""
+from __future__ import annotations
+
+import bisect
+
+COMPARISON_OPERATORS = ['gte', 'lte', 'gt', 'lt']
+
+# Severities from lowest to highest, compared case-insensitively
+DEFAULT_SEVERITY_ORDER = ['Info', 'Low', 'Medium', 'High', 'Critical']
+
+
+class Ordering:
+    """Ranks field values so they can be compared: severity names by position, numbers by value."""
+
+    def __init__(self, severity_order=None):
+        self.severity_order = list(severity_order or DEFAULT_SEVERITY_ORDER)
+        self.ranks = {
+            name.lower(): rank for rank, name in enumerate(self.severity_order)
+        }
+
+    def rank(self, value):
+        """Return the rank of a value, or None if it cannot be ordered."""
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            return value
+        if isinstance(value, str):
+            rank = self.ranks.get(value.lower())
+            if rank is not None:
+                return rank
+            try:
+                return float(value)
+            except ValueError:
+                return None
+        return None
+
+    def threshold_rank(self, operator, threshold):
+        """Return the rank of a filter threshold, raising if it cannot be ordered."""
+        rank = self.rank(threshold)
+        if rank is None:
+            raise ValueError(
+                f"Operator '{operator}' requires a number or one of the severities {
+                    self.severity_order
+                }, but got {threshold!r}",
+            )
+        return rank
+
+
+DEFAULT_ORDERING = Ordering()
+
+
+def compare(operator, rank, threshold_rank):
+    """Compare two ranks with a comparison operator."""
+    if operator == 'gte':
+        return rank >= threshold_rank
+    if operator == 'gt':
+        return rank > threshold_rank
+    if operator == 'lte':
+        return rank <= threshold_rank
+    return rank < threshold_rank
+
+
+class FieldThresholds:
+    """
+    Sorted thresholds of the comparison filters on one field, across all webhooks.
+    satisfied returns the (operator, threshold rank) pairs a value satisfies, keeping the result for the last
+    value so that all webhooks checking the same payload value share the bisects.
+    """
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+        self.thresholds = {operator: [] for operator in COMPARISON_OPERATORS}
+        self._last = (None, frozenset())
+
+    def add(self, operator, threshold):
+        """Register a threshold and return its rank."""
+        rank = self.ordering.threshold_rank(operator, threshold)
+        thresholds = self.thresholds[operator]
+        i = bisect.bisect_left(thresholds, rank)
+        if i == len(thresholds) or thresholds[i] != rank:
+            thresholds.insert(i, rank)
+        self._last = (None, frozenset())
+        return rank
+
+    def satisfied(self, value):
+        last_value, last_satisfied = self._last
+        if last_value is not None and type(last_value) is type(value) and last_value == value:
+            return last_satisfied
+
+        rank = self.ordering.rank(value)
+        if rank is None:
+            result = frozenset()
+        else:
+            pairs = []
+            # gte: thresholds <= rank, gt: thresholds < rank
+            gte = self.thresholds['gte']
+            pairs.extend(('gte', t) for t in gte[:bisect.bisect_right(gte, rank)])
+            gt = self.thresholds['gt']
+            pairs.extend(('gt', t) for t in gt[:bisect.bisect_left(gt, rank)])
+            # lte: thresholds >= rank, lt: thresholds > rank
+            lte = self.thresholds['lte']
+            pairs.extend(('lte', t) for t in lte[bisect.bisect_left(lte, rank):])
+            lt = self.thresholds['lt']
+            pairs.extend(('lt', t) for t in lt[bisect.bisect_right(lt, rank):])
+            result = frozenset(pairs)
+        if value is not None:
+            # A single tuple assignment, so concurrent readers never see a mismatched pair
+            self._last = (value, result)
+        return result
+
+    def compile_test(self, operator, threshold):
+        """Register a threshold and return a predicate on a field value using the shared sorted thresholds."""
+        key = (operator, self.add(operator, threshold))
+        satisfied = self.satisfied
+        return lambda value: key in satisfied(value)
+
+
+class ThresholdIndex:
+    """The sorted thresholds of all comparison filters, one FieldThresholds per field, shared by all webhooks."""
+
+    def __init__(self, ordering=None):
+        self.ordering = ordering if ordering is not None else DEFAULT_ORDERING
+        self.fields = {}
+
+    def for_field(self, field):
+        thresholds = self.fields.get(field)
+        if thresholds is None:
+            thresholds = self.fields[field] = FieldThresholds(self.ordering)
+        return thresholds
@@ -15,7 +15,38 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import requests
+
+
 def check_problem_detected(payload):
     if payload.get("type") == "ProblemDetected" or payload.get("type") == "ProblemUpdated":
         return True
     return False
+
+
+def truncate_text(text, max_length):
+    """Return a text cut to max_length characters, ending with an ellipsis when it was cut."""
+    if max_length is None or not isinstance(text, str) or len(text) <= max_length:
+        return text
+    return text[:max_length - 1] + "…"
+
+
+def make_response(status_code: int, message: str) -> requests.Response:
+    """
+    Create a synthetic requests.Response object with a given status code and message.
+    Useful for reporting the outcome of a delivery that did not send a request.
+    """
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp._content = message.encode("utf-8")
+    resp.reason = message  # optional, sets a short description
+    resp.url = ""  # optional: can set to the original request URL
+    return resp
+
+
+def make_error_response(status_code: int, message: str) -> requests.Response:
+    """
+    Create a synthetic requests.Response object with a given status code and message.
+    Useful for returning a consistent error response when HTTP calls fail.
+    """
+    return make_response(status_code, message)
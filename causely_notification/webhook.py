@@ -0,0 +1,59 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""
+This script defines the compact definition of a configured webhook, as looked up when a notification is delivered.
+"""
+from __future__ import annotations
+
+import sys
+
+
+class WebhookDefinition:
+    """
+    A configured webhook: its name, hook type, url, token, optional assignee, optional message template and
+    display timezone and date format, the optional Slack channel of threaded messages, and the optional Jira
+    project key.
+    Slotted, with interned strings, so configurations with thousands of webhooks stay small.
+    """
+
+    __slots__ = ('name', 'hook_type', 'url', 'token', 'assignee', 'template', 'timezone', 'date_format', 'channel',
+                 'project')
+
+    def __init__(
+        self, name, hook_type, url, token=None, assignee=None, template=None, timezone=None, date_format=None,
+        channel=None, project=None,
+    ):
+        self.name = name
+        # Hook types are matched case-insensitively
+        self.hook_type = sys.intern(hook_type.lower())
+        self.url = _intern(url)
+        self.token = _intern(token)
+        self.assignee = _intern(assignee)
+        self.template = _intern(template)
+        self.timezone = _intern(timezone)
+        self.date_format = _intern(date_format)
+        self.channel = _intern(channel)
+        self.project = _intern(project)
+
+    def __repr__(self):
+        return f"WebhookDefinition(name={self.name!r}, hook_type={self.hook_type!r})"
+
+
+def _intern(value):
+    # Webhooks of the same backend usually share their url and token
+    return sys.intern(value) if isinstance(value, str) else value
@@ -0,0 +1,20 @@
+# Environment shared by the tests, set before any test module imports the server
+from __future__ import annotations
+
+import os
+
+# The server reads AUTH_TOKEN when it is imported, and the webhook URLs when webhooks are loaded
+os.environ["AUTH_TOKEN"] = "test-token"
+
+# Single-webhook-per-backend for parameterized tests (name "slack-test" -> URL_SLACK-TEST)
+os.environ["URL_SLACK-TEST"] = "http://test_slack"
+os.environ["URL_TEAMS-TEST"] = "http://test_teams"
+os.environ["URL_JIRA-TEST"] = "http://test_jira"
+os.environ["URL_OPSGENIE-TEST"] = "http://test_opsgenie"
+os.environ["URL_GENERIC-TEST"] = "http://test_generic"
+os.environ["URL_GITHUB-TEST"] = "test_owner/test_repo"
+
+# Multi-webhook config (existing slack-only) for filter/scenario tests
+os.environ["URL_SLACK-SEVERITY"] = "http://test_slack"
+os.environ["URL_SLACK-MALFUNCTION-SLO"] = "http://test_slack"
+os.environ["URL_SLACK-ALL-ALERTS"] = "http://test_slack"
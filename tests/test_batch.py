@@ -0,0 +1,93 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This class is used to test batch filtering in batch.py.
+"""
+from __future__ import annotations
+
+import itertools
+import unittest
+
+from causely_notification import batch
+from causely_notification.batch import EncodedColumn
+from causely_notification.filter import WebhookFilterStore
+
+
+def _payloads():
+    payloads = []
+    for severity, namespace, slos, name in itertools.product(
+        ["Low", "High", "Critical", None],
+        ["default", "kube-system", None],
+        [True, False],
+        ["Malfunction", "CPUCongested"],
+    ):
+        payload = {"name": name}
+        if severity is not None:
+            payload["severity"] = severity
+        if namespace is not None:
+            payload["labels"] = {"causely.ai/namespace": namespace}
+        if slos:
+            payload["slos"] = [{}]
+        payloads.append(payload)
+    return payloads
+
+
+class TestEncodedColumn(unittest.TestCase):
+    def test_dictionary_encoding(self):
+        column = EncodedColumn(["High", "Low", "High", None, True, 1, {"a": 1}])
+        self.assertEqual(column.codes, [0, 1, 0, 2, 3, 4, 5])
+        self.assertEqual(column.values[:5], ["High", "Low", None, True, 1])
+        self.assertEqual(column.matching_codes(lambda value: value == "High"), [0])
+
+
+class TestFilterMany(unittest.TestCase):
+    def setUp(self):
+        self.store = WebhookFilterStore()
+        self.store.add_webhook_filters("severity", [
+            {"field": "severity", "operator": "in", "value": ["High", "Critical"]},
+        ], enabled=True)
+        self.store.add_webhook_filters("slo-not-system", [
+            {"field": "impactsSLO", "operator": "equals", "value": True},
+            {"field": "labels.k8s.namespace.name", "operator": "not_in", "value": ["kube-system"]},
+        ], enabled=True)
+        self.store.add_webhook_filters("malfunction-not-critical", [
+            {"field": "name", "operator": "equals", "value": "Malfunction"},
+            {"field": "severity", "operator": "not_equals", "value": "Critical"},
+        ], enabled=True)
+        self.store.add_webhook_filters("all", [], enabled=False)
+        self.payloads = _payloads()
+
+    def _expected(self):
+        return [self.store.filter_payload(payload) for payload in self.payloads]
+
+    @unittest.skipIf(batch.np is None, "NumPy is not installed")
+    def test_filter_many_numpy_matches_filter_payload(self):
+        self.assertEqual(self.store.filter_many(self.payloads), self._expected())
+
+        names, matrix = self.store.match_matrix(self.payloads)
+        self.assertEqual(names, ["severity", "slo-not-system", "malfunction-not-critical", "all"])
+        self.assertEqual(matrix.shape, (len(self.payloads), 4))
+        self.assertTrue(matrix[:, 3].all())
+
+    def test_filter_many_python_matches_filter_payload(self):
+        self.assertEqual(
+            batch.filter_many(self.store, self.payloads, use_numpy=False),
+            self._expected(),
+        )
+
+    def test_filter_many_empty_batch(self):
+        self.assertEqual(self.store.filter_many([]), [])
@@ -0,0 +1,95 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This class is used to test the filter compiler in compiler.py.
+"""
+from __future__ import annotations
+
+import unittest
+
+from causely_notification.compiler import compile_filters
+from causely_notification.field_registry import FIELD_DEFINITIONS
+from causely_notification.field_registry import FieldRegistry
+from causely_notification.filter import FilterIndex
+
+
+class TestCompileFilters(unittest.TestCase):
+    def setUp(self):
+        self.field_registry = FieldRegistry(FIELD_DEFINITIONS)
+        self.index = FilterIndex(
+            field_registry=self.field_registry, enabled=True,
+        )
+
+    def test_empty_filters_match_everything(self):
+        predicate = compile_filters({}, self.field_registry)
+        self.assertTrue(predicate(self.field_registry.view({})))
+        self.assertTrue(predicate(self.field_registry.view({"severity": "Low"})))
+
+    def test_compiled_matches_interpreted(self):
+        self.index.add_filter("severity", "in", ["High", "Critical"])
+        self.index.add_filter("severity", "not_equals", "Critical")
+        self.index.add_filter("impactsSLO", "equals", True)
+        self.index.add_filter(
+            "labels.k8s.namespace.name", "not_in", ["kube-system"],
+        )
+
+        payloads = [
+            {},
+            {"severity": "High"},
+            {"severity": "High", "slos": [], "labels": {"causely.ai/namespace": "default"}},
+            {"severity": "Critical", "slos": [], "labels": {"causely.ai/namespace": "default"}},
+            {"severity": "High", "slos": [], "labels": {"causely.ai/namespace": "kube-system"}},
+            {"severity": "Low", "slos": [], "labels": {"causely.ai/namespace": "default"}},
+        ]
+        for payload in payloads:
+            self.assertEqual(
+                self.index.check_payload(payload),
+                self.index.check_payload_interpreted(payload),
+                payload,
+            )
+        self.assertTrue(self.index.check_payload(payloads[2]))
+
+    def test_checks_are_ordered_cheapest_first(self):
+        calls = []
+
+        def computed(payload):
+            calls.append("computed")
+            return True
+
+        def direct(payload):
+            calls.append("direct")
+            return payload.get("severity")
+
+        field_registry = FieldRegistry({
+            "severity": {"type": "direct", "path": "severity"},
+        })
+        field_registry.register_field("custom", computed)
+        field_registry.register_field("severity", direct)
+
+        field_filters = {
+            "custom": {"members": None, "operator": [{"operator": "equals", "value": True}]},
+            "severity": {"members": None, "operator": [{"operator": "equals", "value": "High"}]},
+        }
+        predicate = compile_filters(field_filters, field_registry)
+
+        # The direct field is checked first and rejects the payload before the computed field runs
+        self.assertFalse(predicate(field_registry.view({"severity": "Low"})))
+        self.assertEqual(calls, ["direct"])
+
+    def test_invalid_operator_value_fails_when_added(self):
+        with self.assertRaises(ValueError):
+            self.index.add_filter("severity", "not_in", "High")
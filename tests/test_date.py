@@ -1,7 +1,9 @@
 # Tests for causely_notification.date
 import unittest
 
+from causely_notification.date import _format_iso_date
 from causely_notification.date import parse_iso_date
+from causely_notification.date import validate_timezone
 
 
 class TestParseIsoDate(unittest.TestCase):
@@ -15,3 +17,25 @@ class TestParseIsoDate(unittest.TestCase):
         invalid = "not-a-date"
         self.assertEqual(parse_iso_date(invalid), invalid)
         self.assertEqual(parse_iso_date(""), "")
+
+    def test_parse_keeps_the_given_time_by_default(self):
+        self.assertEqual(parse_iso_date("2025-08-07T18:51:54.164185287Z"), "August 07, 2025 at 06:51:54 PM")
+        self.assertEqual(parse_iso_date("2025-08-07T18:51:54+02:00"), "August 07, 2025 at 06:51:54 PM")
+        self.assertEqual(parse_iso_date(None), "Unknown")
+
+    def test_parse_with_timezone_and_format(self):
+        result = parse_iso_date("2025-08-07T18:51:54.164185287Z", "America/New_York", "%Y-%m-%d %H:%M %Z")
+        self.assertEqual(result, "2025-08-07 14:51 EDT")
+        # Timestamps without an offset are in UTC
+        self.assertEqual(parse_iso_date("2025-08-07T18:51:54", "Europe/Berlin", "%H:%M"), "20:51")
+
+    def test_parse_is_cached(self):
+        _format_iso_date.cache_clear()
+        parse_iso_date("2025-08-07T18:51:54Z")
+        parse_iso_date("2025-08-07T18:51:54Z")
+        self.assertEqual(_format_iso_date.cache_info().hits, 1)
+
+    def test_validate_timezone(self):
+        validate_timezone("Europe/Berlin")
+        with self.assertRaises(ValueError):
+            validate_timezone("Mars/Olympus_Mons")
@@ -0,0 +1,87 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""
+This class is used to test the routing decision cache in decision_cache.py.
+"""
+from __future__ import annotations
+
+import unittest
+
+from causely_notification.filter import WebhookFilterStore
+
+
+class TestDecisionCache(unittest.TestCase):
+    def setUp(self):
+        self.store = WebhookFilterStore()
+        self.store.add_webhook_filters("high", [
+            {"field": "severity", "operator": "in", "value": ["High", "Critical"]},
+        ], enabled=True)
+        self.store.add_webhook_filters("slo", [
+            {"field": "impactsSLO", "operator": "equals", "value": True},
+        ], enabled=True)
+        self.store.add_webhook_filters("all", [], enabled=False)
+        self.cache = self.store.decision_cache
+
+    def test_projects_onto_filtered_fields(self):
+        self.assertEqual(self.store.decision_cache_stats()["projected_fields"], ["severity", "impactsSLO"])
+
+    def test_repeated_projections_hit(self):
+        self.assertEqual(self.store.filter_payload({"severity": "High", "name": "a"}), ["high", "all"])
+        # Fields no filter reads are not part of the key
+        self.assertEqual(self.store.filter_payload({"severity": "High", "name": "b"}), ["high", "all"])
+        self.assertEqual(self.store.filter_payload({"severity": "Low", "slos": []}), ["slo", "all"])
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (1, 2, 2))
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 3)
+
+    def test_values_of_different_types_are_cached_separately(self):
+        store = WebhookFilterStore()
+        store.add_webhook_filters("true", [
+            {"field": "severity", "operator": "equals", "value": True},
+        ], enabled=True)
+        # 1 == True, but membership compares the string forms
+        self.assertEqual(store.filter_payload({"severity": True}), ["true"])
+        self.assertEqual(store.filter_payload({"severity": 1}), [])
+
+    def test_cached_result_is_a_copy(self):
+        self.store.filter_payload({"severity": "High"}).append("mutated")
+        self.assertEqual(self.store.filter_payload({"severity": "High"}), ["high", "all"])
+
+    def test_changing_filters_invalidates(self):
+        self.assertEqual(self.store.filter_payload({"severity": "Medium"}), ["all"])
+        self.store.add_webhook_filters("medium", [
+            {"field": "severity", "operator": "equals", "value": "Medium"},
+        ], enabled=True)
+        self.assertEqual(self.store.filter_payload({"severity": "Medium"}), ["all", "medium"])
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_high_cardinality_field_bypasses_cache(self):
+        store = WebhookFilterStore(high_cardinality_threshold=10)
+        store.add_webhook_filters("prod", [
+            {"field": "entity.name", "operator": "starts_with", "value": "prod-"},
+        ], enabled=True)
+        for i in range(20):
+            self.assertEqual(store.filter_payload({"entity": {"name": f"prod-{i}"}}), ["prod"])
+        stats = store.decision_cache.stats()
+        self.assertEqual(stats["high_cardinality_fields"], ["entity.name"])
+        self.assertEqual(stats["size"], 0)
+        self.assertEqual(stats["bypassed"], 9)
+
+    def test_unhashable_values_bypass_cache(self):
+        self.assertEqual(self.store.filter_payload({"severity": ["High"], "slos": []}), ["slo", "all"])
+        self.assertEqual(self.cache.stats()["bypassed"], 1)
@@ -0,0 +1,194 @@
+# Tests for causely_notification.delivery (render once per hook type, collapse identical requests)
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import requests
+
+from causely_notification.delivery import deliver
+from causely_notification.delivery import DeliveryStats
+from causely_notification.message_templates import MESSAGE_BUDGETS
+from causely_notification.message_templates import MessageTemplates
+from causely_notification.message_templates import template_context
+from causely_notification.object_index import ObjectIndexes
+from causely_notification.webhook import WebhookDefinition
+
+PAYLOAD = {
+    "name": "Malfunction",
+    "type": "ProblemDetected",
+    "entity": {"id": "1", "name": "checkout", "type": "Service"},
+    "labels": {"k8s.cluster.name": "prod"},
+    "severity": "High",
+    "timestamp": "2025-08-07T18:51:54.164185287Z",
+    "description": {"summary": "High error rate"},
+}
+
+
+class TestDeliver(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = DeliveryStats()
+
+    @patch("causely_notification.delivery.requests.post")
+    def test_renders_once_per_template(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=200)
+        webhooks = [
+            WebhookDefinition("slack-a", "slack", "http://slack/a", "token-a"),
+            WebhookDefinition("slack-b", "Slack", "http://slack/b", "token-b"),
+            WebhookDefinition("teams", "teams", "http://teams"),
+        ]
+        templates = MessageTemplates()
+        with patch.object(templates, "render", wraps=templates.render) as render:
+            results = deliver(PAYLOAD, webhooks, templates, self.stats)
+        self.assertEqual(render.call_count, 2)
+
+        self.assertEqual([webhook.name for webhook, _ in results], ["slack-a", "slack-b", "teams"])
+        self.assertEqual(mock_post.call_count, 3)
+        # The serialized body is shared by the webhooks of a template
+        self.assertIs(mock_post.call_args_list[0].kwargs["data"], mock_post.call_args_list[1].kwargs["data"])
+        self.assertEqual(self.stats.stats(), {"rendered": 2, "posted": 3, "collapsed": 0, "reduced": 0})
+
+    @patch("causely_notification.delivery.requests.post")
+    def test_webhook_template(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=200)
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "short.json.j2"), "w") as f:
+                f.write('{"text": {{ payload.get("name")|json }} }')
+            templates = MessageTemplates(directory)
+            templates.load(["short.json.j2"])
+        webhooks = [
+            WebhookDefinition("short", "generic", "http://generic/short", template="short.json.j2"),
+            WebhookDefinition("raw", "generic", "http://generic/raw"),
+        ]
+        deliver(PAYLOAD, webhooks, templates, self.stats)
+
+        self.assertEqual(json.loads(mock_post.call_args_list[0].kwargs["data"]), {"text": "Malfunction"})
+        self.assertEqual(json.loads(mock_post.call_args_list[1].kwargs["data"]), PAYLOAD)
+
+    @patch("causely_notification.delivery.requests.post")
+    def test_renders_once_per_timestamp_display(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=202)
+        webhooks = [
+            WebhookDefinition("utc", "opsgenie", "http://opsgenie/utc", "key"),
+            WebhookDefinition("berlin-a", "opsgenie", "http://opsgenie/a", "key", timezone="Europe/Berlin",
+                              date_format="%H:%M %Z"),
+            WebhookDefinition("berlin-b", "opsgenie", "http://opsgenie/b", "key", timezone="Europe/Berlin",
+                              date_format="%H:%M %Z"),
+        ]
+        deliver(PAYLOAD, webhooks, stats=self.stats)
+
+        timestamps = [json.loads(call.kwargs["data"])["details"]["timestamp"] for call in mock_post.call_args_list]
+        self.assertEqual(timestamps, ["August 07, 2025 at 06:51:54 PM", "20:51 CEST", "20:51 CEST"])
+        self.assertEqual(self.stats.stats()["rendered"], 2)
+
+    @patch("causely_notification.delivery.requests.post")
+    def test_collapses_identical_requests(self, mock_post):
+        response = MagicMock(status_code=200)
+        mock_post.return_value = response
+        webhooks = [
+            WebhookDefinition("slack-a", "slack", "http://slack", "token"),
+            WebhookDefinition("slack-b", "slack", "http://slack", "token"),
+            WebhookDefinition("slack-c", "slack", "http://slack", "other-token"),
+        ]
+        results = deliver(PAYLOAD, webhooks, stats=self.stats)
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertIs(results[0][1], response)
+        self.assertIs(results[1][1], response)
+        self.assertEqual(self.stats.stats(), {"rendered": 1, "posted": 2, "collapsed": 1, "reduced": 0})
+
+    @patch("causely_notification.delivery.requests.post")
+    def test_posts_the_rendered_body(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=201)
+        webhooks = [WebhookDefinition("jira", "jira", "http://jira", "token")]
+        deliver(PAYLOAD, webhooks, stats=self.stats)
+
+        args, kwargs = mock_post.call_args
+        self.assertEqual(args[0], "http://jira/rest/api/2/issue")
+        self.assertEqual(kwargs["headers"]["Authorization"], "Bearer token")
+        self.assertEqual(json.loads(kwargs["data"])["fields"]["summary"], "Root Cause Identified: Malfunction")
+
+    @patch("causely_notification.delivery.requests.post")
+    def test_jira_webhooks_keep_their_own_issues(self, mock_post):
+        response = MagicMock(status_code=201)
+        response.json.return_value = {"id": "10000", "key": "X-1"}
+        mock_post.return_value = response
+        indexes = ObjectIndexes()
+        webhooks = [
+            WebhookDefinition("jira-sre", "jira", "http://jira", "token", project="SRE"),
+            WebhookDefinition("jira-ops", "jira", "http://jira", "token"),
+        ]
+        deliver({**PAYLOAD, "objectId": "rc-1"}, webhooks, stats=self.stats, indexes=indexes)
+
+        projects = [json.loads(call.kwargs["data"])["fields"]["project"] for call in mock_post.call_args_list]
+        self.assertEqual(projects, [{"key": "SRE"}, {"key": "OPS"}])
+        self.assertEqual(indexes.get("jira-sre").get("rc-1"), "X-1")
+        self.assertEqual(indexes.get("jira-ops").get("rc-1"), "X-1")
+        self.assertEqual(self.stats.stats()["rendered"], 1)
+
+    @patch("causely_notification.delivery.requests.post")
+    def test_slack_body_matches_render(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=200)
+        deliver(PAYLOAD, [WebhookDefinition("slack", "slack", "http://slack", "token")], stats=self.stats)
+        context = template_context(PAYLOAD, MESSAGE_BUDGETS["slack"])
+        self.assertEqual(
+            json.loads(mock_post.call_args.kwargs["data"]),
+            json.loads(MessageTemplates().render("slack.json.j2", context)),
+        )
+
+    @patch("causely_notification.delivery.requests.post")
+    def test_teams_body_is_reduced_to_size_limit(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=200)
+        payload = {
+            **PAYLOAD,
+            "description": {"summary": "x" * 5000},
+            "slos": [{"status": "AT_RISK", "slo_entity": {"name": f"{i}-" + "z" * 1000}} for i in range(40)],
+        }
+        deliver(payload, [WebhookDefinition("teams", "teams", "http://teams")], stats=self.stats)
+
+        body = mock_post.call_args.kwargs["data"]
+        self.assertLessEqual(len(body), MESSAGE_BUDGETS["teams"].max_bytes)
+        text = json.dumps(json.loads(body), ensure_ascii=False)
+        self.assertIn("…", text)
+        self.assertIn("more SLOs", text)
+        self.assertGreater(self.stats.stats()["reduced"], 0)
+
+    @patch("causely_notification.delivery.requests.post")
+    def test_slack_channel_webhooks_are_threaded(self, mock_post):
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"ok": True, "ts": "100.1"}
+        mock_post.return_value = response
+        indexes = ObjectIndexes()
+        webhooks = [
+            WebhookDefinition("slack-thread", "slack", "https://slack.com/api", "xoxb", channel="C1"),
+            WebhookDefinition("slack-hook", "slack", "http://slack", "token"),
+        ]
+        payload = {**PAYLOAD, "objectId": "rc-1"}
+        deliver(payload, webhooks, stats=self.stats, indexes=indexes)
+
+        urls = [call.args[0] for call in mock_post.call_args_list]
+        self.assertEqual(urls, ["https://slack.com/api/chat.postMessage", "http://slack"])
+        self.assertEqual(indexes.get("slack-thread").get("rc-1"), "100.1")
+        self.assertEqual(self.stats.stats()["rendered"], 1)
+        self.assertEqual(self.stats.stats()["posted"], 2)
+
+    @patch("causely_notification.delivery.requests.post")
+    def test_request_failure_returns_error_response(self, mock_post):
+        mock_post.side_effect = requests.exceptions.ConnectionError("refused")
+        results = deliver(PAYLOAD, [WebhookDefinition("teams", "teams", "http://teams")], stats=self.stats)
+        self.assertEqual(results[0][1].status_code, 500)
+
+    @patch("causely_notification.delivery.requests.post")
+    def test_unknown_hook_type(self, mock_post):
+        results = deliver(PAYLOAD, [WebhookDefinition("pager", "pager", "http://pager")], stats=self.stats)
+        self.assertIsNone(results[0][1])
+        mock_post.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""
+This class is used to test the boolean filter expressions and the adaptive check ordering in expression.py.
+"""
+from __future__ import annotations
+
+import unittest
+
+from causely_notification.expression import AdaptiveGroup
+from causely_notification.expression import Check
+from causely_notification.expression import group_of
+from causely_notification.filter import WebhookFilterStore
+
+CRITICAL_OR_HIGH_SLO = {
+    "any": [
+        {"field": "severity", "operator": "equals", "value": "Critical"},
+        {"all": [
+            {"field": "severity", "operator": "equals", "value": "High"},
+            {"field": "impactsSLO", "operator": "equals", "value": True},
+        ]},
+    ],
+}
+
+
+class TestGroupOf(unittest.TestCase):
+    def test_field_filters_are_not_groups(self):
+        self.assertIsNone(group_of({"field": "severity", "operator": "equals", "value": "High"}))
+
+    def test_groups(self):
+        self.assertEqual(group_of(CRITICAL_OR_HIGH_SLO)[0], "any")
+        self.assertEqual(group_of({"not": {"field": "name", "operator": "equals", "value": "x"}})[0], "not")
+
+    def test_malformed_groups_are_rejected(self):
+        for filter_ in [{"any": []}, {"all": {"field": "name"}}, {"not": []}, {"any": [{}], "all": [{}]}, {}]:
+            with self.assertRaises(ValueError, msg=filter_):
+                group_of(filter_)
+
+
+class TestAdaptiveGroup(unittest.TestCase):
+    def test_reorder_puts_selective_checks_first(self):
+        calls = []
+
+        def check(name, result):
+            def predicate(view):
+                calls.append(name)
+                return result(view)
+            return Check(name, 1, predicate)
+
+        group = AdaptiveGroup("all", [
+            check("rarely-rejects", lambda view: view != 0),
+            check("often-rejects", lambda view: view == 0),
+        ])
+        for view in range(100):
+            group.evaluate_sampled(view)
+        group.reorder()
+        self.assertEqual([c.name for c in group.checks], ["often-rejects", "rarely-rejects"])
+
+        stats = group.stats()
+        self.assertEqual(stats["evaluations"], 100)
+        checks = {c["predicate"]: c for c in stats["checks"]}
+        self.assertEqual((checks["rarely-rejects"]["evaluated"], checks["rarely-rejects"]["passed"]), (100, 99))
+        # The second check only ran when the first one passed
+        self.assertEqual((checks["often-rejects"]["evaluated"], checks["often-rejects"]["passed"]), (99, 0))
+
+        calls.clear()
+        self.assertFalse(group.evaluate(5))
+        self.assertEqual(calls, ["often-rejects"])
+
+    def test_any_short_circuits_on_first_pass(self):
+        group = AdaptiveGroup("any", [
+            Check("no", 1, lambda view: False),
+            Check("yes", 2, lambda view: True),
+        ])
+        self.assertTrue(group.evaluate(None))
+        self.assertTrue(group.evaluate_sampled(None))
+        self.assertEqual([c["passed"] for c in group.stats()["checks"]], [0, 1])
+
+
+class TestExpressionFilters(unittest.TestCase):
+    def setUp(self):
+        self.store = WebhookFilterStore(sample_interval=1, reorder_interval=50, decision_cache_size=0)
+        self.store.add_webhook_filters("pager", [CRITICAL_OR_HIGH_SLO], enabled=True)
+        self.store.add_webhook_filters("not-kube-system", [
+            {"field": "severity", "operator": "in", "value": ["High", "Critical"]},
+            {"not": {"field": "labels.k8s.namespace.name", "operator": "equals", "value": "kube-system"}},
+        ], enabled=True)
+        self.payloads = [
+            {"severity": "Critical", "labels": {"causely.ai/namespace": "default"}},
+            {"severity": "High", "slos": [{}], "labels": {"causely.ai/namespace": "kube-system"}},
+            {"severity": "High", "labels": {"causely.ai/namespace": "default"}},
+            {"severity": "Low", "slos": [{}]},
+        ]
+
+    def test_filter_payload(self):
+        self.assertEqual(
+            [self.store.filter_payload(payload) for payload in self.payloads],
+            [["pager", "not-kube-system"], ["pager"], ["not-kube-system"], []],
+        )
+
+    def test_compiled_matches_interpreted_and_batch(self):
+        expected = [self.store.filter_payload(payload) for payload in self.payloads]
+        for filter_index in self.store.webhook_filters.values():
+            for payload in self.payloads:
+                self.assertEqual(filter_index.check_payload(payload), filter_index.check_payload_interpreted(payload))
+        self.assertEqual(self.store.filter_many(self.payloads), expected)
+        self.assertEqual(self.store.filter_many(self.payloads * 20), expected * 20)
+
+    def test_results_are_stable_across_reorders(self):
+        expected = [self.store.filter_payload(payload) for payload in self.payloads]
+        for _ in range(30):
+            self.assertEqual([self.store.filter_payload(payload) for payload in self.payloads], expected)
+
+        stats = self.store.selectivity()
+        self.assertEqual(set(stats), {"pager", "not-kube-system"})
+        self.assertEqual(stats["pager"]["kind"], "any")
+        self.assertEqual(stats["pager"]["evaluations"], 124)
+
+    def test_invalid_group_is_rejected_before_it_is_stored(self):
+        with self.assertRaises(ValueError):
+            self.store.add_webhook_filters("bad", [
+                {"any": [
+                    {"field": "severity", "operator": "equals", "value": "High"},
+                    {"field": "severity", "operator": "gte", "value": "Severe"},
+                ]},
+            ], enabled=True)
+        self.assertNotIn("bad", self.store.webhook_filters)
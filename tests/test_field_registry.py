@@ -21,9 +21,16 @@ from __future__ import annotations
 
 import unittest
 
+from causely_notification.field_registry import compile_map_accessor
+from causely_notification.field_registry import compile_path_accessor
 from causely_notification.field_registry import compute_impact_slo
+from causely_notification.field_registry import computed_field
+from causely_notification.field_registry import COMPUTED_FIELDS
 from causely_notification.field_registry import FIELD_DEFINITIONS
 from causely_notification.field_registry import FieldRegistry
+from causely_notification.field_registry import get_map_value
+from causely_notification.field_registry import get_nested_value
+from causely_notification.field_registry import resolve_function
 
 
 class TestFieldRegistry(unittest.TestCase):
@@ -137,9 +144,62 @@ class TestFieldRegistry(unittest.TestCase):
 
     def test_get_field_value_nonexistent_field(self):
         with self.assertRaises(ValueError) as context:
-            self.field_registry.get_field_value({}, "nonexistent.field")
+            self.field_registry.get_field_value({}, "nonexistent")
         self.assertIn("is not registered", str(context.exception))
 
+    def test_dynamic_label_and_path_fields(self):
+        payload = {
+            "entity": {"id": "e-1"},
+            "description": {"summary": "High latency"},
+            "labels": {"causely.ai/cluster": "prod"},
+        }
+        self.assertEqual(self.field_registry.get_field_value(payload, "entity.id"), "e-1")
+        self.assertEqual(self.field_registry.get_field_value(payload, "description.summary"), "High latency")
+        self.assertEqual(self.field_registry.get_field_value(payload, "labels.causely.ai/cluster"), "prod")
+        self.assertIsNone(self.field_registry.get_field_value(payload, "nonexistent.field"))
+        # Lookups by name do not register the field, filters do
+        self.assertNotIn("entity.id", self.field_registry.list_fields())
+        field_id = self.field_registry.get_field_id("labels.causely.ai/cluster")
+        self.assertEqual(self.field_registry.view(payload).get(field_id), "prod")
+        self.assertEqual(self.field_registry.get_field_type("labels.causely.ai/cluster"), "map_path")
+
+    def test_dynamic_accessor_cache_is_bounded(self):
+        fr = FieldRegistry({}, dynamic_cache_size=2)
+        for key in ["a", "b", "c"]:
+            self.assertIsNone(fr.get_field_value({}, f"labels.{key}"))
+        self.assertEqual(list(fr._dynamic_extractors), ["labels.b", "labels.c"])
+
+    def test_computed_field_plugins(self):
+        calls = []
+
+        @computed_field("test.plugin.risk")
+        def risk(payload):
+            calls.append(payload)
+            return payload.get("severity") == "Critical"
+
+        try:
+            field_id = self.field_registry.get_field_id("test.plugin.risk")
+            self.assertEqual(self.field_registry.get_field_type("test.plugin.risk"), "computed")
+            view = self.field_registry.view({"severity": "Critical"})
+            self.assertTrue(view.get(field_id))
+            self.assertTrue(self.field_registry.get_field_value(view, "test.plugin.risk"))
+            # The result is memoized for the payload
+            self.assertEqual(len(calls), 1)
+        finally:
+            del COMPUTED_FIELDS["test.plugin.risk"]
+
+    def test_computed_field_references(self):
+        fr = FieldRegistry(
+            {"slo": {"type": "computed", "func": "causely_notification.field_registry:compute_impact_slo"}},
+            computed_fields={"impacts": "causely_notification.field_registry:compute_impact_slo"},
+        )
+        self.assertTrue(fr.get_field_value({"slos": []}, "slo"))
+        self.assertFalse(fr.get_field_value({}, "impacts"))
+        with self.assertRaises(ValueError):
+            FieldRegistry({}, computed_fields={"broken": "causely_notification.field_registry:missing"})
+        with self.assertRaises(ValueError):
+            resolve_function("no_such_module:func")
+
     def test_missing_computed_function(self):
         # If a computed field references a non-existing function
         broken_definitions = {
@@ -181,3 +241,76 @@ class TestFieldRegistry(unittest.TestCase):
         payload_without_slos = {}
         self.assertTrue(compute_impact_slo(payload_with_slos))
         self.assertFalse(compute_impact_slo(payload_without_slos))
+
+    def test_field_ids_are_stable(self):
+        severity_id = self.field_registry.get_field_id("severity")
+        self.field_registry.register_field("severity", lambda payload: "replaced")
+        self.assertEqual(self.field_registry.get_field_id("severity"), severity_id)
+        self.assertEqual(self.field_registry.get_field_value({}, "severity"), "replaced")
+
+        with self.assertRaises(ValueError):
+            self.field_registry.get_field_id("nonexistent")
+
+    def test_payload_view_extracts_each_field_once(self):
+        calls = []
+
+        def counting_extractor(payload):
+            calls.append(payload)
+            return payload.get("severity")
+
+        self.field_registry.register_field("counted", counting_extractor)
+        field_id = self.field_registry.get_field_id("counted")
+        view = self.field_registry.view({"severity": "High"})
+
+        self.assertEqual(view.get(field_id), "High")
+        self.assertEqual(view.get(field_id), "High")
+        self.assertEqual(len(calls), 1)
+        # None values are memoized too
+        impacts_id = self.field_registry.get_field_id("labels.k8s.cluster.name")
+        self.assertIsNone(view.get(impacts_id))
+
+
+class TestCompiledAccessors(unittest.TestCase):
+    def test_path_accessor_matches_get_nested_value(self):
+        payloads = [
+            {},
+            {"severity": "High"},
+            {"entity": {"type": "host"}},
+            {"entity.type": "flat-host", "entity": {"type": "host"}},
+            {"entity": {}},
+            {"entity": {"attributes": {"nested": "value"}}},
+            {"entity.attributes.nested": "flat-value"},
+        ]
+        for path in ["severity", "entity.type", "entity.attributes.nested"]:
+            accessor = compile_path_accessor(path)
+            for payload in payloads:
+                self.assertEqual(
+                    accessor(payload),
+                    get_nested_value(payload, path.split('.')),
+                    (path, payload),
+                )
+
+    def test_path_accessor_non_dict_intermediate(self):
+        self.assertIsNone(compile_path_accessor("entity.type")({"entity": None}))
+        self.assertIsNone(compile_path_accessor("a.b.c")({"a": {"b": "text"}}))
+
+    def test_map_accessor_matches_get_map_value(self):
+        payloads = [
+            {},
+            {"labels": {"k8s.cluster.name": "dev"}},
+            {"labels": {"other": "value"}},
+            {"labels.k8s.cluster.name": "flat-dev"},
+        ]
+        accessor = compile_map_accessor("labels", "k8s.cluster.name")
+        for payload in payloads:
+            self.assertEqual(
+                accessor(payload),
+                get_map_value(payload, "labels", "k8s.cluster.name"),
+                payload,
+            )
+
+    def test_map_accessor_nested_map_path(self):
+        accessor = compile_map_accessor("entity.labels", "team")
+        self.assertEqual(accessor({"entity": {"labels": {"team": "payments"}}}), "payments")
+        self.assertEqual(accessor({"entity.labels.team": "flat"}), "flat")
+        self.assertIsNone(accessor({"entity": {}}))
@@ -15,7 +15,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 """
-This class is used to test the FilterIndex, BloomFilter, and WebhookFilterStore classes in filter.py.
+This class is used to test the FilterIndex, BloomFilter, MembershipSet, and WebhookFilterStore classes in filter.py.
 """
 from __future__ import annotations
 
@@ -25,6 +25,7 @@ from causely_notification.field_registry import FIELD_DEFINITIONS
 from causely_notification.field_registry import FieldRegistry
 from causely_notification.filter import BloomFilter
 from causely_notification.filter import FilterIndex
+from causely_notification.filter import MembershipSet
 from causely_notification.filter import WebhookFilterStore
 
 
@@ -45,6 +46,51 @@ class TestBloomFilter(unittest.TestCase):
         self.bloom.add("x")
         self.assertFalse(self.bloom.check("y"))
 
+    def test_for_capacity_sizes_for_false_positive_rate(self):
+        bloom = BloomFilter.for_capacity(10000, 0.01)
+        # m = -n ln(p) / ln(2)^2 and k = m / n ln(2)
+        self.assertEqual(bloom.size, 95851)
+        self.assertEqual(bloom.num_hashes, 7)
+
+        for i in range(10000):
+            bloom.add(f"namespace-{i}")
+        for i in range(10000):
+            self.assertTrue(bloom.check(f"namespace-{i}"))
+        false_positives = sum(
+            bloom.check(f"other-{i}") for i in range(10000)
+        )
+        self.assertLess(false_positives, 200)
+
+
+class TestMembershipSet(unittest.TestCase):
+    def test_small_sets_are_exact(self):
+        members = MembershipSet(bloom_threshold=10)
+        members.add("prod")
+        members.add("stage")
+        self.assertIsNone(members.bloom)
+        self.assertIn("prod", members)
+        self.assertNotIn("dev", members)
+        self.assertEqual(len(members), 2)
+
+    def test_large_sets_switch_to_bloom_and_stay_exact(self):
+        members = MembershipSet(bloom_threshold=100, false_positive_rate=0.2)
+        for i in range(1000):
+            members.add(f"namespace-{i}")
+        self.assertIsNotNone(members.bloom)
+        # Bloom hits are confirmed against the exact set, so there are no false positives
+        for i in range(1000):
+            self.assertTrue(members.check(f"namespace-{i}"))
+            self.assertFalse(members.check(f"other-{i}"))
+
+    def test_compile_matches_string_form(self):
+        members = MembershipSet()
+        members.add("True")
+        members.add("3")
+        contains = members.compile()
+        self.assertTrue(contains(True))
+        self.assertTrue(contains(3))
+        self.assertFalse(contains("true"))
+
 
 class TestFilterIndex(unittest.TestCase):
     def setUp(self):
@@ -54,33 +100,33 @@ class TestFilterIndex(unittest.TestCase):
         )
 
     def test_add_equals_filter(self):
-        # 'equals' operator uses BloomFilter
+        # 'equals' operator uses a MembershipSet
         self.index.add_filter("severity", "equals", "high")
         self.assertIn("severity", self.index.field_filters)
-        self.assertIsNotNone(self.index.field_filters["severity"]["bloom"])
+        self.assertIsNotNone(self.index.field_filters["severity"]["members"])
         self.assertEqual(
             len(self.index.field_filters["severity"]["operator"]), 0,
         )
 
     def test_add_in_filter(self):
-        # 'in' operator also uses BloomFilter
+        # 'in' operator also uses a MembershipSet
         self.index.add_filter(
             "labels.k8s.cluster.name", "in", [
                 "prod-cluster", "stage-cluster",
             ],
         )
         self.assertIn("labels.k8s.cluster.name", self.index.field_filters)
-        bloom = self.index.field_filters["labels.k8s.cluster.name"]["bloom"]
-        self.assertIsNotNone(bloom)
-        self.assertTrue(bloom.check("prod-cluster"))
-        self.assertTrue(bloom.check("stage-cluster"))
-        self.assertFalse(bloom.check("non-existent"))
+        members = self.index.field_filters["labels.k8s.cluster.name"]["members"]
+        self.assertIsNotNone(members)
+        self.assertTrue(members.check("prod-cluster"))
+        self.assertTrue(members.check("stage-cluster"))
+        self.assertFalse(members.check("non-existent"))
 
     def test_add_not_equals_filter(self):
-        # 'not_equals' operator uses Operator (no BloomFilter)
+        # 'not_equals' operator uses Operator (no MembershipSet)
         self.index.add_filter("severity", "not_equals", "low")
         self.assertIn("severity", self.index.field_filters)
-        self.assertIsNone(self.index.field_filters["severity"]["bloom"])
+        self.assertIsNone(self.index.field_filters["severity"]["members"])
         self.assertEqual(
             len(self.index.field_filters["severity"]["operator"]), 1,
         )
@@ -172,6 +218,25 @@ class TestWebhookFilterStore(unittest.TestCase):
         # This should be empty because the payload does not match all filters
         self.assertEqual([], result)
 
+    def test_filter_payload_extracts_shared_fields_once(self):
+        calls = []
+        extractor = self.store.field_registry.get_extractor("severity")
+
+        def counting_extractor(payload):
+            calls.append(payload)
+            return extractor(payload)
+
+        self.store.field_registry.register_field("severity", counting_extractor)
+        for i in range(10):
+            self.store.add_webhook_filters(
+                f"webhook{i}", [
+                    {"field": "severity", "operator": "equals", "value": "High"},
+                ], enabled=True,
+            )
+
+        self.assertEqual(len(self.store.filter_payload({"severity": "High"})), 10)
+        self.assertEqual(len(calls), 1)
+
     def test_add_webhook_filters_disabled(self):
         # If enabled=False, then the webhook acts as a "catch-all" (always returns it)
         filters = [
@@ -188,6 +253,84 @@ class TestWebhookFilterStore(unittest.TestCase):
         result = self.store.filter_payload(payload_anything)
         self.assertIn("webhook2", result)
 
+    def test_dynamic_label_field(self):
+        self.store.add_webhook_filters(
+            "prod", [
+                {"field": "labels.causely.ai/cluster", "operator": "starts_with", "value": "prod"},
+            ], enabled=True,
+        )
+        self.assertEqual(self.store.filter_payload({"labels": {"causely.ai/cluster": "prod-eu"}}), ["prod"])
+        self.assertEqual(self.store.filter_payload({"labels": {"causely.ai/cluster": "stage"}}), [])
+
+    def test_identical_filter_sets_are_shared(self):
+        filters = [
+            {"field": "severity", "operator": "in", "value": ["High", "Critical"]},
+            {"field": "labels.k8s.namespace.name", "operator": "equals", "value": "payments"},
+        ]
+        self.store.add_webhook_filters("slack-payments", filters, enabled=True)
+        self.store.add_webhook_filters("jira-payments", [dict(filter_) for filter_ in filters], enabled=True)
+        self.store.add_webhook_filters("jira-orders", filters[:1], enabled=True)
+        self.assertIs(self.store.webhook_filters["slack-payments"], self.store.webhook_filters["jira-payments"])
+        self.assertEqual(len(self.store.distinct_filter_indexes()), 2)
+
+        calls = []
+        shared = self.store.webhook_filters["slack-payments"]
+        check_view = shared.check_view
+        shared.check_view = lambda view: calls.append(view) or check_view(view)
+        payload = {"severity": "High", "labels": {"causely.ai/namespace": "payments"}}
+        self.assertEqual(self.store.filter_payload(payload), ["slack-payments", "jira-payments", "jira-orders"])
+        self.assertEqual(len(calls), 1)
+
+        # Extending one of the webhooks gives it its own filter set
+        self.store.add_webhook_filters("jira-payments", [
+            {"field": "impactsSLO", "operator": "equals", "value": True},
+        ])
+        self.assertIsNot(self.store.webhook_filters["slack-payments"], self.store.webhook_filters["jira-payments"])
+        self.assertEqual(self.store.filter_payload(payload), ["slack-payments", "jira-orders"])
+
+    def test_invalid_filters_leave_webhook_unchanged(self):
+        self.store.add_webhook_filters("high", [
+            {"field": "severity", "operator": "equals", "value": "High"},
+        ], enabled=True)
+        with self.assertRaises(ValueError):
+            self.store.add_webhook_filters("high", [
+                {"field": "severity", "operator": "not_in", "value": "Low"},
+            ])
+        self.assertEqual(self.store.filter_payload({"severity": "High"}), ["high"])
+
+    def test_explain(self):
+        self.store.add_webhook_filters(
+            "pager", [
+                {"field": "severity", "operator": "in", "value": ["High", "Critical"]},
+                {"any": [
+                    {"field": "impactsSLO", "operator": "equals", "value": True},
+                    {"not": {"field": "name", "operator": "starts_with", "value": "CPU"}},
+                ]},
+            ], enabled=True,
+        )
+        self.store.add_webhook_filters("all", [], enabled=False)
+
+        explanation = self.store.explain({"severity": "High", "name": "CPUCongested"})
+        self.assertEqual(explanation["matching_webhooks"], ["all"])
+        pager = explanation["webhooks"]["pager"]
+        self.assertFalse(pager["matched"])
+        self.assertGreaterEqual(pager["elapsed_us"], 0)
+        self.assertEqual(pager["fields"], {"severity": "High", "impactsSLO": False, "name": "CPUCongested"})
+        self.assertEqual(pager["conditions"], [
+            {"field": "severity", "operator": "in", "value": ["Critical", "High"], "matched": True},
+            {
+                "any": [
+                    {"field": "impactsSLO", "operator": "in", "value": ["True"], "matched": False},
+                    {
+                        "not": {"field": "name", "operator": "starts_with", "value": "CPU", "matched": True},
+                        "matched": False,
+                    },
+                ],
+                "matched": False,
+            },
+        ])
+        self.assertTrue(explanation["webhooks"]["all"]["matched"])
+
     def test_multiple_webhooks(self):
         # Webhook1 (enabled): severity=high
         self.store.add_webhook_filters(
@@ -1,15 +1,46 @@
 # Tests for causely_notification.github (forward_to_github)
+from __future__ import annotations
+
+import threading
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from causely_notification.github import _create_issue_batch
+from causely_notification.github import create_issues_for_root_causes
+from causely_notification.github import forward_to_github
+from causely_notification.github import issue_indexes
+from causely_notification.github import RC_ID_MARKER
+from causely_notification.github import repo_ids_cache
+from causely_notification.github import RepoIdsCache
+from causely_notification.github import RepoIssueIndex
+
+
+def _issue(number, object_id, state="open", updated_at="2025-08-07T19:00:00Z"):
+    return {
+        "number": number,
+        "html_url": f"https://github.com/owner/repo/issues/{number}",
+        "body": "## Causely Root Cause\n" + RC_ID_MARKER + object_id + "\n\n**Portal:**",
+        "state": state,
+        "updated_at": updated_at,
+    }
+
 
-from causely_notification.github import (
-    RC_ID_MARKER,
-    forward_to_github,
-)
+def _response(issues, status_code=200, etag=None):
+    return MagicMock(
+        ok=status_code < 400,
+        status_code=status_code,
+        content=b" ",
+        headers={"ETag": etag} if etag else {},
+        json=lambda: issues,
+    )
 
 
 class TestForwardToGitHub(unittest.TestCase):
 
+    def setUp(self):
+        issue_indexes.clear()
+
     @patch("causely_notification.github.requests.request")
     def test_forward_to_github_problem_detected_creates_issue(self, mock_request):
         # First call: list issues (empty). Second call: create issue.
@@ -101,7 +132,8 @@ class TestForwardToGitHub(unittest.TestCase):
         self.assertIn(RC_ID_MARKER + "rc-123", body["body"])
 
     @patch("causely_notification.github.requests.request")
-    def test_forward_to_github_problem_cleared_ignored(self, mock_request):
+    def test_forward_to_github_problem_cleared_without_issue(self, mock_request):
+        mock_request.return_value = _response([])
         payload = {
             "name": "Congested",
             "type": "ProblemCleared",
@@ -114,8 +146,12 @@ class TestForwardToGitHub(unittest.TestCase):
         response = forward_to_github(payload, "owner/repo", "token")
 
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, "no open issue")
+        self.assertEqual([call.args[0] for call in mock_request.call_args_list], ["GET"])
+
+    def test_forward_to_github_other_event_ignored(self):
+        response = forward_to_github({"type": "Heartbeat", "objectId": "rc-1"}, "owner/repo", "token")
         self.assertEqual(response.text, "ignored event type")
-        mock_request.assert_not_called()
 
     @patch("causely_notification.github.requests.request")
     def test_forward_to_github_existing_issue_skipped(self, mock_request):
@@ -172,3 +208,259 @@ class TestForwardToGitHub(unittest.TestCase):
         response = forward_to_github(payload, "owner/repo", "token")
         self.assertEqual(response.status_code, 400)
         self.assertIn("objectId", response.text)
+
+
+class TestRepoIssueIndex(unittest.TestCase):
+
+    @patch("causely_notification.github.requests.request")
+    def test_warm_then_sync_with_etag(self, mock_request):
+        index = RepoIssueIndex("owner", "repo")
+        mock_request.return_value = _response([_issue(1, "rc-1"), {"number": 2, "body": "unrelated"}])
+        self.assertEqual(index.warm("token"), 1)
+
+        mock_request.reset_mock()
+        mock_request.return_value = _response([], etag='"abc"')
+        self.assertEqual(index.lookup("rc-1", "token")["number"], 1)
+        args, kwargs = mock_request.call_args
+        self.assertIn("state=all&since=", args[1])
+        self.assertNotIn("If-None-Match", kwargs["headers"])
+
+        # Nothing changed since: the ETag is sent and the 304 keeps the index
+        mock_request.return_value = _response(None, status_code=304)
+        self.assertEqual(index.lookup("rc-1", "token")["number"], 1)
+        self.assertEqual(mock_request.call_args.kwargs["headers"]["If-None-Match"], '"abc"')
+        self.assertEqual(mock_request.call_count, 2)
+
+    @patch("causely_notification.github.requests.request")
+    def test_sync_applies_opened_and_closed_issues(self, mock_request):
+        index = RepoIssueIndex("owner", "repo")
+        mock_request.return_value = _response([_issue(1, "rc-1")])
+        index.warm("token")
+
+        mock_request.return_value = _response([
+            _issue(1, "rc-1", state="closed", updated_at="2099-01-01T00:00:00Z"),
+            _issue(3, "rc-3", updated_at="2099-01-01T00:00:01Z"),
+        ])
+        self.assertIsNone(index.lookup("rc-1", "token"))
+        self.assertEqual(index.lookup("rc-3", "token")["number"], 3)
+        # The next sync starts at the newest update seen
+        self.assertIn("since=2099-01-01T00:00:01Z", mock_request.call_args.args[1])
+
+    @patch("causely_notification.github.requests.request")
+    def test_created_issue_is_found_without_listing(self, mock_request):
+        mock_request.side_effect = [
+            _response([]),
+            _response({"number": 7, "html_url": "https://github.com/owner/repo/issues/7"}, status_code=201),
+            _response(None, status_code=304),
+        ]
+        issue_indexes.clear()
+        payload = {"type": "ProblemDetected", "objectId": "rc-7", "name": "Congested", "entity": {}}
+        self.assertEqual(forward_to_github(payload, "owner/repo", "token").status_code, 201)
+        self.assertEqual(forward_to_github(payload, "owner/repo", "token").text, "existing")
+        self.assertEqual([call.args[0] for call in mock_request.call_args_list], ["GET", "POST", "GET"])
+        self.assertEqual(issue_indexes.stats(), {"owner/repo": 1})
+
+
+class TestRepoIdsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.cache = RepoIdsCache(ttl=3600, missing_ttl=300, clock=lambda: self.now)
+
+    def test_ids_are_reused_until_the_ttl(self):
+        load = MagicMock(return_value={"repo_id": "R1", "copilot_id": "B1"})
+        self.assertEqual(self.cache.get("owner", "repo", "token", load)["repo_id"], "R1")
+        self.assertEqual(self.cache.get("Owner", "Repo", "token", load)["repo_id"], "R1")
+        self.assertEqual(load.call_count, 1)
+        # Another token may not see the same repository
+        self.cache.get("owner", "repo", "other-token", load)
+        self.assertEqual(load.call_count, 2)
+        self.now = 3601
+        self.cache.get("owner", "repo", "token", load)
+        self.assertEqual(load.call_count, 3)
+        self.assertEqual(self.cache.stats(), {"entries": 2, "hits": 1, "misses": 3})
+
+    def test_missing_copilot_is_cached_for_the_shorter_ttl(self):
+        load = MagicMock(return_value={"repo_id": "R1", "copilot_id": None})
+        self.cache.get("owner", "repo", "token", load)
+        self.now = 299
+        self.cache.get("owner", "repo", "token", load)
+        self.assertEqual(load.call_count, 1)
+        self.now = 301
+        self.cache.get("owner", "repo", "token", load)
+        self.assertEqual(load.call_count, 2)
+
+    def test_errors_are_not_cached(self):
+        load = MagicMock(side_effect=[RuntimeError("GraphQL HTTP 502"), None])
+        with self.assertRaises(RuntimeError):
+            self.cache.get("owner", "repo", "token", load)
+        self.assertIsNone(self.cache.get("owner", "repo", "token", load))
+        self.assertIsNone(self.cache.get("owner", "repo", "token", load))
+        self.assertEqual(load.call_count, 2)
+
+    def test_concurrent_misses_query_once(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def load():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"repo_id": "R1", "copilot_id": "B1"}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get("owner", "repo", "token", load)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        started.wait(5)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([ids["repo_id"] for ids in results], ["R1"] * 8)
+
+    @patch("causely_notification.github.requests.post")
+    @patch("causely_notification.github.requests.request")
+    def test_copilot_issues_query_the_ids_once(self, mock_request, mock_post):
+        issue_indexes.clear()
+        repo_ids_cache.clear()
+        mock_request.side_effect = [_response([]), _response(None, status_code=304)]
+        ids = {"repository": {"id": "R1", "suggestedActors": {"nodes": [{"login": "copilot-swe-agent", "id": "B1"}]}}}
+        created = {"createIssue": {"issue": {"number": 1, "url": "https://github.com/owner/repo/issues/1"}}}
+        mock_post.side_effect = [
+            MagicMock(ok=True, json=lambda: {"data": ids}),
+            MagicMock(ok=True, json=lambda: {"data": created}),
+            MagicMock(ok=True, json=lambda: {"data": {**created, "createIssue": {"issue": {"number": 2, "url": "u"}}}}),
+        ]
+        for object_id in ("rc-1", "rc-2"):
+            payload = {"type": "ProblemDetected", "objectId": object_id, "name": "Congested", "entity": {}}
+            response = forward_to_github(payload, "owner/repo", "token", assignee="copilot-swe-agent")
+            self.assertEqual(response.status_code, 201)
+        queries = [call.kwargs["json"]["query"] for call in mock_post.call_args_list]
+        self.assertEqual(sum("suggestedActors" in query for query in queries), 1)
+        self.assertEqual(sum("createIssue" in query for query in queries), 2)
+
+
+class TestGitHubIssueLifecycle(unittest.TestCase):
+
+    def setUp(self):
+        issue_indexes.clear()
+        self.payload = {
+            "name": "Congested",
+            "type": "ProblemDetected",
+            "entity": {"name": "my-service"},
+            "objectId": "rc-1",
+            "severity": "High",
+            "timestamp": "2025-08-07T19:00:00Z",
+            "description": {"summary": "Queue is backing up."},
+        }
+
+    def _open_issue(self, severity="High"):
+        issue = _issue(5, "rc-1")
+        issue["body"] += f"\n**Severity:** {severity}\n"
+        return issue
+
+    @patch("causely_notification.github.requests.request")
+    def test_severity_change_is_commented(self, mock_request):
+        mock_request.side_effect = [_response([self._open_issue()]), _response({"id": 1}, status_code=201)]
+        response = forward_to_github({**self.payload, "type": "ProblemUpdated", "severity": "Critical"},
+                                     "owner/repo", "token")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.text, "commented")
+        method, url = mock_request.call_args_list[1].args
+        self.assertEqual((method, url), ("POST", "https://api.github.com/repos/owner/repo/issues/5/comments"))
+        body = mock_request.call_args_list[1].kwargs["json"]["body"]
+        self.assertIn("from **High** to **Critical**", body)
+        self.assertIn("Queue is backing up.", body)
+
+    @patch("causely_notification.github.requests.request")
+    def test_same_severity_is_not_commented(self, mock_request):
+        # The comment bumps updated_at, so the next sync returns the issue with its first severity in the body
+        mock_request.side_effect = [
+            _response([self._open_issue()]),
+            _response({"id": 1}, status_code=201),
+            _response([self._open_issue()]),
+        ]
+        updated = {**self.payload, "type": "ProblemUpdated", "severity": "Critical"}
+        forward_to_github(updated, "owner/repo", "token")
+        response = forward_to_github(updated, "owner/repo", "token")
+
+        self.assertEqual(response.text, "existing")
+        self.assertEqual([call.args[0] for call in mock_request.call_args_list], ["GET", "POST", "GET"])
+
+    @patch("causely_notification.github.requests.request")
+    def test_cleared_closes_the_issue(self, mock_request):
+        mock_request.side_effect = [
+            _response([self._open_issue()]),
+            _response({"number": 5, "state": "closed"}),
+            _response(None, status_code=304),
+        ]
+        cleared = {**self.payload, "type": "ProblemCleared"}
+        response = forward_to_github(cleared, "owner/repo", "token")
+
+        self.assertEqual(response.text, "closed")
+        method, url = mock_request.call_args_list[1].args
+        self.assertEqual((method, url), ("PATCH", "https://api.github.com/repos/owner/repo/issues/5"))
+        self.assertEqual(mock_request.call_args_list[1].kwargs["json"], {"state": "closed", "state_reason": "completed"})
+        # The closed issue is no longer in the index
+        self.assertEqual(forward_to_github(cleared, "owner/repo", "token").text, "no open issue")
+        self.assertEqual(mock_request.call_count, 3)
+
+
+class TestIssueBatches(unittest.TestCase):
+
+    def setUp(self):
+        repo_ids_cache.clear()
+        self.payloads = [
+            {"type": "ProblemDetected", "objectId": f"rc-{i}", "name": "Congested", "entity": {"name": f"svc-{i}"}}
+            for i in range(3)
+        ]
+
+    @patch("causely_notification.github.requests.post")
+    def test_creates_are_sent_as_one_aliased_mutation(self, mock_post):
+        ids = {"repository": {"id": "R1", "suggestedActors": {"nodes": []}}}
+        created = {
+            "issue0": {"issue": {"number": 1, "url": "https://github.com/owner/repo/issues/1"}},
+            "issue1": None,
+            "issue2": {"issue": {"number": 2, "url": "https://github.com/owner/repo/issues/2"}},
+        }
+        errors = [{"message": "title is too long", "path": ["issue1"]}]
+        mock_post.side_effect = [
+            MagicMock(ok=True, json=lambda: {"data": ids}),
+            MagicMock(ok=True, json=lambda: {"data": created, "errors": errors}),
+        ]
+        results = create_issues_for_root_causes(self.payloads, "owner", "repo", "token")
+
+        self.assertEqual(results[0]["number"], 1)
+        self.assertIsInstance(results[1], RuntimeError)
+        self.assertIn("title is too long", str(results[1]))
+        self.assertEqual(results[2]["number"], 2)
+
+        mutation = mock_post.call_args_list[1].kwargs["json"]
+        self.assertEqual(mutation["query"].count("createIssue("), 3)
+        self.assertIn("issue2: createIssue", mutation["query"])
+        self.assertEqual(mutation["variables"]["repoId"], "R1")
+        self.assertEqual(mutation["variables"]["assigneeIds"], [])
+        self.assertIn(RC_ID_MARKER + "rc-1", mutation["variables"]["body1"])
+        self.assertEqual(mutation["variables"]["title2"], "[Causely] Congested: svc-2")
+
+    @patch("causely_notification.github.requests.request")
+    def test_single_create_uses_rest(self, mock_request):
+        mock_request.return_value = _response({"number": 4, "html_url": "u"}, status_code=201)
+        results = create_issues_for_root_causes(self.payloads[:1], "owner", "repo", "token")
+        self.assertEqual(results, [{"number": 4, "url": "u"}])
+        self.assertEqual(mock_request.call_args.args, ("POST", "https://api.github.com/repos/owner/repo/issues"))
+
+    @patch("causely_notification.github.create_issues_for_root_causes")
+    def test_root_cause_submitted_twice_creates_one_issue(self, mock_create):
+        mock_create.return_value = [{"number": 1, "url": "a"}, {"number": 2, "url": "b"}]
+        items = [(payload, "owner", "repo", "token", None) for payload in self.payloads[:2]]
+        results = _create_issue_batch(items + items[:1])
+
+        self.assertEqual(len(mock_create.call_args.args[0]), 2)
+        self.assertEqual([result["number"] for result in results], [1, 2, 1])
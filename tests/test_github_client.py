@@ -0,0 +1,111 @@
+# Tests for causely_notification.github_client (rate limits and conditional requests)
+from __future__ import annotations
+
+import unittest
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from causely_notification.github_client import GitHubClient
+from causely_notification.github_client import RateLimitError
+from causely_notification.github_client import WRITE_RESERVE
+
+
+def _response(status_code=200, data=None, headers=None):
+    return MagicMock(
+        ok=status_code < 400,
+        status_code=status_code,
+        content=b" " if data is not None else b"",
+        headers=headers or {},
+        json=lambda: data,
+        text="",
+    )
+
+
+def _quota(remaining, reset=1060, limit=5000):
+    return {"X-RateLimit-Limit": str(limit), "X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset": str(reset)}
+
+
+class TestGitHubClient(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+        self.client = GitHubClient(max_wait=30, clock=lambda: self.now, sleep=sleep)
+
+    @patch("causely_notification.github_client.requests.request")
+    def test_get_is_repeated_with_its_etag(self, mock_request):
+        mock_request.side_effect = [
+            _response(data=[{"number": 1}], headers={"ETag": '"v1"'}),
+            _response(304),
+        ]
+        self.assertEqual(self.client.get("/repos/o/r/issues", "token"), ([{"number": 1}], True))
+        self.assertEqual(self.client.get("/repos/o/r/issues", "token"), ([{"number": 1}], False))
+
+        self.assertNotIn("If-None-Match", mock_request.call_args_list[0].kwargs["headers"])
+        self.assertEqual(mock_request.call_args_list[1].kwargs["headers"]["If-None-Match"], '"v1"')
+        self.assertEqual(self.client.stats()["not_modified"], 1)
+
+    @patch("causely_notification.github_client.requests.request")
+    def test_etags_are_kept_per_token(self, mock_request):
+        mock_request.return_value = _response(data=[], headers={"ETag": '"v1"'})
+        self.client.get("/repos/o/r/issues", "token")
+        self.client.get("/repos/o/r/issues", "other-token")
+        self.assertNotIn("If-None-Match", mock_request.call_args.kwargs["headers"])
+
+    @patch("causely_notification.github_client.requests.request")
+    def test_lookups_leave_the_write_reserve(self, mock_request):
+        mock_request.return_value = _response(data={}, headers=_quota(WRITE_RESERVE, reset=1020))
+        self.client.request("GET", "/repos/o/r/issues/1", "token")
+
+        # Writes may use the reserve
+        self.client.request("POST", "/repos/o/r/issues", "token", {"title": "t"})
+        self.assertEqual(self.sleeps, [])
+        # Lookups wait for the reset
+        self.client.request("GET", "/repos/o/r/issues/2", "token")
+        self.assertEqual(self.sleeps, [20.0])
+
+    @patch("causely_notification.github_client.requests.request")
+    def test_calls_are_spread_when_the_quota_runs_low(self, mock_request):
+        mock_request.return_value = _response(data={}, headers=_quota(WRITE_RESERVE + 10, reset=1060))
+        self.client.request("POST", "/repos/o/r/issues", "token")
+        for _ in range(3):
+            self.client.request("POST", "/repos/o/r/issues", "token")
+        # 60 calls left over 60 seconds, one call per second after the first
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertAlmostEqual(self.sleeps[0], 1.0)
+
+    @patch("causely_notification.github_client.requests.request")
+    def test_secondary_limit_is_waited_out_and_retried(self, mock_request):
+        mock_request.side_effect = [
+            _response(403, headers={"Retry-After": "5"}),
+            _response(201, data={"number": 3}),
+        ]
+        self.assertEqual(self.client.request("POST", "/repos/o/r/issues", "token"), {"number": 3})
+        self.assertEqual(self.sleeps, [5.0])
+        self.assertEqual(self.client.stats()["rate_limited"], 1)
+
+    @patch("causely_notification.github_client.requests.request")
+    def test_long_waits_are_rejected(self, mock_request):
+        mock_request.return_value = _response(403, headers=_quota(0, reset=4600))
+        with self.assertRaises(RateLimitError):
+            self.client.request("POST", "/repos/o/r/issues", "token")
+        self.assertEqual(mock_request.call_count, 1)
+        # Later calls fail without being sent until the reset
+        with self.assertRaises(RateLimitError):
+            self.client.request("GET", "/repos/o/r/issues", "token")
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(self.client.stats()["rejected"], 2)
+
+    @patch("causely_notification.github_client.requests.request")
+    def test_permission_errors_are_not_retried(self, mock_request):
+        mock_request.return_value = _response(403, headers=_quota(4000))
+        with self.assertRaises(RuntimeError) as raised:
+            self.client.request("GET", "/repos/o/r/issues", "token")
+        self.assertIn("403", str(raised.exception))
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(self.sleeps, [])
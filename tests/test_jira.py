@@ -1,17 +1,52 @@
-# Tests for causely_notification.jira (forward_to_jira)
+# Tests for causely_notification.jira (issues rendered from the built-in Jira template)
+from __future__ import annotations
+
+import json
+import threading
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from causely_notification.delivery import default_templates
+from causely_notification.jira import _create_issue_batch
+from causely_notification.jira import forward_to_jira_issue
+from causely_notification.jira import rebuild_jira_index
+from causely_notification.jira import root_cause_label
+from causely_notification.message_templates import MESSAGE_BUDGETS
+from causely_notification.message_templates import template_context
+from causely_notification.micro_batch import MicroBatcher
+from causely_notification.micro_batch import MicroBatchers
+from causely_notification.object_index import ObjectIndex
+
+JIRA_URL = "https://fake.atlassian.net"
+
+LIFECYCLE_PAYLOAD = {
+    "name": "Malfunction",
+    "type": "ProblemDetected",
+    "entity": {"name": "checkout"},
+    "objectId": "rc-1",
+    "severity": "High",
+    "timestamp": "2025-08-07T18:51:54.164185287Z",
+    "description": {"summary": "High error rate"},
+}
 
-from causely_notification.jira import forward_to_jira
+
+def render_jira_body(payload):
+    """Render the built-in Jira template within the Jira budget, as delivery does."""
+    return json.loads(default_templates().render("jira.json.j2", template_context(payload, MESSAGE_BUDGETS["jira"])))
+
+
+def _response(status_code, body=None):
+    response = MagicMock(status_code=status_code, ok=200 <= status_code < 300)
+    response.json.return_value = body
+    return response
 
 
 class TestForwardToJira(unittest.TestCase):
 
     @patch("causely_notification.jira.requests.post")
     def test_forward_to_jira_detected(self, mock_post):
-        mock_response = MagicMock()
-        mock_response.status_code = 201
-        mock_post.return_value = mock_response
+        mock_post.return_value = _response(201, {"id": "10000", "key": "OPS-1"})
 
         payload = {
             "link": "https://portal.staging.causely.app/rootCauses/d76f027d-e697-46ed-8a2c-f16356a97ceb",
@@ -36,25 +71,20 @@ class TestForwardToJira(unittest.TestCase):
         url = "https://fake.atlassian.net"
         token = "fake-jira-token"
 
-        response = forward_to_jira(payload, url, token)
+        response = forward_to_jira_issue(payload, render_jira_body(payload), url, token, None, ObjectIndex())
 
         self.assertEqual(response.status_code, 201)
         self.assertEqual(mock_post.call_count, 1)
         call_url = mock_post.call_args[0][0]
         self.assertEqual(call_url, f"{url}/rest/api/2/issue")
-        body = mock_post.call_args[1]["json"]
+        body = json.loads(mock_post.call_args[1]["data"])
         self.assertIn("fields", body)
         self.assertIn("Malfunction", body["fields"]["summary"])
         self.assertIn("Root Cause Identified", body["fields"]["summary"])
         self.assertIn("The HTTP path is experiencing", body["fields"]["description"])
         self.assertIn("Check Logs", body["fields"]["description"])
 
-    @patch("causely_notification.jira.requests.post")
-    def test_forward_to_jira_cleared(self, mock_post):
-        mock_response = MagicMock()
-        mock_response.status_code = 201
-        mock_post.return_value = mock_response
-
+    def test_jira_cleared_body(self):
         payload = {
             "name": "Congested",
             "type": "ProblemCleared",
@@ -63,12 +93,178 @@ class TestForwardToJira(unittest.TestCase):
             "timestamp": "2025-08-07T19:00:00Z",
             "description": {"summary": "Issue resolved."}
         }
-        url = "https://fake.atlassian.net"
-        token = "fake-jira-token"
+        body = render_jira_body(payload)
+        self.assertIn("Root Cause Cleared", body["fields"]["summary"])
+        self.assertIn("Congested", body["fields"]["summary"])
+
+
+class TestJiraIssueLifecycle(unittest.TestCase):
 
-        response = forward_to_jira(payload, url, token)
+    def setUp(self):
+        self.index = ObjectIndex()
+
+    def _forward(self, payload, project="SRE"):
+        return forward_to_jira_issue(payload, render_jira_body(payload), JIRA_URL, "token", project, self.index)
+
+    @patch("causely_notification.jira.requests.post")
+    def test_first_detection_creates_labeled_issue(self, mock_post):
+        mock_post.return_value = _response(201, {"id": "10000", "key": "SRE-1"})
+        response = self._forward(LIFECYCLE_PAYLOAD)
 
         self.assertEqual(response.status_code, 201)
-        body = mock_post.call_args[1]["json"]
-        self.assertIn("Root Cause Cleared", body["fields"]["summary"])
-        self.assertIn("Congested", body["fields"]["summary"])
+        self.assertEqual(mock_post.call_args.args[0], f"{JIRA_URL}/rest/api/2/issue")
+        fields = json.loads(mock_post.call_args.kwargs["data"])["fields"]
+        self.assertEqual(fields["project"], {"key": "SRE"})
+        self.assertEqual(fields["labels"], ["causely-alert", "causely-root-cause-rc-1"])
+        self.assertEqual(self.index.get("rc-1"), "SRE-1")
+
+    @patch("causely_notification.jira.requests.post")
+    def test_template_project_is_kept_by_default(self, mock_post):
+        mock_post.return_value = _response(201, {"id": "10000", "key": "OPS-1"})
+        self._forward(LIFECYCLE_PAYLOAD, project=None)
+        self.assertEqual(json.loads(mock_post.call_args.kwargs["data"])["fields"]["project"], {"key": "OPS"})
+
+    @patch("causely_notification.jira.requests.post")
+    def test_update_adds_comment(self, mock_post):
+        self.index.put("rc-1", "SRE-1")
+        mock_post.return_value = _response(201, {"id": "1"})
+        self._forward({**LIFECYCLE_PAYLOAD, "type": "ProblemUpdated", "severity": "Critical"})
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(mock_post.call_args.args[0], f"{JIRA_URL}/rest/api/2/issue/SRE-1/comment")
+        comment = json.loads(mock_post.call_args.kwargs["data"])["body"]
+        self.assertTrue(comment.startswith("*Root Cause Identified: Malfunction*"))
+        self.assertIn("Critical", comment)
+        self.assertEqual(self.index.get("rc-1"), "SRE-1")
+
+    @patch("causely_notification.jira.requests.get")
+    @patch("causely_notification.jira.requests.post")
+    def test_clear_comments_and_resolves_issue(self, mock_post, mock_get):
+        self.index.put("rc-1", "SRE-1")
+        mock_post.side_effect = [_response(201, {"id": "1"}), _response(204)]
+        mock_get.return_value = _response(200, {"transitions": [
+            {"id": "11", "name": "In Progress", "to": {"statusCategory": {"key": "indeterminate"}}},
+            {"id": "31", "name": "Done", "to": {"statusCategory": {"key": "done"}}},
+        ]})
+        response = self._forward({**LIFECYCLE_PAYLOAD, "type": "ProblemCleared"})
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(mock_get.call_args.args[0], f"{JIRA_URL}/rest/api/2/issue/SRE-1/transitions")
+        self.assertEqual(mock_post.call_args.args[0], f"{JIRA_URL}/rest/api/2/issue/SRE-1/transitions")
+        self.assertEqual(json.loads(mock_post.call_args.kwargs["data"]), {"transition": {"id": "31"}})
+        self.assertIsNone(self.index.get("rc-1"))
+
+    @patch("causely_notification.jira.requests.post")
+    def test_clear_without_issue_creates_none(self, mock_post):
+        response = self._forward({**LIFECYCLE_PAYLOAD, "type": "ProblemCleared"})
+        self.assertEqual(response.status_code, 200)
+        mock_post.assert_not_called()
+
+    @patch("causely_notification.jira.requests.post")
+    def test_deleted_issue_is_created_again(self, mock_post):
+        self.index.put("rc-1", "SRE-1")
+        mock_post.side_effect = [_response(404), _response(201, {"id": "10001", "key": "SRE-2"})]
+        self._forward({**LIFECYCLE_PAYLOAD, "type": "ProblemUpdated"})
+
+        self.assertEqual(mock_post.call_args.args[0], f"{JIRA_URL}/rest/api/2/issue")
+        self.assertEqual(self.index.get("rc-1"), "SRE-2")
+
+    @patch("causely_notification.jira.requests.get")
+    def test_rebuild_index_from_labels(self, mock_get):
+        mock_get.side_effect = [
+            _response(200, {"total": 3, "issues": [
+                {"key": "SRE-1", "fields": {"labels": ["causely-alert", "causely-root-cause-rc-1"]}},
+                {"key": "SRE-2", "fields": {"labels": ["causely-alert"]}},
+            ]}),
+            _response(200, {"total": 3, "issues": [
+                {"key": "SRE-3", "fields": {"labels": ["causely-root-cause-rc-3", "causely-alert"]}},
+            ]}),
+        ]
+        self.assertEqual(rebuild_jira_index(JIRA_URL, "token", "SRE", self.index), 2)
+
+        self.assertEqual(self.index.get("rc-1"), "SRE-1")
+        self.assertEqual(self.index.get("rc-3"), "SRE-3")
+        params = mock_get.call_args_list[1].kwargs["params"]
+        self.assertEqual(params["startAt"], 2)
+        self.assertTrue(params["jql"].startswith('project = "SRE" AND labels = "causely-alert"'))
+
+    @patch("causely_notification.jira.requests.get")
+    @patch("causely_notification.jira.requests.post")
+    def test_rebuilt_index_finds_issues_of_any_object_id(self, mock_post, mock_get):
+        object_ids = ["rc 1", "rc_1", "rc%201", "rc-1"]
+        labels = [root_cause_label(object_id) for object_id in object_ids]
+        self.assertEqual(len(set(labels)), len(object_ids))
+        self.assertTrue(all(" " not in label for label in labels))
+
+        mock_get.return_value = _response(200, {"total": 4, "issues": [
+            {"key": f"SRE-{i}", "fields": {"labels": ["causely-alert", label]}} for i, label in enumerate(labels)
+        ]})
+        rebuild_jira_index(JIRA_URL, "token", "SRE", self.index)
+        self.assertEqual([self.index.get(object_id) for object_id in object_ids], ["SRE-0", "SRE-1", "SRE-2", "SRE-3"])
+
+        # A later event of the root cause comments on its issue instead of creating another one
+        mock_post.return_value = _response(201, {"id": "1"})
+        self._forward({**LIFECYCLE_PAYLOAD, "type": "ProblemUpdated", "objectId": "rc 1"})
+        self.assertEqual(mock_post.call_args.args[0], f"{JIRA_URL}/rest/api/2/issue/SRE-0/comment")
+
+
+class TestJiraBulkCreate(unittest.TestCase):
+
+    def _items(self, count):
+        return [(JIRA_URL, "token", {"fields": {"summary": f"issue {i}"}}) for i in range(count)]
+
+    @patch("causely_notification.jira.requests.post")
+    def test_item_errors_are_mapped_to_their_delivery(self, mock_post):
+        mock_post.return_value = _response(201, {
+            "issues": [{"id": "1", "key": "OPS-1"}, {"id": "3", "key": "OPS-3"}],
+            "errors": [{"status": 400, "failedElementNumber": 1, "elementErrors": {"errors": {"summary": "invalid"}}}],
+        })
+        responses = _create_issue_batch(self._items(3))
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(mock_post.call_args.args[0], f"{JIRA_URL}/rest/api/2/issue/bulk")
+        sent = json.loads(mock_post.call_args.kwargs["data"])["issueUpdates"]
+        self.assertEqual([issue["fields"]["summary"] for issue in sent], ["issue 0", "issue 1", "issue 2"])
+        self.assertEqual([response.status_code for response in responses], [201, 400, 201])
+        self.assertEqual(responses[0].json()["key"], "OPS-1")
+        self.assertIn("invalid", responses[1].text)
+        self.assertEqual(responses[2].json()["key"], "OPS-3")
+
+    @patch("causely_notification.jira.requests.post")
+    def test_failed_bulk_call_fails_every_delivery(self, mock_post):
+        mock_post.return_value = _response(503, None)
+        responses = _create_issue_batch(self._items(2))
+        self.assertEqual([response.status_code for response in responses], [503, 503])
+
+    @patch("causely_notification.jira.requests.post")
+    def test_lone_issue_is_created_with_the_issue_api(self, mock_post):
+        mock_post.return_value = _response(201, {"id": "1", "key": "OPS-1"})
+        responses = _create_issue_batch(self._items(1))
+        self.assertEqual(mock_post.call_args.args[0], f"{JIRA_URL}/rest/api/2/issue")
+        self.assertIs(responses[0], mock_post.return_value)
+
+    @patch("causely_notification.jira.requests.post")
+    def test_concurrent_detections_share_one_bulk_call(self, mock_post):
+        mock_post.return_value = _response(201, {"issues": [{"key": f"SRE-{i}"} for i in range(3)], "errors": []})
+        index = ObjectIndex()
+        batchers = MicroBatchers(lambda key: MicroBatcher(_create_issue_batch, 3, window=10))
+        responses = [None] * 3
+
+        def forward(i):
+            payload = {**LIFECYCLE_PAYLOAD, "objectId": f"rc-{i}"}
+            responses[i] = forward_to_jira_issue(payload, render_jira_body(payload), JIRA_URL, "token", "SRE", index)
+
+        with patch("causely_notification.jira.jira_batchers", batchers):
+            threads = [threading.Thread(target=forward, args=(i,)) for i in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertTrue(all(response.status_code == 201 for response in responses))
+        # Each root cause is indexed with the issue created for it
+        sent = json.loads(mock_post.call_args.kwargs["data"])["issueUpdates"]
+        for position, issue in enumerate(sent):
+            label = issue["fields"]["labels"][-1]
+            self.assertEqual(index.get(label[len("causely-root-cause-"):]), f"SRE-{position}")
@@ -0,0 +1,140 @@
+# Tests for causely_notification.message_templates (compiled Jinja2 message templates)
+from __future__ import annotations
+
+import copy
+import json
+import os
+import tempfile
+import unittest
+
+from causely_notification.message_templates import DEFAULT_TEMPLATES
+from causely_notification.message_templates import MESSAGE_BUDGETS
+from causely_notification.message_templates import MessageBudget
+from causely_notification.message_templates import MessageTemplates
+from causely_notification.message_templates import SAMPLE_PAYLOAD
+from causely_notification.message_templates import template_context
+from causely_notification.message_templates import TemplateContexts
+from causely_notification.slack import MAX_BLOCKS
+
+# The expected body of each built-in template, in golden/<hook type>/<case>.json.
+# Run with UPDATE_GOLDEN=1 to write the bodies rendered by the current templates instead of checking them.
+GOLDEN_DIRECTORY = os.path.join(os.path.dirname(__file__), "golden")
+
+
+def _many_slos_payload(count, type_="ProblemDetected"):
+    payload = copy.deepcopy(SAMPLE_PAYLOAD)
+    payload["type"] = type_
+    slo = payload["slos"][0]
+    payload["slos"] = [
+        {**slo, "slo_entity": {**slo["slo_entity"], "name": f"slo-{i}"}}
+        for i in range(count)
+    ]
+    return payload
+
+
+def _partial_payload(type_):
+    """A payload without a link, with one remediation option and an SLO with an unknown status."""
+    payload = copy.deepcopy(SAMPLE_PAYLOAD)
+    payload["type"] = type_
+    del payload["link"]
+    payload["description"]["remediationOptions"] = payload["description"]["remediationOptions"][:1]
+    payload["slos"].append({"status": "DEGRADED_BADLY", "slo_entity": {"name": 'quote " and \\ backslash'}})
+    return payload
+
+
+def _cases():
+    """(golden case, payload) pairs covering the optional sections of the messages. Updates render as detections."""
+    states = (("ProblemDetected", "detected"), ("ProblemUpdated", "detected"), ("ProblemCleared", "cleared"))
+    for type_, state in states:
+        yield state, {**SAMPLE_PAYLOAD, "type": type_}
+        yield f"minimal_{state}", {"type": type_, "name": "Minimal", "severity": "Low"}
+        yield f"partial_{state}", _partial_payload(type_)
+        yield f"many_slos_{state}", _many_slos_payload(300, type_)
+
+
+class TestMessageTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.templates = MessageTemplates()
+
+    def test_builtin_templates_match_golden_bodies(self):
+        update = os.environ.get("UPDATE_GOLDEN")
+        for hook_type, name in DEFAULT_TEMPLATES.items():
+            for case, payload in _cases():
+                path = os.path.join(GOLDEN_DIRECTORY, hook_type, f"{case}.json")
+                with self.subTest(template=name, case=case, type=payload["type"]):
+                    context = template_context(payload, MESSAGE_BUDGETS[hook_type])
+                    rendered = json.loads(self.templates.render(name, context))
+                    if update:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        with open(path, "w") as f:
+                            json.dump(rendered, f, indent=2, ensure_ascii=False)
+                            f.write("\n")
+                    with open(path) as f:
+                        self.assertEqual(rendered, json.load(f))
+
+    def test_slack_message_stays_within_block_limit(self):
+        context = template_context(_many_slos_payload(300), MESSAGE_BUDGETS["slack"])
+        blocks = json.loads(self.templates.render("slack.json.j2", context))["blocks"]
+        self.assertLessEqual(len(blocks), MAX_BLOCKS)
+        overflow = [block for block in blocks if block["type"] == "context"]
+        self.assertEqual(overflow[0]["elements"][0]["text"], f"+262 more SLOs <{SAMPLE_PAYLOAD['link']}|View all>")
+
+    def test_texts_are_truncated_to_budget(self):
+        payload = copy.deepcopy(SAMPLE_PAYLOAD)
+        payload["description"]["summary"] = "x" * 5000
+        context = template_context(payload, MessageBudget(max_slos=0, max_text_length=200))
+        self.assertEqual(len(context["summary"]), 200)
+        self.assertTrue(context["summary"].endswith("…"))
+        self.assertEqual(context["slos"], [])
+        self.assertEqual(context["slos_omitted"], len(SAMPLE_PAYLOAD["slos"]))
+
+    def test_budget_reduces_slos_then_text(self):
+        budget = MessageBudget(max_slos=1, max_text_length=400)
+        self.assertEqual(budget.reduce(), MessageBudget(max_slos=0, max_text_length=400))
+        self.assertEqual(budget.reduce().reduce(), MessageBudget(max_slos=0, max_text_length=200))
+        self.assertFalse(MessageBudget(max_slos=0, max_text_length=100).reducible())
+
+    def test_budgets_a_payload_fits_share_its_context(self):
+        contexts = TemplateContexts(SAMPLE_PAYLOAD)
+        shared = contexts.get(MESSAGE_BUDGETS["slack"])
+        for budget in MESSAGE_BUDGETS.values():
+            self.assertIs(contexts.get(budget), shared)
+            self.assertEqual(template_context(SAMPLE_PAYLOAD, budget), shared)
+        contexts = TemplateContexts(_many_slos_payload(300))
+        self.assertEqual(len({id(contexts.get(budget)) for budget in MESSAGE_BUDGETS.values()}), 4)
+        slack_slos = contexts.get(MESSAGE_BUDGETS["slack"])["slos"]
+        self.assertIs(contexts.get(MESSAGE_BUDGETS["jira"])["slos"][0], slack_slos[0])
+
+    def test_contexts_format_the_timestamp_per_webhook(self):
+        contexts = TemplateContexts(SAMPLE_PAYLOAD)
+        context = contexts.get(MESSAGE_BUDGETS["jira"], "Europe/Berlin", "%H:%M")
+        self.assertEqual(context["timestamp"], "20:51")
+        default = contexts.get(MESSAGE_BUDGETS["jira"])
+        self.assertEqual(default["timestamp"], template_context(SAMPLE_PAYLOAD)["timestamp"])
+
+    def test_templates_are_compiled_once(self):
+        template = self.templates.get("slack.json.j2")
+        self.assertIs(self.templates.get("slack.json.j2"), template)
+
+    def test_directory_overrides_builtin_template(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "slack.json.j2"), "w") as f:
+                f.write('{"text": {{ ("Root cause: " ~ payload.get("name"))|json }} }')
+            templates = MessageTemplates(directory)
+        rendered = templates.render("slack.json.j2", template_context(SAMPLE_PAYLOAD))
+        self.assertEqual(json.loads(rendered), {"text": "Root cause: Malfunction"})
+
+    def test_invalid_templates_raise(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "broken.json.j2"), "w") as f:
+                f.write('{"text": {{ payload.get("name") }} }')
+            templates = MessageTemplates(directory)
+            with self.assertRaises(ValueError):
+                templates.load(["broken.json.j2"])
+            with self.assertRaises(ValueError):
+                templates.load(["missing.json.j2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
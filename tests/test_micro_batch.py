@@ -0,0 +1,81 @@
+# Tests for causely_notification.micro_batch (batching the calls of concurrent notifications)
+from __future__ import annotations
+
+import threading
+import unittest
+
+from causely_notification.micro_batch import MicroBatcher
+from causely_notification.micro_batch import MicroBatchers
+
+
+def _submit_together(batcher, items):
+    """Submit items from one thread each and return their results or exceptions, in order."""
+    results = [None] * len(items)
+
+    def submit(i):
+        try:
+            results[i] = batcher.submit(items[i])
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_full_batch_is_sent_once(self):
+        sent = []
+
+        def send(items):
+            sent.append(list(items))
+            return [item * 10 for item in items]
+
+        # The window is long, so only a full batch is sent before the test times out
+        batcher = MicroBatcher(send, max_items=4, window=10)
+        results = _submit_together(batcher, [1, 2, 3, 4])
+
+        self.assertEqual(results, [10, 20, 30, 40])
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(sorted(sent[0]), [1, 2, 3, 4])
+        self.assertEqual(batcher.stats(), {"batches": 1, "items": 4, "largest": 4})
+
+    def test_lone_item_is_sent_after_the_window(self):
+        batcher = MicroBatcher(lambda items: [item.upper() for item in items], max_items=10, window=0.01)
+        self.assertEqual(batcher.submit("a"), "A")
+        self.assertEqual(batcher.submit("b"), "B")
+        self.assertEqual(batcher.stats()["batches"], 2)
+
+    def test_item_errors_are_raised_in_their_thread(self):
+        def send(items):
+            return [ValueError(item) if item < 0 else item for item in items]
+
+        batcher = MicroBatcher(send, max_items=3, window=10)
+        results = _submit_together(batcher, [1, -2, 3])
+
+        self.assertEqual(results[0], 1)
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], 3)
+
+    def test_send_failure_fails_every_item(self):
+        def send(items):
+            raise RuntimeError("unavailable")
+
+        batcher = MicroBatcher(send, max_items=2, window=10)
+        results = _submit_together(batcher, [1, 2])
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+    def test_batchers_are_kept_per_key(self):
+        batchers = MicroBatchers(lambda key: MicroBatcher(lambda items: items, max_items=1))
+        self.assertIs(batchers.get("a"), batchers.get("a"))
+        self.assertIsNot(batchers.get("a"), batchers.get("b"))
+        batchers.get("a").submit(1)
+        self.assertEqual(batchers.stats(), {"batches": 1, "items": 1, "largest": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
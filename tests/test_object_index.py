@@ -0,0 +1,127 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""
+This class is used to test the objectId indexes in object_index.py.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from causely_notification.object_index import ObjectIndex
+from causely_notification.object_index import ObjectIndexes
+
+
+class TestObjectIndex(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        index = ObjectIndex(size=2)
+        index.put("a", "1")
+        index.put("b", "2")
+        index.get("a")
+        index.put("c", "3")
+        self.assertEqual(index.get("a"), "1")
+        self.assertIsNone(index.get("b"))
+        self.assertEqual(len(index), 2)
+
+    def test_persists_across_instances(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "slack.json")
+            index = ObjectIndex(path)
+            index.put("a", "1")
+            index.put("b", "2")
+            index.remove("a")
+            self.assertTrue(index.flush())
+            self.assertFalse(index.flush())
+
+            reloaded = ObjectIndex(path)
+            self.assertIsNone(reloaded.get("a"))
+            self.assertEqual(reloaded.get("b"), "2")
+
+    def test_unreadable_file_starts_empty(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "slack.json")
+            with open(path, "w") as f:
+                f.write("not json")
+            index = ObjectIndex(path)
+            self.assertEqual(len(index), 0)
+            index.put("a", "1")
+            index.flush()
+            self.assertEqual(ObjectIndex(path).get("a"), "1")
+
+    def test_indexes_are_per_webhook(self):
+        with tempfile.TemporaryDirectory() as directory:
+            indexes = ObjectIndexes(directory)
+            self.assertIs(indexes.get("slack ops"), indexes.get("slack ops"))
+            indexes.get("slack ops").put("a", "1")
+            self.assertIsNone(indexes.get("slack dev").get("a"))
+            indexes.stop()
+            self.assertTrue(os.path.exists(os.path.join(directory, "slack%20ops.json")))
+            self.assertEqual(indexes.stats(), {"slack ops": 1, "slack dev": 0})
+
+    def test_webhook_names_never_share_a_file(self):
+        names = ["team/a", "team_a", "team a", "team%2Fa", "../a"]
+        with tempfile.TemporaryDirectory() as directory:
+            indexes = ObjectIndexes(directory)
+            for i, name in enumerate(names):
+                indexes.get(name).put("rc-1", str(i))
+            indexes.stop()
+            self.assertEqual(len(os.listdir(directory)), len(names))
+            reloaded = ObjectIndexes(directory)
+            self.assertEqual([reloaded.get(name).get("rc-1") for name in names], ["0", "1", "2", "3", "4"])
+            reloaded.stop()
+
+    def test_changes_are_written_once_per_flush(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "jira.json")
+            index = ObjectIndex(path)
+            with patch.object(index, "_save", wraps=index._save) as save:
+                for i in range(100):
+                    index.put(f"rc-{i}", f"OPS-{i}")
+                index.remove("rc-0")
+                self.assertFalse(os.path.exists(path))
+                index.flush()
+                self.assertEqual(save.call_count, 1)
+            self.assertEqual(len(ObjectIndex(path)), 99)
+
+    def test_changes_are_written_in_the_background(self):
+        with tempfile.TemporaryDirectory() as directory:
+            indexes = ObjectIndexes(directory, flush_interval=0.01)
+            indexes.get("jira").put("rc-1", "OPS-1")
+            path = os.path.join(directory, "jira.json")
+            for _ in range(500):
+                if os.path.exists(path):
+                    break
+                time.sleep(0.01)
+            indexes.stop()
+            self.assertEqual(ObjectIndex(path).get("rc-1"), "OPS-1")
+
+    def test_failed_write_is_retried(self):
+        with tempfile.TemporaryDirectory() as directory:
+            index = ObjectIndex(os.path.join(directory, "missing", "jira.json"))
+            index.put("rc-1", "OPS-1")
+            self.assertFalse(index.flush())
+            os.mkdir(os.path.join(directory, "missing"))
+            self.assertTrue(index.flush())
+
+
+if __name__ == "__main__":
+    unittest.main()
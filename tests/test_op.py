@@ -76,3 +76,50 @@ class TestOperator(unittest.TestCase):
             "Operator 'not_in' requires a list",
             str(context.exception),
         )
+
+    def test_compile_equals_operator(self):
+        # Test that a compiled equals predicate binds the target value
+        predicate = Operator("equals").compile(5)
+        self.assertTrue(predicate(5))
+        self.assertFalse(predicate(6))
+
+    def test_compile_in_operator_uses_frozenset_semantics(self):
+        # Test that compiled in/not_in predicates behave like apply
+        in_predicate = Operator("in").compile(["apple", "banana"])
+        not_in_predicate = Operator("not_in").compile(["apple", "banana"])
+        self.assertTrue(in_predicate("apple"))
+        self.assertFalse(in_predicate("cherry"))
+        self.assertFalse(not_in_predicate("apple"))
+        self.assertTrue(not_in_predicate("cherry"))
+        # Unhashable field values never match hashable members
+        self.assertFalse(in_predicate({"a": 1}))
+        self.assertTrue(not_in_predicate({"a": 1}))
+
+    def test_compile_in_operator_with_invalid_type(self):
+        # Test that the value is validated when compiling, not when applying
+        with self.assertRaises(ValueError) as context:
+            Operator("not_in").compile("not a list")
+        self.assertIn(
+            "Operator 'not_in' requires a list",
+            str(context.exception),
+        )
+
+    def test_apply_pattern_operators(self):
+        # Test the regex, prefix and glob operators and their negations
+        self.assertTrue(Operator("matches").apply("prod-orders-db", "^prod-.*-db$"))
+        self.assertFalse(Operator("not_matches").apply("prod-orders-db", "^prod-.*-db$"))
+        self.assertTrue(Operator("starts_with").apply("payments-api", "payments-"))
+        self.assertTrue(Operator("not_starts_with").apply("orders-api", "payments-"))
+        self.assertTrue(Operator("glob").apply("payments-api", "payments-*"))
+        self.assertFalse(Operator("not_glob").apply("payments-api", "payments-*"))
+
+    def test_apply_comparison_operators(self):
+        # Test the ordinal comparison operators on severities and numbers
+        self.assertTrue(Operator("gte").apply("Critical", "High"))
+        self.assertFalse(Operator("gt").apply("High", "High"))
+        self.assertTrue(Operator("lte").apply(3, 3))
+        self.assertTrue(Operator("lt").apply("Low", "Medium"))
+        # Values that cannot be ordered do not match
+        self.assertFalse(Operator("gte").apply("Severe", "High"))
+        with self.assertRaises(ValueError):
+            Operator("gte").compile("Severe")
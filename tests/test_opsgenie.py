@@ -1,17 +1,47 @@
-# Tests for causely_notification.opsgenie (forward_to_opsgenie)
+# Tests for causely_notification.opsgenie (alerts rendered from the built-in Opsgenie template)
+from __future__ import annotations
+
+import json
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from causely_notification.delivery import default_templates
+from causely_notification.message_templates import MESSAGE_BUDGETS
+from causely_notification.message_templates import template_context
+from causely_notification.opsgenie import forward_to_opsgenie_alert
+from causely_notification.opsgenie import OpsgenieRequests
+
+OPSGENIE_URL = "https://api.opsgenie.com/v2/alerts"
+
+ALERT_PAYLOAD = {
+    "name": "Malfunction",
+    "type": "ProblemDetected",
+    "entity": {"name": "checkout"},
+    "objectId": "rc-1",
+    "severity": "High",
+    "timestamp": "2025-08-07T18:51:54.164185287Z",
+    "description": {"summary": "High error rate"},
+}
+
 
-from causely_notification.opsgenie import forward_to_opsgenie
+def render_opsgenie_body(payload):
+    """Render the built-in Opsgenie template within the Opsgenie budget, as delivery does."""
+    context = template_context(payload, MESSAGE_BUDGETS["opsgenie"])
+    return json.loads(default_templates().render("opsgenie.json.j2", context))
+
+
+def _accepted(request_id):
+    response = MagicMock(status_code=202)
+    response.json.return_value = {"result": "Request will be processed", "requestId": request_id}
+    return response
 
 
 class TestForwardToOpsgenie(unittest.TestCase):
 
     @patch("causely_notification.opsgenie.requests.post")
     def test_forward_to_opsgenie_detected(self, mock_post):
-        mock_response = MagicMock()
-        mock_response.status_code = 202
-        mock_post.return_value = mock_response
+        mock_post.return_value = _accepted("r-1")
 
         payload = {
             "link": "https://portal.staging.causely.app/rootCauses/d76f027d-e697-46ed-8a2c-f16356a97ceb",
@@ -35,28 +65,23 @@ class TestForwardToOpsgenie(unittest.TestCase):
         url = "https://api.opsgenie.com/v2/alerts"
         api_key = "fake-opsgenie-key"
 
-        response = forward_to_opsgenie(payload, url, api_key)
+        response = forward_to_opsgenie_alert(payload, render_opsgenie_body(payload), url, api_key, OpsgenieRequests())
 
         self.assertEqual(response.status_code, 202)
         self.assertEqual(mock_post.call_count, 1)
         call_url = mock_post.call_args[0][0]
         self.assertEqual(call_url, url)
-        body = mock_post.call_args[1]["json"]
+        body = json.loads(mock_post.call_args[1]["data"])
         self.assertIn("message", body)
         self.assertIn("Malfunction", body["message"])
         self.assertIn("Root Cause Identified", body["message"])
-        self.assertEqual(body["priority"], "CRITICAL")
+        self.assertEqual(body["priority"], "P1")
         self.assertIn("description", body)
         self.assertIn("The HTTP path is experiencing", body["description"])
         headers = mock_post.call_args[1]["headers"]
         self.assertEqual(headers["Authorization"], "GenieKey fake-opsgenie-key")
 
-    @patch("causely_notification.opsgenie.requests.post")
-    def test_forward_to_opsgenie_cleared(self, mock_post):
-        mock_response = MagicMock()
-        mock_response.status_code = 202
-        mock_post.return_value = mock_response
-
+    def test_opsgenie_cleared_body(self):
         payload = {
             "name": "Congested",
             "type": "ProblemCleared",
@@ -65,13 +90,90 @@ class TestForwardToOpsgenie(unittest.TestCase):
             "timestamp": "2025-08-07T19:00:00Z",
             "description": {"summary": "Issue resolved."}
         }
-        url = "https://api.opsgenie.com/v2/alerts"
-        api_key = "fake-key"
+        body = render_opsgenie_body(payload)
+        self.assertIn("Root Cause Cleared", body["message"])
+        self.assertIn("Congested", body["message"])
+        self.assertEqual(body["priority"], "P4")
+
+
+class TestOpsgenieAlertLifecycle(unittest.TestCase):
 
-        response = forward_to_opsgenie(payload, url, api_key)
+    def setUp(self):
+        self.tracker = OpsgenieRequests()
+
+    def _forward(self, payload):
+        return forward_to_opsgenie_alert(payload, render_opsgenie_body(payload), OPSGENIE_URL, "key", self.tracker)
+
+    @patch("causely_notification.opsgenie.requests.post")
+    def test_detection_creates_alert_with_alias(self, mock_post):
+        mock_post.return_value = _accepted("r-1")
+        response = self._forward(ALERT_PAYLOAD)
 
         self.assertEqual(response.status_code, 202)
-        body = mock_post.call_args[1]["json"]
-        self.assertIn("Root Cause Cleared", body["message"])
-        self.assertIn("Congested", body["message"])
-        self.assertEqual(body["priority"], "LOW")
+        self.assertEqual(mock_post.call_args.args[0], OPSGENIE_URL)
+        self.assertEqual(json.loads(mock_post.call_args.kwargs["data"])["alias"], "rc-1")
+        self.assertEqual(mock_post.call_args.kwargs["headers"]["Authorization"], "GenieKey key")
+        self.assertEqual(self.tracker.stats()["pending"], 1)
+
+    @patch("causely_notification.opsgenie.requests.put")
+    @patch("causely_notification.opsgenie.requests.post")
+    def test_update_changes_priority(self, mock_post, mock_put):
+        mock_post.return_value = _accepted("r-1")
+        mock_put.return_value = _accepted("r-2")
+        self._forward({**ALERT_PAYLOAD, "type": "ProblemUpdated", "severity": "Critical", "old_severity": "High"})
+
+        self.assertEqual(mock_post.call_args.args[0], OPSGENIE_URL)
+        self.assertEqual(mock_put.call_args.args[0], f"{OPSGENIE_URL}/rc-1/priority?identifierType=alias")
+        self.assertEqual(json.loads(mock_put.call_args.kwargs["data"]), {"priority": "P1"})
+        self.assertEqual(self.tracker.stats()["pending"], 2)
+
+    @patch("causely_notification.opsgenie.requests.post")
+    def test_clear_closes_alert(self, mock_post):
+        mock_post.return_value = _accepted("r-1")
+        self._forward({**ALERT_PAYLOAD, "type": "ProblemCleared", "objectId": "rc 1/a"})
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(mock_post.call_args.args[0], f"{OPSGENIE_URL}/rc%201%2Fa/close?identifierType=alias")
+        self.assertEqual(json.loads(mock_post.call_args.kwargs["data"]), {"note": "Root Cause Cleared: Malfunction"})
+
+    @patch("causely_notification.opsgenie.requests.post")
+    def test_payload_without_object_id_creates_alert(self, mock_post):
+        mock_post.return_value = _accepted("r-1")
+        payload = {key: value for key, value in ALERT_PAYLOAD.items() if key != "objectId"}
+        self._forward({**payload, "type": "ProblemCleared"})
+
+        self.assertEqual(mock_post.call_args.args[0], OPSGENIE_URL)
+        self.assertNotIn("alias", json.loads(mock_post.call_args.kwargs["data"]))
+
+
+class TestOpsgenieRequests(unittest.TestCase):
+
+    @patch("causely_notification.opsgenie.requests.get")
+    def test_poll_records_request_status(self, mock_get):
+        tracker = OpsgenieRequests(max_polls=2)
+        for request_id in ("ok", "failed", "unknown"):
+            tracker.track(request_id, OPSGENIE_URL, "key", "create")
+        statuses = {
+            f"{OPSGENIE_URL}/requests/ok": (200, {"data": {"isSuccess": True, "status": "Created alert"}}),
+            f"{OPSGENIE_URL}/requests/failed": (200, {"data": {"isSuccess": False, "status": "Alert does not exist"}}),
+            f"{OPSGENIE_URL}/requests/unknown": (404, {"message": "Request not found"}),
+        }
+
+        def get(url, **kwargs):
+            status_code, body = statuses[url]
+            response = MagicMock(status_code=status_code)
+            response.json.return_value = body
+            return response
+        mock_get.side_effect = get
+
+        tracker.poll()
+        self.assertEqual(tracker.stats(), {"pending": 1, "succeeded": 1, "failed": 1, "dropped": 0})
+        tracker.poll()
+        self.assertEqual(tracker.stats(), {"pending": 0, "succeeded": 1, "failed": 1, "dropped": 1})
+
+    def test_oldest_requests_are_dropped_when_full(self):
+        tracker = OpsgenieRequests(size=2)
+        for request_id in ("r-1", "r-2", "r-3"):
+            tracker.track(request_id, OPSGENIE_URL, "key", "create")
+        self.assertEqual(tracker.stats()["pending"], 2)
+        self.assertEqual(tracker.stats()["dropped"], 1)
@@ -0,0 +1,125 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This class is used to test the pattern operators and the shared prefix trie in patterns.py.
+"""
+from __future__ import annotations
+
+import unittest
+
+from causely_notification.filter import WebhookFilterStore
+from causely_notification.patterns import compile_pattern_test
+from causely_notification.patterns import compile_regex
+from causely_notification.patterns import glob_literal_prefix
+from causely_notification.patterns import PrefixTrie
+from causely_notification.patterns import regex_literal_prefix
+
+
+class TestLiteralPrefixes(unittest.TestCase):
+    def test_regex_literal_prefix(self):
+        self.assertEqual(regex_literal_prefix("^prod-.*-db$"), "prod-")
+        self.assertEqual(regex_literal_prefix(r"^istio\.system/.*"), "istio.system/")
+        self.assertEqual(regex_literal_prefix("^payments?-api"), "payment")
+        self.assertEqual(regex_literal_prefix(r"^team\d+"), "team")
+        # Unanchored patterns and alternations have no literal prefix
+        self.assertEqual(regex_literal_prefix("prod-.*"), "")
+        self.assertEqual(regex_literal_prefix("^prod|^stage"), "")
+
+    def test_glob_literal_prefix(self):
+        self.assertEqual(glob_literal_prefix("payments-*"), "payments-")
+        self.assertEqual(glob_literal_prefix("*-db"), "")
+        self.assertEqual(glob_literal_prefix("exact"), "exact")
+
+    def test_regex_cache_is_shared(self):
+        self.assertIs(compile_regex("^prod-.*$"), compile_regex("^prod-.*$"))
+
+
+class TestPrefixTrie(unittest.TestCase):
+    def test_prefixes_of(self):
+        trie = PrefixTrie()
+        for prefix in ["pay", "payments-", "prod-", "payments-api"]:
+            trie.add(prefix)
+        self.assertEqual(trie.prefixes_of("payments-api-v2"), {"pay", "payments-", "payments-api"})
+        self.assertEqual(trie.prefixes_of("prod-db"), {"prod-"})
+        self.assertEqual(trie.prefixes_of("stage-db"), frozenset())
+
+
+class TestCompilePatternTest(unittest.TestCase):
+    def test_operators_with_and_without_trie(self):
+        cases = [
+            ("starts_with", "payments-", "payments-api", True),
+            ("starts_with", "payments-", "orders-api", False),
+            ("matches", "^prod-.*-db$", "prod-orders-db", True),
+            ("matches", "^prod-.*-db$", "prod-orders-cache", False),
+            ("matches", "-db$", "prod-orders-db", True),
+            ("glob", "payments-*", "payments-api", True),
+            ("glob", "payments-*", "Payments-api", False),
+            ("glob", "*-db", "prod-db", True),
+            ("not_starts_with", "payments-", "payments-api", False),
+            ("not_matches", "^prod-.*-db$", "stage-orders-db", True),
+            ("not_glob", "payments-*", "orders-api", True),
+        ]
+        for operator, pattern, value, expected in cases:
+            self.assertEqual(compile_pattern_test(operator, pattern)(value), expected, (operator, pattern, value))
+            trie = PrefixTrie()
+            self.assertEqual(compile_pattern_test(operator, pattern, trie)(value), expected, (operator, pattern, value))
+
+    def test_non_string_pattern_is_rejected(self):
+        with self.assertRaises(ValueError):
+            compile_pattern_test("matches", ["^prod"])
+
+    def test_invalid_regex_is_rejected(self):
+        with self.assertRaises(ValueError):
+            compile_pattern_test("not_matches", "^prod-(")
+
+
+class TestPatternFilters(unittest.TestCase):
+    def test_invalid_regex_names_webhook_field_and_pattern(self):
+        store = WebhookFilterStore()
+        with self.assertRaises(ValueError) as raised:
+            store.add_webhook_filters("prod-db", [
+                {"any": [{"field": "entity.name", "operator": "matches", "value": "^prod-(.*-db$"}]},
+            ], enabled=True)
+        message = str(raised.exception)
+        for part in ("prod-db", "entity.name", "^prod-(.*-db$"):
+            self.assertIn(part, message)
+        self.assertNotIn("prod-db", store.webhook_filters)
+
+    def test_store_routes_by_entity_name_patterns(self):
+        store = WebhookFilterStore()
+        store.add_webhook_filters("payments", [
+            {"field": "entity.name", "operator": "glob", "value": "payments-*"},
+        ], enabled=True)
+        store.add_webhook_filters("prod-db", [
+            {"field": "entity.name", "operator": "matches", "value": "^prod-.*-db$"},
+        ], enabled=True)
+        store.add_webhook_filters("not-payments", [
+            {"field": "entity.name", "operator": "not_starts_with", "value": "payments-"},
+        ], enabled=True)
+
+        self.assertEqual(store.filter_payload({"entity": {"name": "payments-api"}}), ["payments"])
+        self.assertEqual(store.filter_payload({"entity": {"name": "prod-orders-db"}}), ["prod-db", "not-payments"])
+        self.assertEqual(store.filter_payload({"entity": {"name": "stage-api"}}), ["not-payments"])
+        # The literal prefixes of all webhooks share one trie for the field
+        self.assertEqual(
+            store.pattern_index.trie_for("entity.name").prefixes_of("payments-api"),
+            {"payments-"},
+        )
+        self.assertEqual(
+            store.filter_many([{"entity": {"name": "payments-api"}}, {"entity": {"name": "prod-orders-db"}}]),
+            [["payments"], ["prod-db", "not-payments"]],
+        )
@@ -1,28 +1,21 @@
 # Tests for causely_notification.server (webhook routing, filters, payload forwarding)
+from __future__ import annotations
+
+import json
 import os
 import textwrap
+from unittest.mock import MagicMock
+from unittest.mock import Mock
+from unittest.mock import patch
 
 import pytest
 import yaml
-from unittest.mock import patch, Mock, MagicMock
-
-# Set env vars before importing server (server uses them for URL lookup)
-os.environ["AUTH_TOKEN"] = "test-token"
-
-# Single-webhook-per-backend for parameterized tests (name "slack-test" -> URL_SLACK-TEST)
-os.environ["URL_SLACK-TEST"] = "http://test_slack"
-os.environ["URL_TEAMS-TEST"] = "http://test_teams"
-os.environ["URL_JIRA-TEST"] = "http://test_jira"
-os.environ["URL_OPSGENIE-TEST"] = "http://test_opsgenie"
-os.environ["URL_GITHUB-TEST"] = "test_owner/test_repo"
-
-# Multi-webhook config (existing slack-only) for filter/scenario tests
-os.environ["URL_SLACK-SEVERITY"] = "http://test_slack"
-os.environ["URL_SLACK-MALFUNCTION-SLO"] = "http://test_slack"
-os.environ["URL_SLACK-ALL-ALERTS"] = "http://test_slack"
 
 from causely_notification import server
-from causely_notification.server import app, populate_webhooks
+from causely_notification.github import issue_indexes as github_issue_indexes
+from causely_notification.object_index import ObjectIndexes
+from causely_notification.server import app
+from causely_notification.server import populate_webhooks
 
 BACKENDS = ["slack", "teams", "jira", "opsgenie", "github"]
 
@@ -35,6 +28,10 @@ BACKEND_SUCCESS_STATUS = {
     "github": 201,
 }
 
+# Response body of a created Jira issue
+JIRA_ISSUE = {"id": "10000", "key": "OPS-1"}
+
+
 def _expected_url(hook_type: str) -> str:
     # Webhook name is "{hook_type}-test" -> normalized URL_{HOOK_TYPE}-TEST
     key = f"URL_{hook_type.upper()}-TEST"
@@ -253,6 +250,9 @@ def _setup_webhooks(yaml_str: str):
     filter_store, webhook_lookup_map = populate_webhooks(webhooks)
     server.filter_store = filter_store
     server.webhook_lookup_map = webhook_lookup_map
+    # No Slack thread or Jira issue is carried over from another test
+    server.object_indexes = ObjectIndexes()
+    github_issue_indexes.clear()
 
 
 @patch("requests.request")
@@ -273,7 +273,7 @@ def test_webhook_posts_expected_payload(mock_post, mock_request, hook_type):
         ]
     else:
         mock_request.return_value = MagicMock(ok=True, status_code=200)
-    mock_post.return_value = Mock(status_code=BACKEND_SUCCESS_STATUS[hook_type], content=b"ok")
+    mock_post.return_value = Mock(status_code=BACKEND_SUCCESS_STATUS[hook_type], content=b"ok", json=lambda: JIRA_ISSUE)
     yaml_str = _one_webhook_config(hook_type, filters_enabled=False)
     _setup_webhooks(yaml_str)
     client = app.test_client()
@@ -287,10 +287,11 @@ def test_webhook_posts_expected_payload(mock_post, mock_request, hook_type):
         assert mock_post.call_args_list[0].args[0] == _expected_url(hook_type)
 
 
+@patch("requests.put")
 @patch("requests.request")
 @patch("requests.post")
 @pytest.mark.parametrize("hook_type", BACKENDS)
-def test_webhook_posts_expected_payload2(mock_post, mock_request, hook_type):
+def test_webhook_posts_expected_payload2(mock_post, mock_request, mock_put, hook_type):
     """ProblemUpdated (severity went up): only webhooks that newly match are notified."""
     if hook_type == "github":
         mock_request.side_effect = [
@@ -304,7 +305,9 @@ def test_webhook_posts_expected_payload2(mock_post, mock_request, hook_type):
         ]
     else:
         mock_request.return_value = MagicMock(ok=True, status_code=200)
-    mock_post.return_value = Mock(status_code=BACKEND_SUCCESS_STATUS[hook_type], content=b"ok")
+    # Opsgenie changes the priority of the alert of an updated root cause
+    mock_put.return_value = Mock(status_code=202, content=b"ok", json=lambda: {"requestId": "r-1"})
+    mock_post.return_value = Mock(status_code=BACKEND_SUCCESS_STATUS[hook_type], content=b"ok", json=lambda: JIRA_ISSUE)
     # Filter: severity in [High, Critical]. Old payload has Low, new has High -> only new matches -> 1 forward
     yaml_str = _one_webhook_config(
         hook_type,
@@ -325,10 +328,11 @@ def test_webhook_posts_expected_payload2(mock_post, mock_request, hook_type):
         assert mock_post.call_args_list[0].args[0] == _expected_url(hook_type)
 
 
+@patch("requests.put")
 @patch("requests.request")
 @patch("requests.post")
 @pytest.mark.parametrize("hook_type", BACKENDS)
-def test_webhook_posts_expected_payload3(mock_post, mock_request, hook_type):
+def test_webhook_posts_expected_payload3(mock_post, mock_request, mock_put, hook_type):
     """ProblemUpdated (severity went down): only webhooks that newly match are notified."""
     if hook_type == "github":
         mock_request.side_effect = [
@@ -342,7 +346,9 @@ def test_webhook_posts_expected_payload3(mock_post, mock_request, hook_type):
         ]
     else:
         mock_request.return_value = MagicMock(ok=True, status_code=200)
-    mock_post.return_value = Mock(status_code=BACKEND_SUCCESS_STATUS[hook_type], content=b"ok")
+    # Opsgenie changes the priority of the alert of an updated root cause
+    mock_put.return_value = Mock(status_code=202, content=b"ok", json=lambda: {"requestId": "r-1"})
+    mock_post.return_value = Mock(status_code=BACKEND_SUCCESS_STATUS[hook_type], content=b"ok", json=lambda: JIRA_ISSUE)
     # Filter: severity in [Low]. Old payload has High, new has Low -> only new matches -> 1 forward
     yaml_str = _one_webhook_config(
         hook_type,
@@ -369,7 +375,7 @@ def test_webhook_posts_expected_payload3(mock_post, mock_request, hook_type):
 def test_webhook_posts_expected_payload4(mock_post, mock_request, hook_type):
     """ProblemUpdated (severity unchanged) does not forward."""
     mock_request.return_value = MagicMock(ok=True, status_code=200)
-    mock_post.return_value = Mock(status_code=BACKEND_SUCCESS_STATUS[hook_type], content=b"ok")
+    mock_post.return_value = Mock(status_code=BACKEND_SUCCESS_STATUS[hook_type], content=b"ok", json=lambda: JIRA_ISSUE)
     yaml_str = _one_webhook_config(hook_type, filters_enabled=False)
     _setup_webhooks(yaml_str)
     client = app.test_client()
@@ -388,12 +394,12 @@ def test_webhook_posts_expected_payload4(mock_post, mock_request, hook_type):
 @pytest.mark.parametrize("hook_type", BACKENDS)
 def test_webhook_posts_expected_payload_filtered(mock_post, mock_request, hook_type):
     """Payload matching label filter is forwarded to the configured backend."""
-    # test_payload_for_filters is ProblemCleared; GitHub ignores it (no API calls)
+    # test_payload_for_filters is ProblemCleared; GitHub only looks for an issue to close
     if hook_type == "github":
         mock_request.return_value = MagicMock(ok=True, status_code=200, json=lambda: [])
     else:
         mock_request.return_value = MagicMock(ok=True, status_code=200)
-    mock_post.return_value = Mock(status_code=BACKEND_SUCCESS_STATUS[hook_type], content=b"ok")
+    mock_post.return_value = Mock(status_code=BACKEND_SUCCESS_STATUS[hook_type], content=b"ok", json=lambda: JIRA_ISSUE)
     yaml_str = _one_webhook_config(
         hook_type,
         filters_enabled=True,
@@ -412,8 +418,18 @@ def test_webhook_posts_expected_payload_filtered(mock_post, mock_request, hook_t
     )
     assert resp.status_code == 200
     if hook_type == "github":
-        # GitHub returns 200 for ProblemCleared without calling create; no list issues either
-        assert mock_request.call_count == 0
+        # No open issue for the root cause: the open issues are listed and nothing is closed
+        assert mock_request.call_count == 1
+        assert mock_request.call_args_list[0].args[0] == "GET"
+    elif hook_type == "jira":
+        # A cleared root cause without an open Jira issue creates none
+        assert mock_post.call_count == 0
+    elif hook_type == "opsgenie":
+        # The alert of the root cause is closed by its alias
+        assert mock_post.call_count == 1
+        assert mock_post.call_args_list[0].args[0] == (
+            f"{_expected_url(hook_type)}/{test_payload_for_filters['objectId']}/close?identifierType=alias"
+        )
     else:
         assert mock_post.call_count == 1
         assert mock_post.call_args_list[0].args[0] == _expected_url(hook_type)
@@ -422,9 +438,9 @@ def test_webhook_posts_expected_payload_filtered(mock_post, mock_request, hook_t
 # Multi-webhook (Slack-only) scenario tests: filter matching with two webhooks
 @patch("requests.post")
 def test_webhook_multi_slack_matching(mock_post):
-    """Two Slack webhooks with different filters; payload matches both (severity High + name Malfunction + impactsSLO)."""
+    """Two Slack webhooks with different filters; payload matches both (severity High + name Malfunction + impactsSLO).
+    Both post the same message to the same URL, so a single POST is sent and reported for both."""
     mock_post.return_value = Mock(status_code=202, content=b"ok")
-    mock_post.side_effect = [Mock(status_code=202), Mock(status_code=202)]
     _setup_webhooks(yaml_text)
     payload_both = {**test_payload, "slos": [{}]}  # impactsSLO true so slack-malfunction-slo also matches
     client = app.test_client()
@@ -432,7 +448,142 @@ def test_webhook_multi_slack_matching(mock_post):
         "/webhook", json=payload_both, headers={"Authorization": "Bearer test-token"}
     )
     assert resp.status_code == 200
-    assert mock_post.call_count == 2
+    assert b"slack-severity, slack-malfunction-slo" in resp.data
+    assert mock_post.call_count == 1
+
+
+@patch("requests.post")
+def test_webhook_problem_updated_forwards_new_severity(mock_post):
+    """The old severity is only used to find the previous matches, the forwarded payload keeps the new one."""
+    mock_post.return_value = Mock(status_code=202, content=b"ok")
+    yaml_str = _one_webhook_config(
+        "generic",
+        filters_enabled=True,
+        filter_values=[{"field": "severity", "operator": "in", "value": ["Critical"]}],
+    )
+    _setup_webhooks(yaml_str)
+    client = app.test_client()
+    payload = {**test_payload, "type": "ProblemUpdated", "severity": "Critical", "old_severity": "High"}
+    resp = client.post(
+        "/webhook", json=payload, headers={"Authorization": "Bearer test-token"}
+    )
+    assert resp.status_code == 200
+    assert mock_post.call_count == 1
+    assert json.loads(mock_post.call_args.kwargs["data"])["severity"] == "Critical"
+
+
+# A severity change of a root cause notified to every webhook, filters matching both severities
+test_payload_severity_change = {
+    **test_payload, "type": "ProblemUpdated", "severity": "Critical", "old_severity": "High"
+}
+
+
+@patch("requests.request")
+def test_webhook_problem_updated_reaches_unfiltered_github(mock_request):
+    """An unfiltered GitHub webhook matches both severities, and comments the change on the issue."""
+    issue = {
+        "number": 7,
+        "html_url": "https://github.com/test_owner/test_repo/issues/7",
+        "body": f"Causely Root Cause ID: {test_payload['objectId']}\n**Severity:** High\n",
+        "state": "open",
+    }
+    mock_request.side_effect = [
+        MagicMock(ok=True, status_code=200, content=b" ", headers={}, json=lambda: [issue]),
+        MagicMock(ok=True, status_code=201, content=b" ", headers={}, json=lambda: {"id": 1}),
+    ]
+    _setup_webhooks(_one_webhook_config("github"))
+    client = app.test_client()
+    resp = client.post(
+        "/webhook", json=test_payload_severity_change, headers={"Authorization": "Bearer test-token"}
+    )
+    assert resp.status_code == 200
+    assert mock_request.call_count == 2
+    method, url = mock_request.call_args_list[1].args
+    assert (method, url) == ("POST", "https://api.github.com/repos/test_owner/test_repo/issues/7/comments")
+    assert "from **High** to **Critical**" in mock_request.call_args_list[1].kwargs["json"]["body"]
+
+
+@patch("requests.post")
+def test_webhook_problem_updated_reaches_unfiltered_jira(mock_post):
+    """An unfiltered Jira webhook matches both severities, and comments the change on the issue."""
+    mock_post.return_value = Mock(status_code=201, content=b"ok", json=lambda: {"id": "1"})
+    _setup_webhooks(_one_webhook_config("jira"))
+    server.object_indexes.get("jira-test").put(test_payload["objectId"], "OPS-1")
+    client = app.test_client()
+    resp = client.post(
+        "/webhook", json=test_payload_severity_change, headers={"Authorization": "Bearer test-token"}
+    )
+    assert resp.status_code == 200
+    assert mock_post.call_count == 1
+    assert mock_post.call_args.args[0] == "http://test_jira/rest/api/2/issue/OPS-1/comment"
+
+
+@patch("requests.put")
+@patch("requests.post")
+def test_webhook_problem_updated_reaches_unfiltered_opsgenie(mock_post, mock_put):
+    """An unfiltered Opsgenie webhook matches both severities, and changes the priority of the alert."""
+    mock_post.return_value = Mock(status_code=202, content=b"ok", json=lambda: {"requestId": "r1"})
+    mock_put.return_value = Mock(status_code=202, content=b"ok", json=lambda: {"requestId": "r2"})
+    _setup_webhooks(_one_webhook_config("opsgenie"))
+    client = app.test_client()
+    resp = client.post(
+        "/webhook", json=test_payload_severity_change, headers={"Authorization": "Bearer test-token"}
+    )
+    assert resp.status_code == 200
+    assert json.loads(mock_post.call_args.kwargs["data"])["priority"] == "P1"
+    assert mock_put.call_count == 1
+    assert mock_put.call_args.args[0] == (
+        f"http://test_opsgenie/{test_payload['objectId']}/priority?identifierType=alias"
+    )
+    assert json.loads(mock_put.call_args.kwargs["data"]) == {"priority": "P1"}
+
+
+@patch("requests.post")
+def test_webhook_slack_thread_follows_root_cause(mock_post, monkeypatch):
+    """An unfiltered Slack channel webhook edits the parent message on a severity change and replies on clear."""
+    monkeypatch.setenv("URL_SLACK-THREAD", "https://slack.com/api")
+    monkeypatch.setenv("TOKEN_SLACK-THREAD", "xoxb-test")
+    mock_post.return_value = Mock(status_code=200, content=b"ok", json=lambda: {"ok": True, "ts": "100.1"})
+    _setup_webhooks(textwrap.dedent("""
+        webhooks:
+          - name: "slack-thread"
+            hook_type: "slack"
+            url: "https://slack.com/api"
+            channel: "C0123456789"
+            filters:
+              enabled: false
+    """))
+    client = app.test_client()
+    headers = {"Authorization": "Bearer test-token"}
+    assert client.post("/webhook", json=test_payload, headers=headers).status_code == 200
+    assert client.post("/webhook", json=test_payload_severity_change, headers=headers).status_code == 200
+    cleared = {**test_payload, "type": "ProblemCleared"}
+    assert client.post("/webhook", json=cleared, headers=headers).status_code == 200
+
+    urls = [call.args[0] for call in mock_post.call_args_list]
+    assert urls == [
+        "https://slack.com/api/chat.postMessage",
+        "https://slack.com/api/chat.update",
+        "https://slack.com/api/chat.postMessage",
+    ]
+    update = json.loads(mock_post.call_args_list[1].kwargs["data"])
+    assert update["ts"] == "100.1"
+    assert "Critical" in json.dumps(update["blocks"])
+    reply = json.loads(mock_post.call_args_list[2].kwargs["data"])
+    assert reply["thread_ts"] == "100.1"
+
+
+@patch("requests.post")
+def test_webhook_problem_updated_skips_unfiltered_message_webhooks(mock_post):
+    """Webhooks posting a new message per notification only get updates changing whether they match."""
+    _setup_webhooks(_one_webhook_config("teams"))
+    client = app.test_client()
+    resp = client.post(
+        "/webhook", json=test_payload_severity_change, headers={"Authorization": "Bearer test-token"}
+    )
+    assert resp.status_code == 200
+    assert b"No matching webhooks found" in resp.data
+    assert mock_post.call_count == 0
 
 
 @patch("requests.post")
@@ -501,3 +652,111 @@ def test_webhook_all_forwards_fail_returns_500(mock_post):
     assert resp.status_code == 500
     assert b"Failed to forward" in resp.data
     assert mock_post.call_count == 1
+
+
+def test_metrics_reports_filter_selectivity():
+    """GET /metrics requires the token and reports the selectivity of webhooks with several filter checks."""
+    _setup_webhooks(yaml_text)
+    client = app.test_client()
+    assert client.get("/metrics").status_code == 401
+
+    resp = client.get("/metrics", headers={"Authorization": "Bearer test-token"})
+    assert resp.status_code == 200
+    selectivity = resp.get_json()["filter_selectivity"]
+    assert selectivity["slack-malfunction-slo"]["kind"] == "all"
+    assert [c["predicate"] for c in selectivity["slack-malfunction-slo"]["checks"]] == ["name", "impactsSLO"]
+
+
+def test_reload_config_replaces_filters_and_decision_cache():
+    """reload_config re-reads the configuration, so routing decisions of the old filters are not reused."""
+    _setup_webhooks(config_test_yaml)
+    old_store = server.filter_store
+    old_store.filter_payload(test_payload_for_filters)
+    with patch.object(server, "get_config", return_value=yaml.safe_load(yaml_text)):
+        server.reload_config()
+    assert server.filter_store is not old_store
+    assert set(server.webhook_lookup_map) == {"slack-severity", "slack-malfunction-slo"}
+    assert server.filter_store.decision_cache_stats()["size"] == 0
+
+    client = app.test_client()
+    resp = client.get("/metrics", headers={"Authorization": "Bearer test-token"})
+    assert resp.get_json()["decision_cache"]["projected_fields"] == ["severity", "name", "impactsSLO"]
+
+
+def test_reload_config_rejects_missing_message_template():
+    """A webhook naming a template that does not exist fails the reload and keeps the previous configuration."""
+    _setup_webhooks(config_test_yaml)
+    old_store = server.filter_store
+    config = yaml.safe_load(config_test_yaml)
+    config["webhooks"][0]["template"] = "missing.json.j2"
+    with patch.object(server, "get_config", return_value=config):
+        with pytest.raises(ValueError):
+            server.reload_config()
+    assert server.filter_store is old_store
+
+
+def test_populate_webhooks_rejects_unknown_timezone():
+    """A webhook with an unknown display timezone is a configuration error."""
+    webhooks = yaml.safe_load(config_test_yaml)["webhooks"]
+    webhooks[0]["timezone"] = "Mars/Olympus_Mons"
+    with pytest.raises(ValueError):
+        populate_webhooks(webhooks)
+
+
+def test_populate_webhooks_rejects_unknown_filtering_option():
+    """A misspelled option in the filtering section is named in the configuration error."""
+    webhooks = yaml.safe_load(config_test_yaml)["webhooks"]
+    with pytest.raises(ValueError, match="bloom_treshold"):
+        populate_webhooks(webhooks, {"bloom_threshold": 64, "bloom_treshold": 64})
+
+
+def test_populate_webhooks_rejects_slack_channel_without_token():
+    """Posting to a Slack channel with the Web API requires a bot token."""
+    webhooks = yaml.safe_load(config_test_yaml)["webhooks"]
+    webhooks[0]["channel"] = "C0123456789"
+    with pytest.raises(ValueError):
+        populate_webhooks(webhooks)
+
+
+def test_reload_config_keeps_object_indexes(tmp_path):
+    """The objectId indexes survive a reload, and are persisted in the configured state directory."""
+    config = yaml.safe_load(config_test_yaml)
+    config["state"] = {"directory": str(tmp_path / "state")}
+    with patch.object(server, "get_config", return_value=config):
+        server.reload_config()
+        indexes = server.object_indexes
+        indexes.get("slack-all-alerts").put("rc-1", "100.1")
+        server.reload_config()
+    assert server.object_indexes is indexes
+    indexes.flush()
+    assert (tmp_path / "state" / "slack-all-alerts.json").exists()
+
+
+def test_reload_config_writes_replaced_object_indexes(tmp_path):
+    """Changing the state directory writes the changes of the old indexes before they are replaced."""
+    config = yaml.safe_load(config_test_yaml)
+    config["state"] = {"directory": str(tmp_path / "old")}
+    with patch.object(server, "get_config", return_value=config):
+        server.reload_config()
+        server.object_indexes.get("slack-all-alerts").put("rc-1", "100.1")
+        config["state"] = {"directory": str(tmp_path / "new")}
+        server.reload_config()
+    assert server.object_indexes.directory == str(tmp_path / "new")
+    assert (tmp_path / "old" / "slack-all-alerts.json").exists()
+
+
+@patch("requests.post")
+def test_webhook_explain_does_not_deliver(mock_post):
+    """POST /webhook/explain explains the filters of every webhook and forwards nothing."""
+    _setup_webhooks(yaml_text)
+    client = app.test_client()
+    assert client.post("/webhook/explain", json=test_payload).status_code == 401
+
+    resp = client.post("/webhook/explain", json=test_payload, headers={"Authorization": "Bearer test-token"})
+    assert resp.status_code == 200
+    explanation = resp.get_json()
+    assert explanation["matching_webhooks"] == ["slack-severity"]
+    rejected = explanation["webhooks"]["slack-malfunction-slo"]
+    assert not rejected["matched"]
+    assert [c["matched"] for c in rejected["conditions"]] == [True, False]
+    assert mock_post.call_count == 0
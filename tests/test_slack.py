@@ -0,0 +1,129 @@
+# Tests for causely_notification.slack (threaded messages with the Slack Web API)
+from __future__ import annotations
+
+import json
+import unittest
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import requests
+
+from causely_notification.delivery import default_templates
+from causely_notification.message_templates import MESSAGE_BUDGETS
+from causely_notification.message_templates import template_context
+from causely_notification.object_index import ObjectIndex
+from causely_notification.slack import forward_to_slack_thread
+
+API_URL = "https://slack.com/api"
+
+PAYLOAD = {
+    "link": "https://portal.causely.app/rootCauses/rc-1",
+    "name": "Malfunction",
+    "type": "ProblemDetected",
+    "entity": {"id": "1", "name": "checkout", "type": "Service"},
+    "objectId": "rc-1",
+    "severity": "High",
+    "timestamp": "2025-08-07T18:51:54.164185287Z",
+    "description": {"summary": "High error rate"},
+}
+
+
+def render_slack_body(payload):
+    """Render the built-in Slack template within the Slack budget, as delivery does."""
+    return json.loads(default_templates().render("slack.json.j2", template_context(payload, MESSAGE_BUDGETS["slack"])))
+
+
+def _slack_response(**result):
+    response = MagicMock(status_code=200)
+    response.json.return_value = result
+    return response
+
+
+class TestForwardToSlackThread(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ObjectIndex()
+
+    def _forward(self, payload):
+        return forward_to_slack_thread(payload, render_slack_body(payload), API_URL, "xoxb", "C1", self.index)
+
+    def _call(self, mock_post, i):
+        call = mock_post.call_args_list[i]
+        return call.args[0].rsplit("/", 1)[1], json.loads(call.kwargs["data"])
+
+    @patch("causely_notification.slack.requests.post")
+    def test_detection_posts_parent_message(self, mock_post):
+        mock_post.return_value = _slack_response(ok=True, ts="100.1")
+        response = self._forward(PAYLOAD)
+
+        self.assertEqual(response.status_code, 200)
+        method, message = self._call(mock_post, 0)
+        self.assertEqual(method, "chat.postMessage")
+        self.assertEqual(message["channel"], "C1")
+        self.assertEqual(message["text"], "Root Cause Identified: Malfunction on checkout")
+        self.assertEqual(message["blocks"], render_slack_body(PAYLOAD)["blocks"])
+        self.assertNotIn("thread_ts", message)
+        self.assertEqual(mock_post.call_args.kwargs["headers"]["Authorization"], "Bearer xoxb")
+        self.assertEqual(self.index.get("rc-1"), "100.1")
+
+    @patch("causely_notification.slack.requests.post")
+    def test_update_edits_parent_and_clear_replies_in_thread(self, mock_post):
+        self.index.put("rc-1", "100.1")
+        mock_post.return_value = _slack_response(ok=True, ts="100.2")
+        self._forward({**PAYLOAD, "type": "ProblemUpdated", "severity": "Critical"})
+        self._forward({**PAYLOAD, "type": "ProblemCleared"})
+
+        method, update = self._call(mock_post, 0)
+        self.assertEqual(method, "chat.update")
+        self.assertEqual(update["ts"], "100.1")
+        self.assertNotIn("username", update)
+        method, reply = self._call(mock_post, 1)
+        self.assertEqual(method, "chat.postMessage")
+        self.assertEqual(reply["thread_ts"], "100.1")
+        self.assertFalse(reply["reply_broadcast"])
+        self.assertEqual(reply["text"], "Root Cause Cleared: Malfunction on checkout")
+        # Replies do not replace the parent message
+        self.assertEqual(self.index.get("rc-1"), "100.1")
+
+    @patch("causely_notification.slack.requests.post")
+    def test_deleted_parent_is_posted_again(self, mock_post):
+        self.index.put("rc-1", "100.1")
+        mock_post.side_effect = [
+            _slack_response(ok=False, error="message_not_found"),
+            _slack_response(ok=True, ts="200.1"),
+        ]
+        response = self._forward({**PAYLOAD, "type": "ProblemUpdated"})
+
+        self.assertEqual(response.status_code, 200)
+        method, message = self._call(mock_post, 1)
+        self.assertEqual(method, "chat.postMessage")
+        self.assertNotIn("ts", message)
+        self.assertEqual(self.index.get("rc-1"), "200.1")
+
+    @patch("causely_notification.slack.requests.post")
+    def test_slack_error_returns_error_response(self, mock_post):
+        mock_post.return_value = _slack_response(ok=False, error="channel_not_found")
+        response = self._forward(PAYLOAD)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("channel_not_found", response.text)
+        self.assertIsNone(self.index.get("rc-1"))
+
+    @patch("causely_notification.slack.requests.post")
+    def test_request_failure_returns_error_response(self, mock_post):
+        mock_post.side_effect = requests.exceptions.ConnectionError("refused")
+        self.assertEqual(self._forward(PAYLOAD).status_code, 500)
+
+    @patch("causely_notification.slack.requests.post")
+    def test_payload_without_object_id_is_not_threaded(self, mock_post):
+        mock_post.return_value = _slack_response(ok=True, ts="100.1")
+        payload = {key: value for key, value in PAYLOAD.items() if key != "objectId"}
+        self._forward(payload)
+        self._forward(payload)
+
+        self.assertEqual([self._call(mock_post, i)[0] for i in range(2)], ["chat.postMessage"] * 2)
+        self.assertEqual(len(self.index), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,25 @@
-# Tests for causely_notification.teams (forward_to_teams)
+# Tests for delivering to Teams (cards rendered from the built-in Teams template)
+from __future__ import annotations
+
+import json
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from causely_notification.delivery import deliver
+from causely_notification.delivery import DeliveryStats
+from causely_notification.webhook import WebhookDefinition
+
 
-from causely_notification.teams import forward_to_teams
+def forward_to_teams(payload, url):
+    """Deliver a payload to one Teams webhook, returning its response."""
+    [(_, response)] = deliver(payload, [WebhookDefinition("teams", "teams", url)], stats=DeliveryStats())
+    return response
 
 
 class TestForwardToTeams(unittest.TestCase):
 
-    @patch("causely_notification.teams.requests.post")
+    @patch("causely_notification.delivery.requests.post")
     def test_forward_to_teams_detected(self, mock_post):
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -46,6 +58,9 @@ class TestForwardToTeams(unittest.TestCase):
         response = forward_to_teams(payload, url)
 
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_post.call_args[0][0], url)
+        card = json.loads(mock_post.call_args[1]["data"])["attachments"][0]["content"]
+        self.assertIn("Root Cause Identified: Malfunction", card["body"][0]["text"])
 
         clear_payload = {
             "link": "https://portal.staging.causely.app/rootCauses/71dd427c-c95e-45b1-a72e-db2d15a3eb58",
@@ -88,3 +103,5 @@ class TestForwardToTeams(unittest.TestCase):
         response = forward_to_teams(clear_payload, url)
 
         self.assertEqual(response.status_code, 200)
+        card = json.loads(mock_post.call_args[1]["data"])["attachments"][0]["content"]
+        self.assertIn("Root Cause Cleared: Congested", card["body"][0]["text"])
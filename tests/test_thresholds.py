@@ -0,0 +1,115 @@
+# Copyright 2025 Causely, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+
+"""
+This class is used to test the ordinal comparison operators and the shared sorted thresholds in thresholds.py.
+"""
+from __future__ import annotations
+
+import unittest
+
+from causely_notification.filter import WebhookFilterStore
+from causely_notification.thresholds import FieldThresholds
+from causely_notification.thresholds import Ordering
+
+
+class TestOrdering(unittest.TestCase):
+    def test_rank(self):
+        ordering = Ordering()
+        self.assertEqual(ordering.rank("Info"), 0)
+        self.assertEqual(ordering.rank("critical"), 4)
+        self.assertEqual(ordering.rank(7), 7)
+        self.assertEqual(ordering.rank("2.5"), 2.5)
+        # Booleans and unknown names cannot be ordered
+        self.assertIsNone(ordering.rank(True))
+        self.assertIsNone(ordering.rank("Severe"))
+        self.assertIsNone(ordering.rank(["High"]))
+
+    def test_custom_severity_order(self):
+        ordering = Ordering(["Minor", "Major", "Blocker"])
+        self.assertEqual(ordering.rank("Blocker"), 2)
+        self.assertIsNone(ordering.rank("Critical"))
+
+    def test_threshold_rank_rejects_unordered_values(self):
+        with self.assertRaises(ValueError) as context:
+            Ordering().threshold_rank("gte", "Severe")
+        self.assertIn("Operator 'gte' requires a number or one of the severities", str(context.exception))
+
+
+class TestFieldThresholds(unittest.TestCase):
+    def test_compile_test(self):
+        thresholds = FieldThresholds(Ordering())
+        cases = [
+            ("gte", "High", "High", True),
+            ("gte", "High", "Medium", False),
+            ("gt", "High", "High", False),
+            ("gt", "High", "Critical", True),
+            ("lte", "Medium", "Medium", True),
+            ("lte", "Medium", "High", False),
+            ("lt", "Medium", "Low", True),
+            ("lt", "Medium", "Medium", False),
+            ("gte", 0.5, 0.75, True),
+            ("lt", 0.5, "0.75", False),
+            ("gte", "Low", "Severe", False),
+        ]
+        for operator, threshold, value, expected in cases:
+            test = thresholds.compile_test(operator, threshold)
+            self.assertEqual(test(value), expected, (operator, threshold, value))
+
+    def test_satisfied_shares_one_lookup_across_thresholds(self):
+        thresholds = FieldThresholds(Ordering())
+        for threshold in ["Low", "Medium", "High", "Medium"]:
+            thresholds.add("gte", threshold)
+        thresholds.add("lt", "Critical")
+        # Duplicate thresholds are stored once
+        self.assertEqual(thresholds.thresholds["gte"], [1, 2, 3])
+        self.assertEqual(thresholds.satisfied("Medium"), {("gte", 1), ("gte", 2), ("lt", 4)})
+        self.assertIs(thresholds.satisfied("Medium"), thresholds.satisfied("Medium"))
+
+
+class TestComparisonFilters(unittest.TestCase):
+    def test_store_routes_by_severity_threshold(self):
+        store = WebhookFilterStore()
+        store.add_webhook_filters("pager", [
+            {"field": "severity", "operator": "gte", "value": "High"},
+        ], enabled=True)
+        store.add_webhook_filters("digest", [
+            {"field": "severity", "operator": "lt", "value": "High"},
+        ], enabled=True)
+
+        self.assertEqual(store.filter_payload({"severity": "Critical"}), ["pager"])
+        self.assertEqual(store.filter_payload({"severity": "Low"}), ["digest"])
+        self.assertEqual(store.filter_payload({}), [])
+        self.assertEqual(
+            store.filter_many([{"severity": "High"}, {"severity": "Medium"}]),
+            [["pager"], ["digest"]],
+        )
+
+    def test_store_uses_configured_severity_order(self):
+        store = WebhookFilterStore(severity_order=["Minor", "Major", "Blocker"])
+        store.add_webhook_filters("major", [
+            {"field": "severity", "operator": "gte", "value": "Major"},
+        ], enabled=True)
+        self.assertEqual(store.filter_payload({"severity": "Blocker"}), ["major"])
+        self.assertEqual(store.filter_payload({"severity": "Minor"}), [])
+
+    def test_invalid_threshold_is_rejected(self):
+        store = WebhookFilterStore()
+        with self.assertRaises(ValueError):
+            store.add_webhook_filters("bad", [
+                {"field": "severity", "operator": "gte", "value": "Severe"},
+            ], enabled=True)